@@ -0,0 +1,44 @@
+"""Compare the memory held by dict entries with the slotted M3UEntry and ClassifiedEntry records.
+
+Run from the backend directory:
+    python -m benchmarks.bench_entry_memory --entries 500000
+"""
+import argparse
+import gc
+import os
+import tempfile
+import tracemalloc
+
+from benchmarks.bench_m3u_parser import legacy_parse_m3u
+from benchmarks.synthetic import write_synthetic_playlist
+from services.classifier import classify_m3u
+from services.m3u_parser import parse_m3u
+
+
+def measure(label, func, *args):
+    gc.collect()
+    tracemalloc.start()
+    result = func(*args)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    count = sum(len(part) for part in result)
+    print(f"{label:<20} {count:>10} entries retained {retained / 1024 / 1024:>8.1f} MiB "
+          f"({retained / max(1, count):>6.0f} B/entry) peak {peak / 1024 / 1024:>8.1f} MiB")
+    del result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the memory used by parsed playlist entries.")
+    parser.add_argument('--entries', type=int, default=500_000, help="Number of playlist entries to generate.")
+    parser.add_argument('--playlist', default=None, help="Existing playlist to use instead of a synthetic one.")
+    args = parser.parse_args()
+
+    path = args.playlist or write_synthetic_playlist(
+        os.path.join(tempfile.gettempdir(), f'm3u4strm_memory_{args.entries}.m3u'), args.entries)
+    measure('dict entries', legacy_parse_m3u, path)
+    measure('M3UEntry slots', parse_m3u, path)
+    measure('ClassifiedEntry', classify_m3u, path, './results/Result_bench')
+
+
+if __name__ == '__main__':
+    main()
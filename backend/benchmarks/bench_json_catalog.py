@@ -0,0 +1,104 @@
+"""Compare the single-pass compact catalog builder with the previous per-kind builder.
+
+Run from the backend directory:
+    python -m benchmarks.bench_json_catalog --entries 500000
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks.synthetic import write_synthetic_playlist
+from services.classifier import classify_m3u
+from services.json_utils import catalog_path, create_catalogs, episode_document, iter_catalog, movie_document
+
+
+def legacy_build_documents(records, folder_type):
+    """The builder as it was before the single pass, kept for comparison."""
+    movies = []
+    series = {}
+    for record in records:
+        if record.kind != folder_type:
+            continue
+        if record.kind == 'series':
+            show = series.get(record.show_name)
+            if show is None:
+                show = series[record.show_name] = {
+                    'name': record.show_name,
+                    'path': record.series_path,
+                    'image': None,
+                    'provider': record.provider,
+                    'alternates': [],
+                    'seasons': {}
+                }
+            season = show['seasons'].get(record.season)
+            if season is None:
+                season = show['seasons'][record.season] = {'path': record.dir_path, 'episodes': []}
+            season['episodes'].append(episode_document(record))
+            if show['image'] is None and int(record.season) == 1 and int(record.episode) == 1:
+                show['image'] = record.logo
+        else:
+            movies.append(movie_document(record))
+
+    if folder_type == 'movies':
+        return movies
+    series_list = []
+    for show_info in series.values():
+        show_info['seasons'] = [{'season': season, **info} for season, info in show_info['seasons'].items()]
+        series_list.append(show_info)
+    return series_list
+
+
+def legacy_create_json(records, base_dir, folder_type):
+    documents = legacy_build_documents(records, folder_type)
+    with open(os.path.join(base_dir, folder_type + '.json'), 'w', encoding='utf-8') as json_file:
+        json.dump(documents, json_file, ensure_ascii=False, indent=4)
+    return documents
+
+
+def catalog_size(base_dir):
+    return sum(os.path.getsize(catalog_path(base_dir, name)) for name in ('movies', 'series'))
+
+
+def measure(label, func, base_dir, count):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    size = catalog_size(base_dir) / (1024 * 1024)
+    print(f"{label:<14} {count:>10} entries {elapsed:>8.2f}s {count / elapsed:>12,.0f} entries/s {size:>9.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the JSON catalog builders.")
+    parser.add_argument('--entries', type=int, default=500_000, help="Number of playlist entries to generate.")
+    args = parser.parse_args()
+
+    playlist = write_synthetic_playlist(
+        os.path.join(tempfile.gettempdir(), f'm3u4strm_catalog_{args.entries}.m3u'), args.entries)
+    output = tempfile.mkdtemp(prefix='m3u4strm_catalog_')
+    legacy_dir = os.path.join(output, 'legacy')
+    single_dir = os.path.join(output, 'single')
+    os.makedirs(legacy_dir)
+    os.makedirs(single_dir)
+    movies, series = classify_m3u(playlist, output)
+    records = movies + series
+
+    def legacy():
+        # Each kind used to walk every entry and skip the other kind's half
+        legacy_create_json(records, legacy_dir, 'movies')
+        legacy_create_json(records, legacy_dir, 'series')
+
+    try:
+        measure('legacy', legacy, legacy_dir, len(records))
+        measure('single pass', lambda: create_catalogs(records, single_dir), single_dir, len(records))
+        for name in ('movies', 'series'):
+            legacy_documents = list(iter_catalog(catalog_path(legacy_dir, name)))
+            assert legacy_documents == list(iter_catalog(catalog_path(single_dir, name))), f"{name} catalog differs"
+    finally:
+        shutil.rmtree(output, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
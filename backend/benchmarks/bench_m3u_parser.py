@@ -0,0 +1,89 @@
+"""Compare the list based parser with the streaming one on a synthetic playlist.
+
+Run from the backend directory:
+    python -m benchmarks.bench_m3u_parser --entries 2000000
+"""
+import argparse
+import os
+import re
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.synthetic import write_synthetic_playlist
+from services.m3u_parser import iter_m3u
+
+
+def legacy_parse_m3u(file_path):
+    """The parser as it was before the streaming rewrite, kept for comparison."""
+    media_extensions = ('.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv', '.webm', '.mpg')
+    with open(file_path, 'r', encoding='utf-8') as file:
+        lines = file.readlines()
+    movies = []
+    series = []
+    current_entry = {}
+    for line in lines:
+        line = line.strip()
+        if line.startswith('#EXTINF'):
+            current_entry = {}
+            line = line[len('#EXTINF:-1 '):]
+            parts = line.split('",', 1)
+            attribute_string = parts[0] + '"'
+            name = parts[1].strip()
+            attributes = re.findall(r'(\w+)=["\']([^"\']+)["\']', attribute_string)
+            for key, value in attributes:
+                current_entry[key.strip()] = value.strip()
+            current_entry['name'] = name
+        elif line.startswith('http') or line.startswith('https'):
+            if any(line.lower().endswith(ext) for ext in media_extensions):
+                current_entry['url'] = line
+                title = current_entry.get('title', '')
+                name = current_entry['name']
+                if 'Series' in title or re.search(r'\b[Ss][._-]?\s*(\d{1,10})[._-]?\s*E\s*(\d{1,10})\b', name):
+                    series.append(current_entry)
+                else:
+                    movies.append(current_entry)
+    return movies, series
+
+
+def run_legacy(path):
+    movies, series = legacy_parse_m3u(path)
+    return len(movies) + len(series)
+
+
+def run_streaming(path):
+    count = 0
+    for _ in iter_m3u(path):
+        count += 1
+    return count
+
+
+def measure(label, func, path):
+    start = time.perf_counter()
+    count = func(path)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    func(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{label:<10} {count:>10} entries {elapsed:>8.2f}s {count / elapsed:>12,.0f} entries/s "
+          f"peak {peak / 1024 / 1024:>9.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the M3U parsers.")
+    parser.add_argument('--entries', type=int, default=2_000_000, help="Number of playlist entries to generate.")
+    parser.add_argument('--playlist', default=None, help="Existing playlist to use instead of a synthetic one.")
+    args = parser.parse_args()
+
+    path = args.playlist or write_synthetic_playlist(
+        os.path.join(tempfile.gettempdir(), f'm3u4strm_bench_{args.entries}.m3u'), args.entries)
+    print(f"Playlist: {path} ({os.path.getsize(path) / 1024 / 1024:.1f} MiB)")
+    measure('legacy', run_legacy, path)
+    measure('streaming', run_streaming, path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""Measure how parsing and classifying a playlist scales with the number of worker processes.
+
+Run from the backend directory:
+    python -m benchmarks.bench_parallel_parse --entries 2000000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.synthetic import write_synthetic_playlist
+from services.classifier import iter_classified
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark serial against parallel M3U parsing.")
+    parser.add_argument('--entries', type=int, default=2_000_000, help="Number of playlist entries to generate.")
+    parser.add_argument('--playlist', default=None, help="Existing playlist to use instead of a synthetic one.")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8], help="Worker counts to measure.")
+    args = parser.parse_args()
+
+    path = args.playlist or write_synthetic_playlist(
+        os.path.join(tempfile.gettempdir(), f'm3u4strm_bench_{args.entries}.m3u'), args.entries)
+    print(f"Playlist: {path} ({os.path.getsize(path) / 1024 / 1024:.1f} MiB), {os.cpu_count()} CPUs")
+
+    baseline = None
+    baseline_elapsed = None
+    for workers in args.workers:
+        start = time.perf_counter()
+        records = list(iter_classified(path, './results/Result_bench', workers))
+        elapsed = time.perf_counter() - start
+
+        if baseline is None:
+            baseline, baseline_elapsed = records, elapsed
+            matches = 'baseline'
+        else:
+            matches = 'identical' if records == baseline else 'MISMATCH'
+        print(f"workers={workers:<3} {len(records):>10} records {elapsed:>8.2f}s "
+              f"{len(records) / elapsed:>12,.0f} records/s speedup {baseline_elapsed / elapsed:>5.2f}x {matches}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Encode/decode throughput of the available JSON backends on a generated series catalog.
+
+Run from the backend directory:
+    python -m benchmarks.bench_serialization --entries 500000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.synthetic import write_synthetic_playlist
+from services.classifier import classify_m3u
+from services.json_utils import build_catalogs
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def backends():
+    yield 'json', (lambda obj: json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8'),
+                   json.loads)
+    if orjson is not None:
+        yield 'orjson', (orjson.dumps, orjson.loads)
+
+
+def measure(label, func, size, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<18} {best:>8.3f}s {size / best / (1024 * 1024):>10.1f} MiB/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the JSON serialization backends.")
+    parser.add_argument('--entries', type=int, default=500_000, help="Number of playlist entries to generate.")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per measurement, the best is reported.")
+    args = parser.parse_args()
+
+    playlist = write_synthetic_playlist(
+        os.path.join(tempfile.gettempdir(), f'm3u4strm_serialization_{args.entries}.m3u'), args.entries, 0.9)
+    movies, series = classify_m3u(playlist, tempfile.gettempdir())
+    _, series_documents = build_catalogs(series)
+    print(f"series catalog: {len(series_documents)} shows, {len(series)} episodes")
+
+    for name, (dumps, loads) in backends():
+        # Whole catalog as one array, like the legacy series.json, and one document per line
+        encoded = dumps(series_documents)
+        lines = [dumps(document) for document in series_documents]
+        size = len(encoded)
+        measure(f"{name} encode", lambda: dumps(series_documents), size, args.repeat)
+        measure(f"{name} decode", lambda: loads(encoded), size, args.repeat)
+        measure(f"{name} encode lines", lambda: [dumps(document) for document in series_documents], size,
+                args.repeat)
+        measure(f"{name} decode lines", lambda: [loads(line) for line in lines], size, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
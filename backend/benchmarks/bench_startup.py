@@ -0,0 +1,103 @@
+"""Measure the cold start of the API server: importing the app, accepting connections and becoming ready.
+
+Run from the backend directory:
+    python -m benchmarks.bench_startup --runs 5
+    python -m benchmarks.bench_startup --runs 5 --mongo
+
+Each run starts a fresh interpreter, as a new container would. Without
+``--mongo`` the server uses a temporary SQLite catalog, so no database server
+is needed; with it the MongoDB database configured in .env is used.
+"""
+import argparse
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.error import HTTPError, URLError
+from urllib.request import urlopen
+
+READY_TIMEOUT = 120
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def import_time(env):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', 'import main'], env=env, check=True)
+    return time.perf_counter() - start
+
+
+def slowest_imports(env, count=10):
+    """The app's own modules and third party packages taking longest to import, from -X importtime."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import main'], env=env,
+                            capture_output=True, text=True, check=True)
+    timings = []
+    for line in result.stderr.splitlines()[1:]:
+        _, cumulative, name = line.split('|')
+        if name.startswith('  ') and not name.startswith('    '):  # Direct imports of main
+            timings.append((int(cumulative) / 1000, name.strip()))
+    return sorted(timings, reverse=True)[:count]
+
+
+def server_start(env):
+    """Seconds until the server answers /api/ready at all, and until it reports ready."""
+    port = free_port()
+    url = f'http://127.0.0.1:{port}/api/ready'
+    start = time.perf_counter()
+    server = subprocess.Popen([sys.executable, '-m', 'uvicorn', 'main:app', '--port', str(port), '--log-level',
+                               'warning'], env=env)
+    listening = None
+    try:
+        while time.perf_counter() - start < READY_TIMEOUT:
+            try:
+                with urlopen(url, timeout=1):
+                    return listening or time.perf_counter() - start, time.perf_counter() - start
+            except HTTPError:
+                listening = listening or time.perf_counter() - start  # 503 while warming up
+            except (URLError, ConnectionError):
+                pass
+            time.sleep(0.01)
+        raise TimeoutError(f"Server not ready after {READY_TIMEOUT}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def report(label, timings):
+    print(f"{label:<18} median {statistics.median(timings) * 1000:>8.0f} ms  "
+          f"min {min(timings) * 1000:>8.0f} ms  max {max(timings) * 1000:>8.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the API server cold start.")
+    parser.add_argument('--runs', type=int, default=5, help="Number of cold starts to measure.")
+    parser.add_argument('--mongo', action='store_true', help="Use the configured MongoDB database.")
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix='m3u4strm_startup_')
+    env = dict(os.environ)
+    if not args.mongo:
+        env.update(STORAGE_BACKEND='sqlite', SQLITE_PATH=os.path.join(scratch, 'catalog.db'))
+
+    try:
+        report('import main', [import_time(env) for _ in range(args.runs)])
+        starts = [server_start(env) for _ in range(args.runs)]
+        report('accepting', [listening for listening, _ in starts])
+        report('ready', [ready for _, ready in starts])
+        print("Slowest imports of main:")
+        for milliseconds, name in slowest_imports(env):
+            print(f"  {name:<40} {milliseconds:>8.1f} ms")
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""Measure catalog ingest and API read latency of the storage backends.
+
+Run from the backend directory:
+    python -m benchmarks.bench_storage --entries 200000
+    python -m benchmarks.bench_storage --entries 200000 --mongo
+
+SQLite runs against a temporary file. ``--mongo`` also measures the MongoDB
+database configured in .env and upserts the synthetic catalog into it, so only
+point it at a scratch database.
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+from benchmarks.synthetic import write_synthetic_playlist
+from services.classifier import classify_m3u
+from services.json_utils import build_catalogs
+
+BATCH_SIZE = 1000  # Documents per upsert, as the playlist ingest sends them
+READS = 500
+
+
+async def ingest(store, kind, documents):
+    start = time.perf_counter()
+    for offset in range(0, len(documents), BATCH_SIZE):
+        await store.upsert(kind, documents[offset:offset + BATCH_SIZE])
+    elapsed = time.perf_counter() - start
+    print(f"{store.name:<8} ingest {kind:<8} {len(documents):>9} docs {elapsed:>8.2f}s "
+          f"{len(documents) / elapsed:>10,.0f} docs/s")
+
+
+async def latency(store, label, read):
+    timings = []
+    for _ in range(READS):
+        start = time.perf_counter()
+        await read()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    print(f"{store.name:<8} {label:<22} p50 {statistics.median(timings):>8.3f} ms "
+          f"p95 {timings[int(len(timings) * 0.95)]:>8.3f} ms")
+
+
+async def deep_cursor(store, pages):
+    """Position reached after walking ``pages`` pages of 50 movies by cursor."""
+    after = None
+    for _ in range(pages):
+        _, after = await store.page('movies', 'name', 50, after)
+        if after is None:
+            break
+    return after
+
+
+async def measure(store, movies, series):
+    await store.prepare()
+    await ingest(store, 'movies', movies)
+    await ingest(store, 'series', series)
+
+    page, _ = await store.page('movies', 'name', 100)
+    movie_ids = [movie['id'] for movie in page]
+    page, _ = await store.page('series', 'name', 100)
+    series_ids = [show['id'] for show in page]
+    words = [movie['name'].split()[0] for movie in movies[:READS]]
+    after = await deep_cursor(store, 200)
+
+    await latency(store, 'get movie', lambda: store.get_movie(random.choice(movie_ids)))
+    await latency(store, 'get series', lambda: store.get_series(random.choice(series_ids)))
+    await latency(store, 'get episode', lambda: store.get_episode(random.choice(series_ids), '1', '1'))
+    await latency(store, 'first page', lambda: store.page('movies', 'name', 50))
+    await latency(store, 'page 200 by cursor', lambda: store.page('movies', 'name', 50, after))
+    await latency(store, 'page 200 by offset', lambda: store.page('movies', 'name', 50, skip=199 * 50))
+    await latency(store, 'recent page', lambda: store.page('series', 'recent', 50, basic=True))
+    await latency(store, 'search', lambda: store.page('movies', 'name', 50, search=random.choice(words)))
+
+
+async def mongo_reachable():
+    from services.databases import client
+    try:
+        await asyncio.wait_for(client.admin.command('ping'), timeout=3)
+        return True
+    except Exception as e:
+        print(f"MongoDB is not reachable ({e.__class__.__name__}), skipping it")
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the catalog storage backends.")
+    parser.add_argument('--entries', type=int, default=200_000, help="Number of playlist entries to generate.")
+    parser.add_argument('--mongo', action='store_true', help="Also measure the configured MongoDB database.")
+    args = parser.parse_args()
+
+    playlist = write_synthetic_playlist(
+        os.path.join(tempfile.gettempdir(), f'm3u4strm_storage_{args.entries}.m3u'), args.entries)
+    output = tempfile.mkdtemp(prefix='m3u4strm_storage_')
+    movie_records, series_records = classify_m3u(playlist, output)
+    movies, series = build_catalogs(movie_records + series_records, progress=False)
+
+    async def run():
+        from services.sqlite_store import SqliteCatalogStore
+        await measure(SqliteCatalogStore(os.path.join(output, 'catalog.db')), movies, series)
+        if args.mongo and await mongo_reachable():
+            from services.database_service import MongoCatalogStore
+            await measure(MongoCatalogStore(), movies, series)
+
+    try:
+        asyncio.run(run())
+    finally:
+        shutil.rmtree(output, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
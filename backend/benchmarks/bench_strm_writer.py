@@ -0,0 +1,73 @@
+"""Compare the batched STRM writer with the previous one-future-per-entry writer.
+
+Run from the backend directory:
+    python -m benchmarks.bench_strm_writer --entries 500000
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from benchmarks.synthetic import write_synthetic_playlist
+from services.classifier import classify_m3u
+from services.strm_utils import write_strm_files
+
+
+def legacy_write_strm_file(record):
+    """The writer as it was before batching, kept for comparison."""
+    os.makedirs(record.dir_path, exist_ok=True)
+    file_path = record.strm_path
+    if os.path.exists(file_path):
+        with open(file_path, 'r', encoding='utf-8') as existing_strm_file:
+            if existing_strm_file.read().strip() == record.url.strip():
+                return
+    with open(file_path, 'w', encoding='utf-8') as strm_file:
+        strm_file.write(record.url)
+
+
+def legacy_write_strm_files(records, max_workers):
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(legacy_write_strm_file, record) for record in records]
+        for _ in as_completed(futures):
+            pass
+
+
+def measure(label, func, count):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<22} {count:>10} entries {elapsed:>8.2f}s {count / elapsed:>12,.0f} files/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the STRM writers.")
+    parser.add_argument('--entries', type=int, default=500_000, help="Number of playlist entries to generate.")
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 1) - 2), help="Writer threads.")
+    parser.add_argument('--output', default=None, help="Directory to write the trees into (defaults to a temp dir).")
+    args = parser.parse_args()
+
+    playlist = write_synthetic_playlist(
+        os.path.join(tempfile.gettempdir(), f'm3u4strm_writer_{args.entries}.m3u'), args.entries)
+    output = args.output or tempfile.mkdtemp(prefix='m3u4strm_strm_')
+    legacy_dir = os.path.join(output, 'Result_legacy')
+    batched_dir = os.path.join(output, 'Result_batched')
+    legacy_movies, legacy_series = classify_m3u(playlist, legacy_dir)
+    batched_movies, batched_series = classify_m3u(playlist, batched_dir)
+    legacy_records = legacy_movies + legacy_series
+    batched_records = batched_movies + batched_series
+    count = len(legacy_records)
+
+    try:
+        measure('legacy (new tree)', lambda: legacy_write_strm_files(legacy_records, args.workers), count)
+        measure('batched (new tree)', lambda: write_strm_files(batched_records, 'bench', args.workers), count)
+        measure('legacy (unchanged)', lambda: legacy_write_strm_files(legacy_records, args.workers), count)
+        measure('batched (unchanged)', lambda: write_strm_files(batched_records, 'bench', args.workers), count)
+    finally:
+        if args.output is None:
+            shutil.rmtree(output, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+import os
+import random
+
+GROUPS = ('Action', 'Drama', 'Comedy', 'Documentary', 'Kids', 'Horror', 'Sci-Fi', 'Thriller')
+
+
+def synthetic_lines(entries, series_ratio=0.6, host='http://provider.example:8080', seed=42):
+    """Yield the lines of an Xtream style m3u_plus playlist with ``entries`` items."""
+    rng = random.Random(seed)
+    yield '#EXTM3U\n'
+    for i in range(entries):
+        group = GROUPS[i % len(GROUPS)]
+        if rng.random() < series_ratio:
+            show = i // 40
+            season = (i // 10) % 4 + 1
+            episode = i % 10 + 1
+            name = f"Show {show} S{season:02d} E{episode:02d}"
+            group_title = f"Series: {group}"
+            url = f"{host}/series/user/pass/{i}.mkv"
+        else:
+            name = f"Movie {i} ({1980 + i % 45})"
+            group_title = f"Movies: {group}"
+            url = f"{host}/movie/user/pass/{i}.mp4"
+        yield (f'#EXTINF:-1 tvg-id="" tvg-name="{name}" tvg-logo="{host}/images/{i % 5000}.jpg" '
+               f'group-title="{group_title}",{name}\n')
+        yield url + '\n'
+
+
+def write_synthetic_playlist(path, entries, series_ratio=0.6):
+    """Write a synthetic playlist to ``path`` unless one with the same parameters already exists."""
+    # The marker records what the file holds, a run with other parameters rewrites it
+    marker = f"{path}.params"
+    params = f"{entries} {series_ratio}"
+    if os.path.exists(path) and os.path.exists(marker):
+        with open(marker, encoding='utf-8') as file:
+            if file.read() == params:
+                return path
+        os.remove(marker)
+    with open(path, 'w', encoding='utf-8') as file:
+        file.writelines(synthetic_lines(entries, series_ratio))
+    with open(marker, 'w', encoding='utf-8') as file:
+        file.write(params)
+    return path
@@ -1,12 +1,64 @@
 import asyncio
-from services.database_service import delete_all_media_path_regex
+import os
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv, find_dotenv
+
+# Before the services read their settings from the environment
+load_dotenv(find_dotenv())
+
+from services.storage import catalog_store
 import uvicorn
 from fastapi import FastAPI, WebSocket
 from concurrent.futures import ThreadPoolExecutor
-from services.routes import router
+from services.routes import router, warm_catalog_cache
 from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI()
+# Auto reload is for development only, it watches the source tree and runs the app in a subprocess
+UVICORN_RELOAD = os.environ.get('UVICORN_RELOAD', 'false').lower() in ('1', 'true', 'yes')
+STARTUP_RETRY_DELAY = 1.0  # Seconds before retrying a failed startup, doubled up to the maximum
+STARTUP_RETRY_MAX_DELAY = 60.0
+
+
+async def warm_up(app: FastAPI):
+    """Prepare the store, then fill the catalog cache; /api/ready reports when this is done.
+
+    A failed step, e.g. while the database is still starting, is retried with backoff.
+    """
+    prepared = False
+    delay = STARTUP_RETRY_DELAY
+    while True:
+        try:
+            if not prepared:
+                # With MongoDB the indexes are ensured while the connection pool fills, and older
+                # documents get their provider and search fields in the background afterwards
+                app.state.backfill_task = await catalog_store().prepare()
+                prepared = True
+            await warm_catalog_cache()
+            app.state.startup_error = None
+            app.state.ready = True
+            return
+        except Exception as e:
+            app.state.startup_error = str(e)
+            print(f"Startup failed: {e}, retrying in {delay:.0f}s")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, STARTUP_RETRY_MAX_DELAY)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The server accepts connections right away and reports ready once warmed up
+    app.state.ready = False
+    app.state.startup_error = None
+    app.state.backfill_task = None
+    startup = asyncio.create_task(warm_up(app))
+    yield
+    for task in (startup, app.state.backfill_task):
+        if task is not None:
+            task.cancel()
+    await catalog_store().close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -14,9 +66,11 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allow all methods (GET, POST, etc.)
     allow_headers=["*"],  # Allow all headers
+    # Cursor of the next page of the listing endpoints, start time of an export
+    expose_headers=["X-Next-Cursor", "X-Export-Time"],
 )
 app.include_router(router, prefix='/api')
 
 
 if __name__ == '__main__':
-    uvicorn.run("main:app", host='0.0.0.0', port=8001, reload=True)
+    uvicorn.run("main:app", host='0.0.0.0', port=8001, reload=UVICORN_RELOAD)
@@ -1,4 +1,4 @@
-from typing import List, Optional, Union
+from typing import Dict, List, Optional, Union
 from pydantic import BaseModel
 
 class BaseMedia(BaseModel):
@@ -7,6 +7,8 @@ class BaseMedia(BaseModel):
     logo: Optional[str] = None
     path: str
     url: str
+    provider: Optional[str] = None
+    alternates: List[Dict[str, Optional[str]]] = []  # Copies of the same title from other providers
         
 class Movie(BaseMedia):
     duration: Optional[str] = None  # Duration in seconds
@@ -20,6 +22,8 @@ class Episode(BaseModel):
     path: str
     season: Optional[str] = None
     episode: Optional[str] = None
+    provider: Optional[str] = None
+    alternates: List[Dict[str, Optional[str]]] = []  # Copies of the same episode from other providers
     type: Optional[str] = "Episode"
     
 class Season(BaseModel):
@@ -34,6 +38,7 @@ class Series(BaseModel):
     image: Optional[str] = None
     path: str  # Add the path attribute
     seasons: List[Season] = []  # Include seasons in the Series model
+    provider: Optional[str] = None
     type: Optional[str] = "Series"
     duration: Optional[str] = None  # Duration in seconds
     resolution: Optional[str] = None  # Resolution as a string (e.g., "1920x1080")
@@ -0,0 +1,93 @@
+import os
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable
+
+# Bounds of the in-process cache in front of the catalog detail lookups and first listing pages
+CATALOG_CACHE_SIZE = int(os.environ.get('CATALOG_CACHE_SIZE', '4096'))
+CATALOG_CACHE_TTL = float(os.environ.get('CATALOG_CACHE_TTL', '300'))
+LISTING_CACHE_PAGES = 3  # Listing pages past this one, and cursor pages, are always read from MongoDB
+
+_MISSING = object()
+
+
+class CatalogCache:
+    """LRU cache with a time to live whose entries depend on MongoDB collections.
+
+    Write paths call ``invalidate`` with the collections they changed, which drops
+    every entry built from them. Each invalidation also bumps the collections'
+    generation, so a read that started before a write never stores what it loaded.
+    Only used from the event loop, no locking is needed.
+    """
+
+    def __init__(self, max_entries: int = CATALOG_CACHE_SIZE, ttl: float = CATALOG_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (expires at, value, collections)
+        self.generations = defaultdict(int)
+        self.epoch = 0  # Bumped when everything is invalidated
+        self.counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+    def get(self, key: Hashable) -> Any:
+        entry = self.entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self.entries[key]
+            self.counters['misses'] += 1
+            return _MISSING
+        self.entries.move_to_end(key)
+        self.counters['hits'] += 1
+        return entry[1]
+
+    def generation(self, collections: Iterable[str]) -> tuple:
+        return (self.epoch,) + tuple(self.generations[name] for name in collections)
+
+    def put(self, key: Hashable, value: Any, collections: tuple, generation: tuple = None):
+        """Store ``value`` unless one of ``collections`` changed since ``generation`` was taken."""
+        if self.max_entries <= 0 or (generation is not None and generation != self.generation(collections)):
+            return
+        self.entries[key] = (time.monotonic() + self.ttl, value, collections)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.counters['evictions'] += 1
+
+    def invalidate(self, *collections: str):
+        """Drop the entries built from any of ``collections``, or every entry when none is given."""
+        self.counters['invalidations'] += 1
+        if not collections:
+            self.epoch += 1
+            self.entries.clear()
+            return
+        for name in collections:
+            self.generations[name] += 1
+        stale = [key for key, entry in self.entries.items() if not set(collections).isdisjoint(entry[2])]
+        for key in stale:
+            del self.entries[key]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.counters['hits'] + self.counters['misses']
+        return {**self.counters, 'entries': len(self.entries), 'max_entries': self.max_entries, 'ttl': self.ttl,
+                'hit_rate': round(self.counters['hits'] / lookups, 4) if lookups else None}
+
+
+catalog_cache = CatalogCache()
+
+
+def invalidate(*collections: str):
+    catalog_cache.invalidate(*collections)
+
+
+async def read_through(key: Hashable, collections: tuple, load: Callable[[], Awaitable[Any]]) -> Any:
+    """Return the cached value of ``key`` or ``await load()`` and cache it; None results are not cached.
+
+    Cached values are shared between requests and must not be modified by callers.
+    """
+    value = catalog_cache.get(key)
+    if value is not _MISSING:
+        return value
+    generation = catalog_cache.generation(collections)
+    value = await load()
+    if value is not None:
+        catalog_cache.put(key, value, collections, generation)
+    return value
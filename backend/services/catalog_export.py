@@ -0,0 +1,77 @@
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from services import serialization
+from services.databases import NORMALIZED_EPISODES, episodes_collection, movies_collection, series_collection
+from services.episode_store import attach_episodes
+from services.storage import EXPORT_TYPES
+
+EXPORT_BATCH_SIZE = 1000  # Documents per cursor batch and per chunk written to the response
+SERIES_EXPORT_BATCH_SIZE = 100  # Shows whose episodes are attached together in the normalized layout
+
+
+def export_query(provider: Optional[str] = None, since: Optional[datetime] = None) -> Dict[str, Any]:
+    conditions = []
+    if provider:
+        # Titles the provider holds as the primary copy or as an alternate
+        conditions.append({'$or': [{'provider': provider}, {'alternates.provider': provider}]})
+    if since:
+        conditions.append({'updated_at': {'$gte': since}})
+    if not conditions:
+        return {}
+    return conditions[0] if len(conditions) == 1 else {'$and': conditions}
+
+
+async def _series_changed_by_episodes(since: datetime) -> List[Any]:
+    """Shows whose normalized episodes were probed or updated without the show itself being rewritten."""
+    return await episodes_collection.distinct('series_id', {'updated_at': {'$gte': since}})
+
+
+def _export_line(document: Dict[str, Any], media_type: str) -> bytes:
+    document['id'] = str(document.pop('_id'))
+    document['type'] = media_type
+    return serialization.dumps(document) + b'\n'
+
+
+async def export_catalog(types: List[str], provider: Optional[str] = None,
+                         since: Optional[datetime] = None) -> AsyncIterator[bytes]:
+    """Stream the catalog as JSON Lines, one document per line, straight from the MongoDB cursors.
+
+    Lines are yielded in chunks of ``EXPORT_BATCH_SIZE`` documents, so memory
+    stays flat whatever the catalog size. With ``since`` only documents written
+    at or after that time are exported; deletions are not reported.
+    """
+    for media_type in types:
+        query = export_query(provider, since)
+        if media_type == 'movies':
+            cursor = movies_collection.find(query).batch_size(EXPORT_BATCH_SIZE)
+            chunk = []
+            async for movie in cursor:
+                chunk.append(_export_line(movie, EXPORT_TYPES['movies']))
+                if len(chunk) >= EXPORT_BATCH_SIZE:
+                    yield b''.join(chunk)
+                    chunk = []
+            if chunk:
+                yield b''.join(chunk)
+            continue
+
+        if since and NORMALIZED_EPISODES:
+            changed_ids = await _series_changed_by_episodes(since)
+            if changed_ids:
+                by_episodes = {'_id': {'$in': changed_ids}}
+                if provider:
+                    by_episodes = {'$and': [export_query(provider), by_episodes]}
+                query = {'$or': [query, by_episodes]}
+        cursor = series_collection.find(query).batch_size(SERIES_EXPORT_BATCH_SIZE)
+        shows = []
+        async for show in cursor:
+            shows.append(show)
+            if len(shows) >= SERIES_EXPORT_BATCH_SIZE:
+                if NORMALIZED_EPISODES:
+                    await attach_episodes(shows)
+                yield b''.join(_export_line(show, EXPORT_TYPES['series']) for show in shows)
+                shows = []
+        if shows:
+            if NORMALIZED_EPISODES:
+                await attach_episodes(shows)
+            yield b''.join(_export_line(show, EXPORT_TYPES['series']) for show in shows)
@@ -0,0 +1,151 @@
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+from services.log_and_progress import log_message
+from services.m3u_parser import (
+    SERIES_PATTERN,
+    SHOW_EPISODE_PATTERN,
+    find_record_boundaries,
+    iter_raw_entries,
+    normalize_show_name,
+    sanitize_filename,
+)
+
+
+class ClassifiedEntry(NamedTuple):
+    """A playlist entry classified once and shared by the STRM, JSON and DB stages."""
+    kind: str  # 'movies' or 'series'
+    name: str  # Sanitized name, also the .strm file name without extension
+    url: str
+    logo: Optional[str]
+    base_dir: str  # Provider results directory, one shared string per playlist
+    show_name: Optional[str] = None
+    season: Optional[str] = None  # Two-digit season number for episodes
+    episode: Optional[str] = None  # Two-digit episode number for episodes
+
+    @property
+    def dir_path(self) -> str:
+        """Directory holding the .strm file, derived on demand to keep records small."""
+        if self.kind == 'series':
+            return _season_dir(self.base_dir, self.show_name, self.season)
+        return os.path.join(self.base_dir, 'movies', self.name)
+
+    @property
+    def provider(self) -> str:
+        return os.path.basename(self.base_dir)
+
+    @property
+    def strm_path(self) -> str:
+        return os.path.join(self.dir_path, self.name + '.strm')
+
+    @property
+    def series_path(self) -> str:
+        return os.path.dirname(self.dir_path)
+
+
+@lru_cache(maxsize=65536)
+def _season_dir(base_dir, show_name, season):
+    return os.path.join(base_dir, 'series', show_name, f"Season {season}")
+
+
+def classify_entry(entry, base_dir) -> Optional[ClassifiedEntry]:
+    """Classify a parsed entry into a movie or an episode with its target path."""
+    name = entry.name
+    is_series = SERIES_PATTERN.search(name)
+
+    if is_series or 'Series' in entry.title:
+        match = SHOW_EPISODE_PATTERN.search(name)
+        if match:
+            show_name, season, episode = match.groups()
+            safe_show_name = normalize_show_name(show_name)
+        elif is_series:
+            season, episode = is_series.groups()
+            safe_show_name = normalize_show_name(name, full=True)
+        else:
+            log_message('Could not parse series ' + name, level='error')
+            return None
+
+        # Season and episode numbers repeat across the catalog, so share one string each
+        season = sys.intern(season.zfill(2))
+        episode = sys.intern(episode.zfill(2))
+        return ClassifiedEntry(
+            kind='series',
+            name=sanitize_filename(f"{safe_show_name} S{season} E{episode}"),
+            url=entry.url,
+            logo=entry.logo,
+            base_dir=base_dir,
+            show_name=safe_show_name,
+            season=season,
+            episode=episode,
+        )
+
+    safe_name = sanitize_filename(name)
+    return ClassifiedEntry(
+        kind='movies',
+        name=safe_name,
+        url=entry.url,
+        logo=entry.logo,
+        base_dir=base_dir,
+    )
+
+
+def _classify_range(file_path, start, end, base_dir):
+    """Process pool worker: parse and classify one byte range of the playlist."""
+    records = []
+    for entry in iter_raw_entries(file_path, start, end):
+        record = classify_entry(entry, base_dir)
+        if record is not None:
+            records.append(record)
+    return records
+
+
+def iter_classified(file_path, base_dir, workers=1):
+    """Stream the playlist and yield one ClassifiedEntry per usable entry.
+
+    With ``workers`` > 1 the file is split into #EXTINF aligned byte ranges that
+    are parsed in a process pool; records are still yielded in playlist order.
+    """
+    base_dir = os.path.normpath(base_dir)
+    if workers > 1:
+        yield from _iter_classified_parallel(file_path, base_dir, workers)
+        return
+
+    for entry in iter_raw_entries(file_path):
+        record = classify_entry(entry, base_dir)
+        if record is not None:
+            yield record
+
+
+def _iter_classified_parallel(file_path, base_dir, workers):
+    ranges = find_record_boundaries(file_path, workers * 4)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Keep a bounded window of chunks in flight so results are not all held at once
+        pending = deque()
+        for start, end in ranges:
+            pending.append(executor.submit(_classify_range, file_path, start, end, base_dir))
+            if len(pending) > workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def collect_by_kind(records, movies, series):
+    """Yield records unchanged while appending them to the movies or series list."""
+    for record in records:
+        if record.kind == 'series':
+            series.append(record)
+        else:
+            movies.append(record)
+        yield record
+
+
+def classify_m3u(file_path, base_dir, workers=1):
+    """Classify a whole playlist into lists of movie and episode records."""
+    movies, series = [], []
+    for _ in collect_by_kind(iter_classified(file_path, base_dir, workers), movies, series):
+        pass
+    return movies, series
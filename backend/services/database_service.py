@@ -1,16 +1,28 @@
 import os.path
 from services.databases import *
-from services.json_utils import load_json_file
+from services.json_utils import iter_catalog
 from bson import ObjectId
 from typing import Dict, Any, List
-from services.media_stream import get_video_info
+from services.probe_cache import cached_video_info
 from services.log_and_progress import log_message
-from services.json_utils import create_json
-from services.m3u_parser import parse_m3u
-from services.strm_utils import write_strm_files
+from services.json_utils import create_catalogs, build_catalogs, build_documents, write_catalog, movie_document
+from services.classifier import iter_classified, collect_by_kind, classify_m3u
+from services.snapshot import load_snapshot, save_snapshot, diff_snapshot
+from services.strm_utils import write_strm_files, prune_stale_files, remove_stale_files
+from services.strm_manifest import StrmManifest, load_manifest
 import asyncio
 import re
-from pymongo.errors import PyMongoError
+from services.probe_scheduler import ProbeJob, run_probes
+from services.catalog_cache import invalidate
+from services.catalog_export import export_catalog
+from services.pagination import fetch_page
+from services.storage import CatalogStore, catalog_store
+from services.episode_store import series_shell, sync_episodes, attach_episodes, delete_episodes, series_ids_with_episodes
+from datetime import datetime, timezone
+from services.dedup import (UNKNOWN, dedup_key, search_name, merge_movie, merge_series, drop_provider_movie,
+                            drop_provider_series, provider_urls_at_paths, provider_from_path, keyed_batch)
+from pymongo import DeleteOne, InsertOne, ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
 
 def serialize_basic_series(document):
     """Convert MongoDB document to a Series dict without seasons and episodes."""
@@ -49,67 +61,332 @@ def serialize_series(document: Dict[str, Any]) -> Dict[str, Any]:
     return document
 
 
+def serialize_episode(document):
+    """Convert an episode from the episodes collection to an Episode dict."""
+    document['id'] = str(document.pop('_id'))
+    document.pop('series_id', None)
+    return document
+
+
+async def serialize_series_documents(documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Serialize series documents, with their episodes attached in the normalized layout."""
+    if NORMALIZED_EPISODES:
+        await attach_episodes(documents)
+    return [serialize_series(document) for document in documents]
+
+
 def serialize_movie(document):
     """Convert MongoDB document to a Movie dict."""
     document['id'] = str(document['_id'])  # Convert ObjectId to string
     return document
 
 
-async def update_all_movies():
-    async for movie in movies_collection.find():
-        await update_movie_info(movie['_id'])
+async def _probe_jobs(collection, started, resolution_field='resolution'):
+    never_probed = {'$or': [{'duration': {'$exists': False}}, {'duration': UNKNOWN}]}
+    # Never-probed media first, then the rest; media probed since this run
+    # started are skipped so the second cursor does not repeat the first
+    for query in (never_probed, {'$nor': [never_probed], 'probed_at': {'$not': {'$gte': started}}}):
+        async for media in collection.find(query, {'url': 1}):
+            if media.get('url'):
+                yield ProbeJob(media['url'], collection, {'_id': media['_id']}, resolution_field=resolution_field)
 
 
-async def update_all_episodes():
-    async for series in series_collection.find():
-        for season in series['seasons']:
-            for episode in season['episodes']:
-                await update_episode_info(series['_id'], season['season'], episode['episode'])
+async def _movie_probe_jobs(started):
+    async for job in _probe_jobs(movies_collection, started):
+        yield job
 
 
-async def delete_all_media_path_regex(provider_name: str):
-    """
-    Deletes documents where the `path` field starts with the given path,
-    ensuring the path begins with 'results'.
+async def _episode_probe_jobs(started):
+    if NORMALIZED_EPISODES:
+        # Every episode is its own document, probed and updated like a movie
+        async for job in _probe_jobs(episodes_collection, started, 'quality'):
+            yield job
+        return
+    projection = {'seasons.episodes.url': 1, 'seasons.episodes.duration': 1, 'seasons.episodes.probed_at': 1}
+    for first_pass in (True, False):
+        async for series in series_collection.find({}, projection):
+            for season in series.get('seasons', []):
+                for episode in season.get('episodes', []):
+                    never_probed = episode.get('duration') in (None, UNKNOWN)
+                    probed_at = episode.get('probed_at')
+                    if (never_probed != first_pass or not episode.get('url')
+                            or (probed_at is not None and probed_at.replace(tzinfo=timezone.utc) >= started)):
+                        continue
+                    yield ProbeJob(episode['url'], series_collection, {'_id': series['_id']},
+                                   field_prefix='seasons.$[].episodes.$[episode].', resolution_field='quality',
+                                   array_filters=[{'episode.url': episode['url']}], array_path='seasons.episodes')
 
-    :param path: The path to use as a regex for deletion.
-    :raises ValueError: If the path does not start with 'results'.
-    :raises PyMongoError: If there is an error during the delete operation.
-    """
 
-    escaped_provider = re.escape(provider_name)
+async def update_all_movies() -> Dict[str, int]:
+    """Probe every movie's stream, never-probed ones first, and store duration and resolution."""
+    return await run_probes(_movie_probe_jobs(datetime.now(timezone.utc)))
+
 
-    # Construct a regex pattern to match paths containing both "results" and the provider name
-    regex_pattern = f"results.*{escaped_provider}"
+async def update_all_episodes() -> Dict[str, int]:
+    """Probe every episode's stream, never-probed ones first, and store duration and quality."""
+    return await run_probes(_episode_probe_jobs(datetime.now(timezone.utc)))
 
-    # Define the query
-    query = {"path": {"$regex": regex_pattern}}  # Case-insensitive matching
 
+async def insert_json_file(file_path: str, collection):
+    """Insert a movies or series catalog (JSON Lines, or a JSON array from older versions) into the collection."""
     try:
-        # Perform the delete operations concurrently
-        results = await asyncio.gather(
-            movies_collection.delete_many(query),
-            series_collection.delete_many(query),
-        )
+        # Files written before documents carried a provider get it from their results folder
+        provider = os.path.basename(os.path.dirname(os.path.normpath(file_path)))
+        counts = await insert_catalog(iter_catalog(file_path), collection, provider)
+        print(f"{file_path}: {counts['inserted']} inserted, {counts['updated']} updated, "
+              f"{counts['unchanged']} unchanged")
+    except Exception as e:
+        print(f"Failed to insert data from {file_path}. Error: {e}")
 
-        # Log the results
-        print(f"Deleted {results[0].deleted_count} entries from movies_collection.")
-        print(f"Deleted {results[1].deleted_count} entries from series_collection.")
 
-    except Exception as e:
-        print(f"Error deleting entries: {e}")
+CATALOG_BATCH_SIZE = 1000
+CATALOG_INSERT_CONCURRENCY = 4
 
 
-async def insert_json_file(file_path: str, collection):
-    """Insert a single JSON file into the specified MongoDB collection."""
+async def insert_catalog(documents, collection, provider: str = None,
+                         batch_size: int = CATALOG_BATCH_SIZE, concurrency: int = CATALOG_INSERT_CONCURRENCY):
+    """Insert a stream of documents in fixed-size batches with at most ``concurrency`` batches in flight.
+
+    Documents are spread over lanes by dedup key and each lane inserts its batches
+    one after the other, so copies of one title are never merged concurrently.
+    At most two batches per lane are held in memory whatever the catalog size.
+    Returns the inserted/updated/unchanged counts.
+    """
+    buffers = [[] for _ in range(concurrency)]
+    in_flight = [None] * concurrency
+    counts = {'inserted': 0, 'updated': 0, 'unchanged': 0}
+
+    async def flush(lane):
+        if in_flight[lane] is not None:
+            add_counts(counts, await in_flight[lane])
+        in_flight[lane] = asyncio.ensure_future(catalog_store().upsert(collection.name, buffers[lane]))
+        buffers[lane] = []
+
     try:
-        json_data = load_json_file(file_path)
-        if isinstance(json_data, list):
-            await collection.insert_many(json_data)
+        for document in documents:
+            if provider:
+                document.setdefault('provider', provider)
+            lane = hash(dedup_key(document)) % concurrency
+            buffers[lane].append(document)
+            if len(buffers[lane]) >= batch_size:
+                await flush(lane)
+        for lane in range(concurrency):
+            if buffers[lane]:
+                await flush(lane)
+        for lane_counts in await asyncio.gather(*[task for task in in_flight if task is not None]):
+            add_counts(counts, lane_counts)
+    except BaseException:
+        for task in in_flight:
+            if task is not None:
+                task.cancel()
+        raise
+    return counts
+
+
+DEDUP_BATCH_SIZE = 1000
+DUPLICATE_KEY_ERROR = 11000
+
+
+async def insert_documents(documents: List[Dict[str, Any]], collection) -> Dict[str, int]:
+    """Upsert documents built from classified entries into the specified MongoDB collection.
+
+    Titles that already exist, from this or another provider, are merged into the
+    canonical document which keeps the other copies as alternates. Documents are
+    keyed by their unique dedup key, so loading the same playlist again leaves the
+    collection size unchanged, and merges that change nothing are not written.
+    Returns the inserted/updated/unchanged counts.
+    """
+    await ensure_indexes()
+
+    counts = {'inserted': 0, 'updated': 0, 'unchanged': 0}
+    merge = merge_series if collection.name == series_collection.name else merge_movie
+    for start in range(0, len(documents), DEDUP_BATCH_SIZE):
+        batch = keyed_batch(documents[start:start + DEDUP_BATCH_SIZE], merge)
+        while batch:
+            batch = await _write_batch(batch, collection, merge, counts)
+    return counts
+
+
+async def _write_batch(batch: Dict[str, Dict[str, Any]], collection, merge, counts: Dict[str, int]):
+    """Merge one keyed batch into the stored documents.
+
+    Returns the documents another load inserted first, to be merged into its copy on
+    the next pass instead of replacing it.
+    """
+    # Normalized shows are stored without episodes, which are written separately
+    normalized = collection.name == series_collection.name and NORMALIZED_EPISODES
+    store = series_shell if normalized else (lambda document: document)
+    existing = {}
+    async for document in collection.find({'dedup_key': {'$in': list(batch)}}):
+        existing[document['dedup_key']] = document
+    if normalized:
+        await attach_episodes(list(existing.values()))
+
+    operations = []
+    changes = []  # (show, stored show) pairs whose episodes are written after the shows
+    now = datetime.now(timezone.utc)
+    for key, document in batch.items():
+        canonical = existing.get(key)
+        if canonical is None:
+            # Insert rather than upsert, a title added concurrently fails on the unique index
+            document['updated_at'] = now
+            operations.append(InsertOne(store(document)))
+            changes.append((document, None))
+            continue
+        merged = merge(canonical, document)
+        if merged == canonical:
+            counts['unchanged'] += 1
         else:
-            await collection.insert_one(json_data)
-    except Exception as e:
-        print(f"Failed to insert data from {file_path}. Error: {e}")
+            merged['updated_at'] = now  # Stamped after the comparison, exports filter on it
+            operations.append(ReplaceOne({'_id': canonical['_id']}, store(merged)))
+            changes.append((merged, canonical))
+    if not operations:
+        return {}
+
+    retry = {}
+    try:
+        result = (await collection.bulk_write(operations, ordered=False)).bulk_api_result
+    except BulkWriteError as e:
+        result = e.details
+        failed = set()
+        for error in result['writeErrors']:
+            if error['code'] != DUPLICATE_KEY_ERROR:
+                raise
+            failed.add(error['index'])
+        for index in failed:
+            document = changes[index][0]
+            document.pop('_id', None)
+            document.pop('updated_at', None)
+            retry[document['dedup_key']] = document
+        changes = [change for index, change in enumerate(changes) if index not in failed]
+    counts['inserted'] += result['nInserted']
+    counts['updated'] += result['nModified']
+    counts['unchanged'] += result['nMatched'] - result['nModified']
+    if normalized and changes:
+        new_keys = [show['dedup_key'] for show, stored in changes if stored is None]
+        async for document in collection.find({'dedup_key': {'$in': new_keys}}, {'dedup_key': 1}):
+            batch[document['dedup_key']]['_id'] = document['_id']
+        await sync_episodes(changes)
+    invalidate(collection.name)
+    return retry
+
+
+def add_counts(total: Dict[str, int], counts: Dict[str, int]) -> Dict[str, int]:
+    for key, value in counts.items():
+        total[key] = total.get(key, 0) + value
+    return total
+
+
+def sole_provider_query(provider: str) -> Dict[str, Any]:
+    """Documents whose every copy comes from ``provider``."""
+    return {'provider': provider, 'alternates': {'$in': [None, []]}}
+
+
+async def delete_documents(collection, query: Dict[str, Any]) -> int:
+    """delete_many that also removes the episodes of deleted shows in the normalized layout."""
+    if not (NORMALIZED_EPISODES and collection.name == series_collection.name):
+        result = await collection.delete_many(query)
+        invalidate(collection.name)
+        return result.deleted_count
+    series_ids = [document['_id'] async for document in collection.find(query, {'_id': 1})]
+    deleted = 0
+    for start in range(0, len(series_ids), DEDUP_BATCH_SIZE):
+        chunk = series_ids[start:start + DEDUP_BATCH_SIZE]
+        result = await collection.delete_many({'_id': {'$in': chunk}})
+        deleted += result.deleted_count
+        await delete_episodes(chunk)
+    invalidate(collection.name)
+    return deleted
+
+
+async def delete_provider_documents(providers: List[str]):
+    """Remove every document of the given providers, promoting other providers' copies of shared titles."""
+    # Documents stored before the provider field existed would not match the indexed deletes
+    await backfill_providers()
+    collections = (movies_collection, series_collection)
+    deleted = await asyncio.gather(*(delete_documents(collection, sole_provider_query(provider))
+                                     for provider in providers for collection in collections))
+    print(f"Deleted {sum(deleted)} documents held only by {', '.join(providers)}")
+    # Shared titles are rewritten one provider at a time, so no promotion overwrites another
+    for provider in providers:
+        for collection in collections:
+            await remove_provider_entries(collection, provider)
+
+
+async def remove_provider_entries(collection, provider: str, urls: List[str] = None, paths: List[str] = None):
+    """Remove a provider's copies from the collection, promoting alternates from other providers.
+
+    With ``urls`` only the copies with those URLs are removed, with ``paths`` only
+    the copies stored at those paths (movie folders or episode .strm files).
+    """
+    is_series = collection.name == series_collection.name
+    normalized = is_series and NORMALIZED_EPISODES
+    drop = drop_provider_series if is_series else drop_provider_movie
+    prefix = 'seasons.episodes.' if is_series else ''
+
+    selected, field = (urls, 'url') if paths is None else (paths, 'path')
+    if selected is None:
+        # Titles no other provider holds go in one indexed delete, only shared ones are rewritten
+        await delete_documents(collection, sole_provider_query(provider))
+        queries = [{'$or': [{'provider': provider}, {'alternates.provider': provider}]}]
+    else:
+        selected_set = set(selected)
+        queries = []
+        for start in range(0, len(selected), DEDUP_BATCH_SIZE):
+            chunk = selected[start:start + DEDUP_BATCH_SIZE]
+            if normalized:
+                # Episodes are looked up in their own collection, then their shows are rewritten
+                series_ids = await series_ids_with_episodes({'$or': [
+                    {field: {'$in': chunk}},
+                    {f'alternates.{field}': {'$in': chunk}},
+                ]})
+                queries.append({'_id': {'$in': series_ids}})
+                continue
+            queries.append({'$or': [
+                {f'{prefix}{field}': {'$in': chunk}},
+                {f'{prefix}alternates.{field}': {'$in': chunk}},
+            ]})
+
+    async def apply(documents):
+        if normalized:
+            await attach_episodes(documents)
+        operations = []
+        changes = []
+        deleted = []
+        for document in documents:
+            if selected is None:
+                drop_urls = None
+            elif paths is None:
+                drop_urls = selected_set
+            else:
+                drop_urls = provider_urls_at_paths(document, provider, selected_set)
+                if not drop_urls:
+                    continue
+            updated = drop(document, provider, drop_urls)
+            if updated is None:
+                operations.append(DeleteOne({'_id': document['_id']}))
+                deleted.append(document['_id'])
+            else:
+                updated['updated_at'] = datetime.now(timezone.utc)
+                operations.append(ReplaceOne({'_id': document['_id']}, series_shell(updated) if normalized else updated))
+                changes.append((updated, document))
+        if operations:
+            await collection.bulk_write(operations, ordered=False)
+        if normalized:
+            await sync_episodes(changes)
+            await delete_episodes(deleted)
+        if operations:
+            invalidate(collection.name)
+
+    for query in queries:
+        documents = []
+        async for document in collection.find(query):
+            documents.append(document)
+            if len(documents) >= DEDUP_BATCH_SIZE:
+                await apply(documents)
+                documents = []
+        if documents:
+            await apply(documents)
 
 
 async def insert_all_json_movies(file_paths: List[str]):
@@ -126,10 +403,7 @@ async def insert_all_json_series(file_paths: List[str]):
 
 
 async def find_series():
-    series = []
-    async for serie in series_collection.find():
-        series.append(serialize_series(serie))
-    return series
+    return await serialize_series_documents([serie async for serie in series_collection.find()])
 
 
 async def find_movies():
@@ -159,12 +433,175 @@ async def find_movies_by_url(url: str) -> Dict[str, Any]:
     return serialize_movie(movie) if movie else None
 
 
+def search_query(query: str) -> Dict[str, Any]:
+    """Index-backed title search: whole words through the text index, or a prefix of the normalized title.
+
+    Unlike the unanchored case-insensitive regex it replaces, this never scans the
+    collection, at the cost of not matching fragments from the middle of a word.
+    """
+    clauses = []
+    phrase = query.replace('"', ' ').strip()
+    if phrase:
+        clauses.append({'$text': {'$search': f'"{phrase}"'}})
+    prefix = search_name(query)
+    if prefix:
+        # Normalized titles only hold word characters and single spaces, so the prefix needs no
+        # escaping and stays a plain literal MongoDB can turn into index bounds
+        clauses.append({'search_name': {'$regex': '^' + prefix}})
+    return {'$or': clauses} if clauses else {'_id': None}
+
+
 async def find_series_by_name(name: str) -> List[Dict[str, Any]]:
     """Retrieve series by name from MongoDB and convert them to a list of dictionaries."""
-    series = []
-    async for doc in series_collection.find({"name": {"$regex": name, "$options": "i"}}):
-        series.append(serialize_series(doc))
-    return series
+    return await serialize_series_documents([doc async for doc in series_collection.find(search_query(name))])
+
+
+async def backfill_search_names():
+    """Add search_name to documents inserted before it existed."""
+    for collection in (movies_collection, series_collection):
+        operations = []
+        async for document in collection.find({'search_name': {'$exists': False}}, {'name': 1}):
+            operations.append(UpdateOne({'_id': document['_id']},
+                                        {'$set': {'search_name': search_name(document.get('name') or '')}}))
+            if len(operations) >= DEDUP_BATCH_SIZE:
+                await collection.bulk_write(operations, ordered=False)
+                operations = []
+        if operations:
+            await collection.bulk_write(operations, ordered=False)
+
+
+async def backfill_providers():
+    """Add provider to documents inserted before it existed, taken from their results path."""
+    for collection in (movies_collection, series_collection, episodes_collection):
+        operations = []
+        async for document in collection.find({'provider': None}):
+            provider = provider_from_path(document.get('path'))
+            if provider is None:
+                continue
+            fields = {'provider': provider}
+            if any('episodes' in season for season in document.get('seasons', [])):
+                fields['seasons'] = [
+                    {**season, 'episodes': [
+                        {**episode, 'provider': episode.get('provider') or provider_from_path(episode.get('path'))}
+                        for episode in season.get('episodes', [])
+                    ]}
+                    for season in document['seasons']
+                ]
+            operations.append(UpdateOne({'_id': document['_id']}, {'$set': fields}))
+            if len(operations) >= DEDUP_BATCH_SIZE:
+                await collection.bulk_write(operations, ordered=False)
+                operations = []
+        if operations:
+            await collection.bulk_write(operations, ordered=False)
+
+
+async def migrate_series_layout():
+    """Move episodes into or out of their collection when SERIES_LAYOUT changed since they were stored."""
+    if NORMALIZED_EPISODES:
+        query = {'seasons.episodes': {'$exists': True}}
+    elif await episodes_collection.estimated_document_count():
+        query = {'seasons.0': {'$exists': True}, 'seasons.episodes': {'$exists': False}}
+    else:
+        return
+
+    async def move(shows):
+        if NORMALIZED_EPISODES:
+            await sync_episodes((show, None) for show in shows)
+            operations = [UpdateOne({'_id': show['_id']}, {'$set': {'seasons': series_shell(show)['seasons']}})
+                          for show in shows]
+        else:
+            await attach_episodes(shows)
+            operations = [UpdateOne({'_id': show['_id']}, {'$set': {'seasons': show['seasons']}}) for show in shows]
+        await series_collection.bulk_write(operations, ordered=False)
+        if not NORMALIZED_EPISODES:
+            await delete_episodes([show['_id'] for show in shows])
+
+    moved = 0
+    shows = []
+    async for show in series_collection.find(query):
+        shows.append(show)
+        if len(shows) >= DEDUP_BATCH_SIZE:
+            await move(shows)
+            moved += len(shows)
+            shows = []
+    if shows:
+        await move(shows)
+        moved += len(shows)
+    if moved:
+        log_message(f"Moved the episodes of {moved} series to the {SERIES_LAYOUT} layout", level='info')
+
+
+async def merge_duplicate_titles():
+    """Merge documents sharing a dedup key, then make the key unique.
+
+    Older releases stored documents without a dedup key, and a non-unique index
+    let concurrent loads insert a title twice.
+    """
+    for collection, merge in ((movies_collection, merge_movie), (series_collection, merge_series)):
+        operations = []
+        async for document in collection.find({'dedup_key': {'$exists': False}}, {'name': 1, 'provider': 1}):
+            operations.append(UpdateOne({'_id': document['_id']}, {'$set': {'dedup_key': dedup_key(document)}}))
+            if len(operations) >= DEDUP_BATCH_SIZE:
+                await collection.bulk_write(operations, ordered=False)
+                operations = []
+        if operations:
+            await collection.bulk_write(operations, ordered=False)
+
+        merged_titles = 0
+        duplicates = collection.aggregate([
+            {'$group': {'_id': '$dedup_key', 'ids': {'$push': '$_id'}, 'count': {'$sum': 1}}},
+            {'$match': {'count': {'$gt': 1}}},
+        ], allowDiskUse=True)
+        async for group in duplicates:
+            copies = [document async for document in collection.find({'_id': {'$in': group['ids']}}).sort('_id', 1)]
+            is_normalized = NORMALIZED_EPISODES and collection.name == series_collection.name
+            if is_normalized:
+                await attach_episodes(copies)
+            canonical = copies[0]
+            merged = canonical
+            for copy in copies[1:]:
+                merged = merge(merged, {k: v for k, v in copy.items() if k != '_id'})
+            merged['updated_at'] = datetime.now(timezone.utc)
+            await collection.replace_one({'_id': canonical['_id']}, series_shell(merged) if is_normalized else merged)
+            extra_ids = [copy['_id'] for copy in copies[1:]]
+            if is_normalized:
+                await sync_episodes([(merged, canonical)])
+                await delete_episodes(extra_ids)
+            await collection.delete_many({'_id': {'$in': extra_ids}})
+            merged_titles += 1
+        if merged_titles:
+            log_message(f"Merged {merged_titles} titles stored more than once in {collection.name}", level='info')
+
+        index = (await collection.index_information()).get('dedup_key_1')
+        if index is not None and not index.get('unique'):
+            await collection.drop_index('dedup_key_1')
+        if index is None or not index.get('unique'):
+            await collection.create_index([('dedup_key', ASCENDING)], unique=True)
+
+
+async def migrate_documents():
+    """Bring documents from older releases up to the current schema."""
+    await migrate_series_layout()
+    await backfill_providers()
+    await backfill_search_names()
+    await merge_duplicate_titles()
+    invalidate()
+
+
+async def index_stats() -> Dict[str, List[Dict[str, Any]]]:
+    """Usage of every index since the server started, from $indexStats."""
+    stats = {}
+    for collection in (movies_collection, series_collection, episodes_collection):
+        stats[collection.name] = [
+            {
+                'name': index['name'],
+                'key': dict(index['key']),
+                'ops': index['accesses']['ops'],
+                'since': index['accesses']['since'].isoformat(),
+            }
+            async for index in collection.aggregate([{'$indexStats': {}}])
+        ]
+    return stats
 
 
 async def find_series_by_id(series_id: str) -> Dict[str, Any]:
@@ -174,16 +611,32 @@ async def find_series_by_id(series_id: str) -> Dict[str, Any]:
     except Exception:
         return None
     series = await series_collection.find_one({"_id": _id})
-    return serialize_series(series) if series else None
+    if not series:
+        return None
+    return (await serialize_series_documents([series]))[0]
 
 
 async def find_season_by_series_id_and_season_number(series_id: str, season_number: str) -> Dict[str, Any]:
     """Find a season by series ID and season number with leading zeros."""
     formatted_season_number = season_number.zfill(2)  # Ensure two-digit format
+    if NORMALIZED_EPISODES:
+        # The show only holds its season list, the episodes come from their own index
+        show = await series_collection.find_one({'_id': ObjectId(series_id)}, {'_id': 0, 'seasons': 1})
+        season = next((season for season in (show or {}).get('seasons', [])
+                       if season['season'] == formatted_season_number), None)
+        if season is None:
+            return None
+        cursor = episodes_collection.find({'series_id': ObjectId(series_id), 'season': formatted_season_number})
+        season['episodes'] = [serialize_episode(episode) async for episode in cursor.sort('episode', 1)]
+        return {'seasons': [season]}
+
     result = await series_collection.find_one(
         {'_id': ObjectId(series_id), 'seasons.season': formatted_season_number},
         {'_id': 0, 'seasons.$': 1}
     )
+    if result:
+        for episode in result['seasons'][0].get('episodes', []):
+            episode.setdefault('id', None)  # Embedded episodes have no id of their own
     return result
 
 
@@ -192,20 +645,34 @@ async def find_episode_by_series_id_season_and_episode_number(series_id: str, se
     """Find an episode by series ID, season number, and episode number with leading zeros."""
     formatted_season_number = season_number.zfill(2)  # Ensure two-digit format
     formatted_episode_number = episode_number.zfill(2)  # Ensure two-digit format
+    if NORMALIZED_EPISODES:
+        # One indexed lookup instead of loading the season
+        episode = await episodes_collection.find_one(
+            {'series_id': ObjectId(series_id), 'season': formatted_season_number, 'episode': formatted_episode_number})
+        return serialize_episode(episode) if episode else None
+
     result = await series_collection.find_one(
         {'_id': ObjectId(series_id), 'seasons.season': formatted_season_number,
          'seasons.episodes.episode': formatted_episode_number},
         {'_id': 0, 'seasons.$': 1}
     )
-    return result
+    if not result:
+        return None
+    episode = next((episode for episode in result['seasons'][0]['episodes']
+                    if episode['episode'] == formatted_episode_number), None)
+    if episode is not None:
+        episode.setdefault('id', None)  # Embedded episodes have no id of their own
+    return episode
 
 
-async def update_movie_info(movie_id: str):
+async def update_movie_info(movie_id: str, duration: str = None, resolution: str = None):
     """
     Fetch movie info, get video details, and update the movie record in the database.
     
     Args:
         movie_id (str): The string representation of the movie's ObjectId.
+        duration (str): Already probed duration, the stream is probed when omitted
+        resolution (str): Already probed resolution
     """
     try:
         # Fetch the movie data by ID
@@ -224,22 +691,30 @@ async def update_movie_info(movie_id: str):
             return
 
         # Get video info (duration and resolution)
-        print(f"Fetching video info for URL: {movie_url}")
-        duration, resolution = get_video_info(movie_url)
-        print(f"Video info retrieved - Duration: {duration}, Resolution: {resolution}")
+        if duration is None or resolution is None:
+            print(f"Fetching video info for URL: {movie_url}")
+            duration, resolution = await cached_video_info(movie_url)
+            print(f"Video info retrieved - Duration: {duration}, Resolution: {resolution}")
 
         if duration is None or resolution is None:
             print(f"Failed to retrieve video info for URL: {movie_url}")
             return
+        # A probe cache hit usually returns what the document already holds
+        if (movie_data.get('duration'), movie_data.get('resolution')) == (duration, resolution):
+            print(f"No changes made for movie ID: {movie_id} {resolution} {duration}")
+            return
 
         # Update the movie document in MongoDB
+        # Matches only while the stored values differ, so updated_at moves with them
         update_result = await movies_collection.update_one(
-            {"_id": ObjectId(movie_id)},
-            {"$set": {"duration": duration, "resolution": resolution}}
+            {"_id": ObjectId(movie_id), "$or": [{"duration": {"$ne": duration}}, {"resolution": {"$ne": resolution}}]},
+            {"$set": {"duration": duration, "resolution": resolution, "probed_at": datetime.now(timezone.utc),
+                      "updated_at": datetime.now(timezone.utc)}}
         )
 
         # Print the movie updates for resolution and duration
         if update_result.modified_count > 0:
+            invalidate(movies_collection.name)
             print(f"Movie updated: Resolution: {resolution}, Duration: {duration}")
         else:
             print(f"No changes made for movie ID: {movie_id} {resolution} {duration}")
@@ -250,26 +725,46 @@ async def update_movie_info(movie_id: str):
 
 async def update_episode_info(series_id: str, season_number: str, episode_number: str):
     """Fetch episode info, get video details, and update the episode record in the database."""
-    episode_data = await find_episode_by_series_id_season_and_episode_number(series_id, season_number, episode_number)
-    if episode_data:
-        episode = episode_data['seasons'][0]['episodes'][0]
-        duration, resolution = get_video_info(episode['url'])
-        episode['duration'] = duration
-        episode['quality'] = resolution
-        await series_collection.update_one(
+    episode = await find_episode_by_series_id_season_and_episode_number(series_id, season_number, episode_number)
+    if not episode:
+        return
+    duration, resolution = await cached_video_info(episode['url'])
+    if (episode.get('duration'), episode.get('quality')) == (duration, resolution):
+        return
+    if NORMALIZED_EPISODES:
+        update_result = await episodes_collection.update_one(
+            {'series_id': ObjectId(series_id), 'season': season_number.zfill(2), 'episode': episode_number.zfill(2),
+             '$or': [{'duration': {'$ne': duration}}, {'quality': {'$ne': resolution}}]},
+            {'$set': {'duration': duration, 'quality': resolution, 'probed_at': datetime.now(timezone.utc),
+                      'updated_at': datetime.now(timezone.utc)}}
+        )
+        if update_result.modified_count > 0:
+            await series_collection.update_one({'_id': ObjectId(series_id)},
+                                               {'$set': {'updated_at': datetime.now(timezone.utc)}})
+    else:
+        update_result = await series_collection.update_one(
             {
                 "_id": ObjectId(series_id),
-                "seasons.season": season_number.zfill(2),
-                "seasons.episodes.episode": episode_number.zfill(2)
+                "seasons": {"$elemMatch": {
+                    "season": season_number.zfill(2),
+                    "episodes": {"$elemMatch": {
+                        "episode": episode_number.zfill(2),
+                        "$or": [{"duration": {"$ne": duration}}, {"quality": {"$ne": resolution}}]
+                    }}
+                }}
             },
             {
                 "$set": {
                     "seasons.$.episodes.$[ep].duration": duration,
-                    "seasons.$.episodes.$[ep].quality": resolution
+                    "seasons.$.episodes.$[ep].quality": resolution,
+                    "seasons.$.episodes.$[ep].probed_at": datetime.now(timezone.utc),
+                    "updated_at": datetime.now(timezone.utc)
                 }
             },
             array_filters=[{"ep.episode": episode_number.zfill(2)}]
         )
+    if update_result.modified_count > 0:
+        invalidate(series_collection.name)
 
 
 async def update_series_info(series_id: str, duration: str, resolution: str):
@@ -287,14 +782,16 @@ async def update_series_info(series_id: str, duration: str, resolution: str):
 
         # Update the series document in MongoDB
         update_result = await series_collection.update_one(
-            {"_id": _id},
+            {"_id": _id, "$or": [{"duration": {"$ne": duration}}, {"resolution": {"$ne": resolution}}]},
             {"$set": {
                 "duration": duration,
-                "resolution": resolution
+                "resolution": resolution,
+                "updated_at": datetime.now(timezone.utc)
             }}
         )
 
         if update_result.modified_count > 0:
+            invalidate(series_collection.name)
             print(f"Series updated successfully - ID: {series_id}, Resolution: {resolution}, Duration: {duration}")
         else:
             print(f"No changes made for series ID: {series_id} (Document might not exist or values unchanged)")
@@ -304,7 +801,185 @@ async def update_series_info(series_id: str, duration: str, resolution: str):
         raise
 
 
-async def load_m3u(m3u_files):
+async def delete_provider_media(output_dir: str):
+    """Delete every movie and series document stored under a provider's results directory."""
+    query = {"path": {"$regex": '^' + re.escape(os.path.normpath(output_dir) + os.sep)}}
+    await asyncio.gather(
+        movies_collection.delete_many(query),
+        delete_documents(series_collection, query),
+    )
+    invalidate(movies_collection.name)
+
+
+async def remove_stale_documents(output_dir: str, stale_paths: List[str]):
+    """Drop the provider's database copies of pruned .strm files."""
+    output_dir = os.path.normpath(output_dir)
+    movies_dir = os.path.join(output_dir, 'movies') + os.sep
+    # Movie documents point at the movie folder, episodes at the .strm file itself
+    movie_paths = [os.path.dirname(path) for path in stale_paths if path.startswith(movies_dir)]
+    episode_paths = [path for path in stale_paths if not path.startswith(movies_dir)]
+    provider = os.path.basename(output_dir)
+    store = catalog_store()
+    await asyncio.gather(
+        store.remove_provider('movies', provider, paths=movie_paths),
+        store.remove_provider('series', provider, paths=episode_paths),
+    )
+
+
+async def refresh_m3u(m3u_file: str, output_dir: str, workers: int = 1,
+                      verify_manifest: bool = False, export_json: bool = False) -> Dict[str, Any]:
+    """Incrementally re-ingest a playlist against the provider's previous snapshot.
+
+    Only added, changed and removed entries are written to disk and MongoDB; with
+    ``export_json`` the catalogs are rewritten for the kinds that changed.
+    """
+    previous = load_snapshot(output_dir)
+    movies, series = classify_m3u(m3u_file, output_dir, workers)
+    diff = diff_snapshot(previous, movies + series)
+    if diff.is_empty:
+        return diff.counts()
+
+    # Disk: write the new and changed files, then drop the ones that disappeared or moved
+    # along with the folders they leave empty, as a full load's prune does
+    changed_records = [record for _, record in diff.changed]
+    written_records = diff.added + changed_records
+    manifest = load_manifest(output_dir, verify_manifest)
+    write_counts = write_strm_files(written_records, 'changes', max(1, os.cpu_count() - 2), manifest=manifest)
+    if previous:
+        # A path the playlist still lists must stay: a rotated URL is removed and added at the
+        # same path, and an unchanged entry can share the sanitized path of a removed one
+        claimed_paths = {row[3] for row in diff.snapshot.values()}
+        stale_paths = [row[3] for row in diff.removed]
+        stale_paths += [old_row[3] for old_row, record in diff.changed if old_row[3] != record.strm_path]
+        remove_stale_files(manifest, [path for path in stale_paths if path not in claimed_paths])
+    elif written_records and not write_counts['errors']:
+        # Without a snapshot every entry was written, files no entry claimed are left from earlier runs
+        prune_stale_files(manifest)
+    manifest.save()
+
+    old_rows = diff.removed + [old_row for old_row, _ in diff.changed]
+    new_records = diff.added + changed_records
+    provider = os.path.basename(os.path.normpath(output_dir))
+    store = catalog_store()
+
+    if not previous:
+        # No snapshot yet: replace whatever an earlier full load inserted for this provider
+        build = create_catalogs if export_json else lambda records, _: build_catalogs(records)
+        movie_documents, series_documents = build(movies + series, output_dir)
+        await store.remove_provider('movies', provider)
+        await store.remove_provider('series', provider)
+        await store.delete_provider_media(output_dir)
+        documents = add_counts(await store.upsert('movies', movie_documents),
+                               await store.upsert('series', series_documents))
+        save_snapshot(output_dir, diff.snapshot)
+        return {**diff.counts(), 'documents': documents}
+
+    documents = {'inserted': 0, 'updated': 0, 'unchanged': 0}
+
+    for kind, records in (('movies', movies), ('series', series)):
+        old_urls = [row[2] for row in old_rows if row[1] == kind]
+        new_kind_records = [record for record in new_records if record.kind == kind]
+        if not old_urls and not new_kind_records:
+            continue
+        # Drop this provider's previous copies, then merge the new ones back in;
+        # shows only receive the episodes that changed
+        if export_json:
+            write_catalog(build_documents(records, kind), output_dir, kind)
+        if old_urls:
+            await store.remove_provider(kind, provider, old_urls)
+        add_counts(documents, await store.upsert(kind, build_documents(new_kind_records, kind)))
+
+    save_snapshot(output_dir, diff.snapshot)
+    return {**diff.counts(), 'documents': documents}
+
+
+INGEST_BATCH_SIZE = 1000
+
+
+async def ingest_records(records, manifest: StrmManifest, max_workers: int,
+                         batch_size: int = INGEST_BATCH_SIZE) -> Dict[str, Any]:
+    """Write .strm files and insert documents while the playlist is still being parsed.
+
+    The parser and the STRM writer run in a worker thread that hands every
+    ``batch_size`` records of a kind to a consumer per collection over a bounded
+    queue, so the first documents reach MongoDB within seconds and neither the
+    documents nor a JSON round trip are ever held for the whole playlist.
+    """
+    loop = asyncio.get_running_loop()
+    queues = {'movies': asyncio.Queue(maxsize=4), 'series': asyncio.Queue(maxsize=4)}
+    batches = {'movies': [], 'series': []}
+    totals = {'movies': 0, 'series': 0}
+
+    def send(kind, item):
+        # Blocks the parser thread while the consumer is behind
+        asyncio.run_coroutine_threadsafe(queues[kind].put(item), loop).result()
+
+    def tee():
+        for record in records:
+            yield record
+            batch = batches[record.kind]
+            batch.append(record)
+            totals[record.kind] += 1
+            if len(batch) >= batch_size:
+                batches[record.kind] = []
+                send(record.kind, batch)
+
+    def produce():
+        try:
+            counts = write_strm_files(tee(), 'media', max_workers, manifest=manifest)
+            for kind, batch in batches.items():
+                if batch:
+                    send(kind, batch)
+            return counts
+        finally:
+            for kind in queues:
+                send(kind, None)
+
+    store = catalog_store()
+
+    async def consume(kind):
+        error = None
+        counts = {'inserted': 0, 'updated': 0, 'unchanged': 0}
+        while True:
+            batch = await queues[kind].get()
+            if batch is None:
+                break
+            if error is not None:
+                continue  # Keep draining so the parser thread is never left blocked
+            try:
+                if kind == 'movies':
+                    documents = [movie_document(record) for record in batch]
+                else:
+                    # Episodes of a show listed across batches are merged into one document
+                    documents = build_catalogs(batch, progress=False)[1]
+                add_counts(counts, await store.upsert(kind, documents))
+            except Exception as e:
+                error = e
+        if error is not None:
+            raise error
+        return counts
+
+    stream_counts, movie_counts, series_counts = await asyncio.gather(
+        asyncio.to_thread(produce),
+        consume('movies'),
+        consume('series'),
+    )
+    return {**stream_counts, **totals, 'documents': add_counts(movie_counts, series_counts)}
+
+
+async def load_m3u(m3u_files, workers: int = 1, incremental: bool = False,
+                   verify_manifest: bool = False, prune_dry_run: bool = False,
+                   export_json: bool = False) -> Dict[str, Dict[str, Any]]:
+    """Parse, write and insert each playlist; ``workers`` > 1 parses in a process pool.
+
+    With ``incremental`` only the differences to the previous load are applied and
+    the added/changed/removed counts are returned per file. ``verify_manifest``
+    rebuilds each provider's STRM manifest from the files on disk first. A full
+    load prunes the streams and documents of entries gone from the playlist;
+    ``prune_dry_run`` only reports them. ``export_json`` also writes the
+    movies/series catalogs to the results folder.
+    """
+    summary = {}
     for m3u_file in m3u_files:
         m3u_file = os.path.normpath(m3u_file)
         try:
@@ -312,38 +987,105 @@ async def load_m3u(m3u_files):
             output_dir = f'./results/Result_{base_name}'
             log_message(f"Processing m3u File: {m3u_file}", level='info')
 
-            movies, series = parse_m3u(m3u_file)
+            if incremental:
+                counts = await refresh_m3u(m3u_file, output_dir, workers, verify_manifest, export_json)
+                summary[m3u_file] = counts
+                log_message(f"Incremental refresh of {m3u_file}: {counts['added']} added, {counts['changed']} changed, "
+                            f"{counts['removed']} removed, {counts['unchanged']} unchanged", level='info')
+                continue
+
+            records = iter_classified(m3u_file, output_dir, workers)
+            movies, series = [], []
+            if export_json:
+                records = collect_by_kind(records, movies, series)
             max_workers = max(1, os.cpu_count() - 2)
-            write_strm_files(movies, output_dir, 'movies', max_workers)
-            write_strm_files(series, output_dir, 'series', max_workers)
-            if not os.path.exists(output_dir):
-                os.makedirs(output_dir)
-
-            create_json(movies, output_dir, 'movies')
-            print('Movies JSON created successfully')
-            create_json(series, output_dir, 'series')
-            print('Series JSON created successfully')
-
-            movies_json_path = os.path.normpath(os.path.join(output_dir, 'movies.json'))
-            
-            series_json_path = os.path.normpath(os.path.join(output_dir, 'series.json'))
-            if os.path.exists(movies_json_path):
-                print(f"Found movies JSON file: {movies_json_path}")
-            else:
-                print(f"Movies JSON file not found in {output_dir}")
-
-            if os.path.exists(series_json_path):
-
-                print(f"Found series JSON file: {series_json_path}")
+            manifest = load_manifest(output_dir, verify_manifest)
+            counts = await ingest_records(records, manifest, max_workers)
+            total = counts['movies'] + counts['series']
+            documents = counts['documents']
+            print(f"Ingested {counts['movies']} movie and {counts['series']} episode entries from {m3u_file}: "
+                  f"{documents['inserted']} documents inserted, {documents['updated']} updated, "
+                  f"{documents['unchanged']} unchanged")
+
+            prune_report = None
+            if total and not counts['errors']:
+                prune_report = prune_stale_files(manifest, prune_dry_run)
             else:
-                print(f"Series JSON file not found in {output_dir}")
-
-            # Insert all found movies JSON files
-            print(f"Inserting movies JSON file: {movies_json_path}")
-            await insert_all_json_movies([movies_json_path])
-            # Insert all found series JSON files
-            print(f"Inserting series JSON file: {series_json_path}")
-            await insert_all_json_series([series_json_path])
+                log_message(f"Skipping the prune of {output_dir}: the playlist was empty or streams failed to write",
+                            level='warning')
+            manifest.save()
+
+            if export_json:
+                create_catalogs(movies + series, output_dir)
+                print('Movies and series JSON created successfully')
+
+            summary[m3u_file] = {'added': documents['inserted'], 'changed': documents['updated'], 'removed': 0,
+                                 'unchanged': documents['unchanged'], 'documents': documents}
+            if prune_report is not None:
+                if not prune_dry_run:
+                    await remove_stale_documents(output_dir, prune_report['files'])
+                summary[m3u_file]['removed'] = len(prune_report['files'])
+                summary[m3u_file]['prune'] = prune_report
             log_message(f"Processing completed for: {m3u_file}", level='info')
         except Exception as e:
             log_message(f"Error processing {m3u_file}: {str(e)}", level='error')
+    return summary
+
+
+class MongoCatalogStore(CatalogStore):
+    """The MongoDB collections, through the functions of this module."""
+
+    name = 'mongo'
+    probing = True
+
+    @staticmethod
+    def _collection(kind):
+        return movies_collection if kind == 'movies' else series_collection
+
+    async def prepare(self):
+        await asyncio.gather(ensure_indexes(), warm_pool())
+        # Older documents are brought up to date in the background, the API is usable meanwhile
+        return asyncio.create_task(migrate_documents())
+
+    async def close(self):
+        client.close()
+
+    async def upsert(self, kind, documents):
+        return await insert_documents(documents, self._collection(kind))
+
+    async def remove_provider(self, kind, provider, urls=None, paths=None):
+        await remove_provider_entries(self._collection(kind), provider, urls, paths)
+
+    async def delete_providers(self, providers):
+        await delete_provider_documents(providers)
+
+    async def delete_provider_media(self, output_dir):
+        await delete_provider_media(output_dir)
+
+    async def get_movie(self, movie_id):
+        return await find_movies_by_id(movie_id)
+
+    async def get_series(self, series_id):
+        return await find_series_by_id(series_id)
+
+    async def get_season(self, series_id, season_number):
+        season_doc = await find_season_by_series_id_and_season_number(series_id, season_number)
+        return season_doc['seasons'][0] if season_doc else None
+
+    async def get_episode(self, series_id, season_number, episode_number):
+        return await find_episode_by_series_id_season_and_episode_number(series_id, season_number, episode_number)
+
+    async def page(self, kind, sort, size, after=None, skip=0, search=None, basic=False):
+        # Served by the text and search_name indexes instead of a collection scan
+        query = search_query(search) if search else {}
+        projection = {'seasons': 0} if basic and kind == 'series' else None
+        documents, next_position = await fetch_page(self._collection(kind), query, sort, size, after, skip,
+                                                    projection)
+        if kind == 'movies':
+            return [serialize_movie(document) for document in documents], next_position
+        if basic:
+            return [serialize_basic_series(document) for document in documents], next_position
+        return await serialize_series_documents(documents), next_position
+
+    def export(self, types, provider=None, since=None):
+        return export_catalog(types, provider, since)
@@ -1,7 +1,9 @@
 import os
 from dotenv import load_dotenv, find_dotenv
-from pymongo import MongoClient
+from pymongo import MongoClient, ASCENDING, TEXT, IndexModel
+from pymongo.errors import OperationFailure
 import motor.motor_asyncio
+import asyncio
 
 # Load environment variables from a .env file
 load_dotenv(find_dotenv())
@@ -18,4 +20,88 @@ client = motor.motor_asyncio.AsyncIOMotorClient(connection_string)
 
 m3u4strm_db = client['m3u4strm']
 movies_collection = m3u4strm_db['movies']
-series_collection = m3u4strm_db['series']
\ No newline at end of file
+series_collection = m3u4strm_db['series']
+probe_cache_collection = m3u4strm_db['probe_cache']
+episodes_collection = m3u4strm_db['episodes']
+
+# 'embedded' stores episodes inside their series document, 'normalized' stores them
+# in the episodes collection and keeps only the season list in the series document
+SERIES_LAYOUT = os.environ.get('SERIES_LAYOUT', 'embedded').lower()
+NORMALIZED_EPISODES = SERIES_LAYOUT == 'normalized'
+# Indexes behind the lookups in database_service and the search route. Key
+# patterns keep pymongo's default names so indexes created earlier are reused;
+# the dedup_key index of older releases is made unique by migrate_documents.
+SEARCH_INDEXES = [
+    IndexModel([('search_name', ASCENDING)]),
+    # 'none' disables stemming and stop words, titles mix languages
+    IndexModel([('name', TEXT)], default_language='none'),
+]
+MOVIE_INDEXES = SEARCH_INDEXES + [
+    IndexModel([('dedup_key', ASCENDING)], unique=True),
+    IndexModel([('name', ASCENDING)]),
+    # Keyset pagination by name, see services.pagination
+    IndexModel([('name', ASCENDING), ('_id', ASCENDING)]),
+    IndexModel([('url', ASCENDING)]),
+    IndexModel([('path', ASCENDING)]),
+    IndexModel([('alternates.url', ASCENDING)]),
+    IndexModel([('alternates.path', ASCENDING)]),
+    IndexModel([('provider', ASCENDING)]),
+    IndexModel([('alternates.provider', ASCENDING)]),
+    IndexModel([('updated_at', ASCENDING)]),
+]
+SERIES_INDEXES = SEARCH_INDEXES + [
+    IndexModel([('dedup_key', ASCENDING)], unique=True),
+    IndexModel([('name', ASCENDING), ('_id', ASCENDING)]),
+    IndexModel([('path', ASCENDING)]),
+    IndexModel([('seasons.episodes.url', ASCENDING)]),
+    IndexModel([('seasons.episodes.path', ASCENDING)]),
+    IndexModel([('seasons.episodes.alternates.url', ASCENDING)]),
+    IndexModel([('seasons.episodes.alternates.path', ASCENDING)]),
+    IndexModel([('provider', ASCENDING)]),
+    IndexModel([('alternates.provider', ASCENDING)]),
+    IndexModel([('updated_at', ASCENDING)]),
+]
+EPISODE_INDEXES = [
+    IndexModel([('series_id', ASCENDING), ('season', ASCENDING), ('episode', ASCENDING)], unique=True),
+    IndexModel([('url', ASCENDING)]),
+    IndexModel([('path', ASCENDING)]),
+    IndexModel([('alternates.url', ASCENDING)]),
+    IndexModel([('alternates.path', ASCENDING)]),
+    IndexModel([('updated_at', ASCENDING)]),
+]
+
+PROBE_CACHE_INDEXES = [
+    # MongoDB drops entries once expires_at has passed
+    IndexModel([('expires_at', ASCENDING)], expireAfterSeconds=0),
+    IndexModel([('created_at', ASCENDING)]),
+]
+
+# Connections opened at startup, so the first requests do not wait for the handshake
+MONGODB_WARM_CONNECTIONS = int(os.environ.get('MONGODB_WARM_CONNECTIONS', '4'))
+
+_indexes_ensured = False
+
+
+async def warm_pool(connections: int = MONGODB_WARM_CONNECTIONS):
+    """Open pooled connections ahead of the first requests; each concurrent ping checks out its own."""
+    await asyncio.gather(*(client.admin.command('ping') for _ in range(connections)))
+
+
+async def ensure_indexes():
+    """Create the declared indexes once per process; existing ones are left untouched.
+
+    Connection errors propagate and leave the indexes to the next call, e.g. the retried warm-up.
+    """
+    global _indexes_ensured
+    if _indexes_ensured:
+        return
+    for collection, indexes in ((movies_collection, MOVIE_INDEXES), (series_collection, SERIES_INDEXES),
+                                (episodes_collection, EPISODE_INDEXES),
+                                (probe_cache_collection, PROBE_CACHE_INDEXES)):
+        for index in indexes:
+            # One at a time, so a conflicting index from an older setup only skips itself
+            try:
+                await collection.create_indexes([index])
+            except OperationFailure as e:
+                print(f"Could not create index {index.document['name']} on {collection.name}: {e}")
+    _indexes_ensured = True
@@ -0,0 +1,268 @@
+import os
+import re
+from functools import lru_cache
+
+# Deduplicate identical titles across providers unless disabled
+DEDUPLICATE_PROVIDERS = os.environ.get('DEDUPLICATE_PROVIDERS', 'true').lower() not in ('0', 'false', 'no')
+
+YEAR_PATTERN = re.compile(r'[(\[]?\b((?:19|20)\d{2})\b[)\]]?')
+LANGUAGE_PREFIX_PATTERN = re.compile(r'^\|?[A-Za-z]{2,3}\|?\s*[-|:]\s+')
+QUALITY_TAG_PATTERN = re.compile(r'\b(?:4k|uhd|fhd|hd|sd|hevc|x264|x265|h264|h265|1080p|720p|2160p|multi[ -]?sub)\b')
+NON_ALNUM_PATTERN = re.compile(r'[\W_]+')
+
+UNKNOWN = 'Unknown'  # Placeholder for duration/resolution until the stream is probed
+
+
+def provider_priority():
+    """Provider names from PROVIDER_PRIORITY, highest priority first."""
+    names = os.environ.get('PROVIDER_PRIORITY', '')
+    return [name.strip() for name in names.split(',') if name.strip()]
+
+
+def provider_rank(provider):
+    """Lower is better; providers missing from PROVIDER_PRIORITY rank after listed ones."""
+    priority = provider_priority()
+    for candidate in (provider, (provider or '')[len('Result_'):]):
+        if candidate in priority:
+            return priority.index(candidate)
+    return len(priority)
+
+
+@lru_cache(maxsize=65536)
+def normalize_title(name):
+    """Return ``(normalized title, year)`` for matching the same title across providers."""
+    name = LANGUAGE_PREFIX_PATTERN.sub('', name)
+    years = YEAR_PATTERN.findall(name)
+    year = years[-1] if years else ''
+    if year:
+        name = YEAR_PATTERN.sub(' ', name)
+    name = QUALITY_TAG_PATTERN.sub(' ', name.lower())
+    return ' '.join(NON_ALNUM_PATTERN.sub(' ', name).split()), year
+
+
+def search_name(name):
+    """Lower-cased title without year, language prefix or quality tags, for prefix search."""
+    return normalize_title(name)[0]
+
+
+def dedup_key(document):
+    """Key shared by every provider's copy of a movie or show."""
+    title, year = normalize_title(document['name'])
+    key = f"{title}|{year}"
+    if not DEDUPLICATE_PROVIDERS:
+        key = f"{document.get('provider')}|{key}"
+    return key
+
+
+def keyed_batch(documents, merge):
+    """Stamp dedup_key and search_name on new documents and merge the copies of a title within the batch."""
+    batch = {}
+    for document in documents:
+        key = document['dedup_key'] = dedup_key(document)
+        document['search_name'] = search_name(document['name'])
+        # Catalogs from older versions lack alternates; stored documents always carry them
+        document.setdefault('alternates', [])
+        batch[key] = merge(batch[key], document) if key in batch else document
+    return batch
+
+
+def document_providers(document):
+    """Every provider holding a copy of a movie or show, the primary one and the alternates."""
+    providers = {alternate.get('provider') for alternate in document.get('alternates', [])}
+    providers.add(document.get('provider'))
+    providers.discard(None)
+    return providers
+
+
+def _alternate(entry, provider):
+    alternate = {'provider': provider, 'url': entry.get('url'), 'path': entry.get('path')}
+    if entry.get('logo'):
+        alternate['logo'] = entry['logo']
+    return alternate
+
+
+def _merge_playable(canonical, incoming):
+    """Merge two copies of a movie or episode; the better ranked provider stays primary."""
+    provider = incoming.get('provider')
+    if canonical.get('provider') == provider:
+        # A reload of the same provider replaces its copy, URLs rotate between playlist versions
+        if canonical.get('url') == incoming.get('url'):
+            # and must not reset what probing already filled in for an unchanged stream
+            merged = {**canonical, **{k: v for k, v in incoming.items()
+                                      if k != 'alternates' and not (v == UNKNOWN and canonical.get(k))}}
+        else:
+            merged = {k: v for k, v in incoming.items() if k != 'alternates'}
+            if '_id' in canonical:
+                merged['_id'] = canonical['_id']
+        merged['alternates'] = []
+        seen = set()
+        for alternate in canonical.get('alternates', []) + incoming.get('alternates', []):
+            identity = (alternate.get('provider'), alternate.get('url'))
+            if alternate.get('provider') != provider and identity not in seen:
+                seen.add(identity)
+                merged['alternates'].append(alternate)
+        return merged
+
+    if provider_rank(incoming.get('provider')) < provider_rank(canonical.get('provider')):
+        winner, loser = incoming, canonical
+    else:
+        winner, loser = canonical, incoming
+
+    merged = {k: v for k, v in winner.items() if k != 'alternates'}
+    if '_id' in canonical:
+        merged['_id'] = canonical['_id']
+    # The incoming copy also supersedes what its provider held as an alternate
+    alternates = [alternate for alternate in canonical.get('alternates', [])
+                  if alternate.get('provider') != provider] + incoming.get('alternates', []) + [
+        _alternate(loser, loser.get('provider'))]
+    seen = {(winner.get('provider'), winner.get('url'))}
+    merged['alternates'] = []
+    for alternate in alternates:
+        identity = (alternate.get('provider'), alternate.get('url'))
+        if identity not in seen:
+            seen.add(identity)
+            merged['alternates'].append(alternate)
+    return merged
+
+
+def merge_movie(canonical, incoming):
+    return _merge_playable(canonical, incoming)
+
+
+def merge_series(canonical, incoming):
+    """Merge a provider's copy of a show into the canonical show document."""
+    if (incoming.get('provider') == canonical.get('provider')
+            or provider_rank(incoming.get('provider')) < provider_rank(canonical.get('provider'))):
+        primary, secondary = incoming, canonical
+    else:
+        primary, secondary = canonical, incoming
+
+    if primary is incoming and incoming.get('provider') == canonical.get('provider'):
+        # A reload of the same provider overlays its catalog fields on the stored show, which
+        # keeps updated_at and what probing filled in, as _merge_playable does for movies
+        merged = {k: v for k, v in canonical.items() if k not in ('seasons', 'alternates')}
+        merged.update({k: v for k, v in incoming.items()
+                       if k not in ('seasons', 'alternates') and not (v == UNKNOWN and canonical.get(k))})
+    else:
+        merged = {k: v for k, v in primary.items() if k not in ('seasons', 'alternates')}
+    if '_id' in canonical:
+        merged['_id'] = canonical['_id']
+    if not merged.get('image'):
+        merged['image'] = secondary.get('image')
+
+    seasons = {}
+    for show in (primary, secondary):
+        for season in show.get('seasons', []):
+            seasons.setdefault(season['season'], {'season': season['season'], 'path': season['path'],
+                                                  'episodes': {}})
+    # Episodes merge in arrival order, the newer copy of a provider replaces its older one
+    for show in (canonical, incoming):
+        for season in show.get('seasons', []):
+            target = seasons[season['season']]
+            for episode in season.get('episodes', []):
+                existing = target['episodes'].get(episode['episode'])
+                target['episodes'][episode['episode']] = (
+                    episode if existing is None else _merge_playable(existing, episode))
+    merged['seasons'] = [
+        {**season, 'episodes': list(season['episodes'].values())}
+        for _, season in sorted(seasons.items())
+    ]
+
+    # Show level alternates record every other provider contributing episodes
+    alternates = {}
+    for show in (canonical, incoming):
+        for alternate in show.get('alternates', []) + [{'provider': show.get('provider'), 'path': show.get('path')}]:
+            if alternate.get('provider') != merged.get('provider'):
+                alternates[alternate.get('provider')] = alternate
+    merged['alternates'] = list(alternates.values())
+    return merged
+
+
+def _drop_from_playable(entry, provider, urls):
+    """Remove a provider's copy from a movie or episode, promoting the best alternate if needed."""
+    def matches(candidate):
+        return candidate.get('provider') == provider and (urls is None or candidate.get('url') in urls)
+
+    alternates = [alternate for alternate in entry.get('alternates', []) if not matches(alternate)]
+    if not matches(entry):
+        return {**entry, 'alternates': alternates}
+    if not alternates:
+        return None
+
+    best = min(alternates, key=lambda alternate: provider_rank(alternate.get('provider')))
+    alternates.remove(best)
+    promoted = {**entry, 'provider': best['provider'], 'url': best['url'], 'path': best['path'],
+                'alternates': alternates}
+    if best.get('logo'):
+        promoted['logo'] = best['logo']
+    return promoted
+
+
+def playable_copies(document):
+    """Every provider's copy of a movie or of a show's episodes, the primary ones and the alternates."""
+    playables = [document]
+    for season in document.get('seasons', []):
+        playables.extend(season.get('episodes', []))
+    for playable in playables:
+        yield playable
+        yield from playable.get('alternates', [])
+
+
+def provider_urls_at_paths(document, provider, paths):
+    """URLs of the provider's copies of a movie or of a show's episodes stored at ``paths``."""
+    return {copy['url'] for copy in playable_copies(document)
+            if copy.get('provider') == provider and copy.get('path') in paths and copy.get('url')}
+
+
+def provider_from_path(path):
+    """Provider folder of a path like results/<provider>/movies/..., or None."""
+    parts = re.split(r'[\\/]', path or '')
+    for index in range(len(parts) - 1, 0, -1):
+        if parts[index] in ('movies', 'series'):
+            return parts[index - 1] or None
+    return None
+
+
+def drop_provider_movie(document, provider, urls=None):
+    """Return the movie without the provider's copies, or None when nothing is left."""
+    return _drop_from_playable(document, provider, urls)
+
+
+def drop_provider_series(document, provider, urls=None):
+    """Return the show without the provider's episodes, or None when nothing is left."""
+    seasons = []
+    providers = set()
+    for season in document.get('seasons', []):
+        episodes = []
+        for episode in season.get('episodes', []):
+            episode = _drop_from_playable(episode, provider, urls)
+            if episode is not None:
+                episodes.append(episode)
+                providers.add(episode.get('provider'))
+        if episodes:
+            seasons.append({**season, 'episodes': episodes})
+    if not seasons:
+        return None
+
+    show_paths = {alternate.get('provider'): alternate.get('path') for alternate in document.get('alternates', [])}
+    show_paths[document.get('provider')] = document.get('path')
+    updated = {**document, 'seasons': seasons}
+    if document.get('provider') not in providers:
+        best = min(providers, key=provider_rank)
+        updated['provider'] = best
+        updated['path'] = show_paths.get(best, document.get('path'))
+
+    # Seasons whose folder belonged to a dropped copy point at a remaining provider's folder
+    for season in seasons:
+        season_providers = {episode.get('provider') for episode in season['episodes']}
+        owner = next((name for name, path in show_paths.items()
+                      if path and season['path'].startswith(path + os.sep)), None)
+        if owner not in season_providers:
+            new_owner = min(season_providers, key=provider_rank)
+            season['path'] = os.path.join(show_paths.get(new_owner, updated['path']), f"Season {season['season']}")
+
+    updated['alternates'] = [
+        {'provider': name, 'path': path} for name, path in show_paths.items()
+        if name in providers and name != updated['provider']
+    ]
+    return updated
@@ -0,0 +1,92 @@
+from collections import defaultdict
+from typing import Any, Dict, List
+
+from pymongo import DeleteOne, ReplaceOne
+
+from services.databases import episodes_collection
+
+EPISODE_BATCH_SIZE = 1000
+UNCOMPARED_FIELDS = ('_id', 'series_id')
+
+
+def series_shell(document: Dict[str, Any]) -> Dict[str, Any]:
+    """The series document as stored in the normalized layout, seasons without their episodes."""
+    return {**document, 'seasons': [{k: v for k, v in season.items() if k != 'episodes'}
+                                     for season in document.get('seasons', [])]}
+
+
+def _without(document: Dict[str, Any], fields) -> Dict[str, Any]:
+    return {k: v for k, v in document.items() if k not in fields}
+
+
+def episode_key(series_id, season: str, episode: str) -> Dict[str, Any]:
+    return {'series_id': series_id, 'season': season, 'episode': episode}
+
+
+def episode_operations(show: Dict[str, Any], previous: Dict[str, Any] = None) -> List[Any]:
+    """Bulk operations turning the stored episodes of ``previous`` into those of ``show``.
+
+    Both are full series documents with their episodes attached; ``previous`` is
+    None for a show that had no episodes stored yet. Unchanged episodes are skipped.
+    """
+    stored = {}
+    for season in (previous or {}).get('seasons', []):
+        for episode in season.get('episodes', []):
+            stored[(season['season'], episode['episode'])] = episode
+
+    operations = []
+    for season in show.get('seasons', []):
+        for episode in season.get('episodes', []):
+            old = stored.pop((season['season'], episode['episode']), None)
+            # The replacement never carries _id, so an existing episode keeps its own
+            document = {k: v for k, v in episode.items() if k != '_id'}
+            document.update(episode_key(show['_id'], season['season'], episode['episode']))
+            # attach_episodes drops series_id from the stored episodes, so it is left out of the comparison
+            if old is not None and _without(old, UNCOMPARED_FIELDS) == _without(document, UNCOMPARED_FIELDS):
+                continue
+            operations.append(ReplaceOne(episode_key(show['_id'], season['season'], episode['episode']),
+                                         document, upsert=True))
+    for (season, episode) in stored:
+        operations.append(DeleteOne(episode_key(show['_id'], season, episode)))
+    return operations
+
+
+async def sync_episodes(changes) -> None:
+    """Store the episodes of ``(show, previous)`` pairs, see ``episode_operations``."""
+    operations = []
+    for show, previous in changes:
+        operations.extend(episode_operations(show, previous))
+        if len(operations) >= EPISODE_BATCH_SIZE:
+            await episodes_collection.bulk_write(operations, ordered=False)
+            operations = []
+    if operations:
+        await episodes_collection.bulk_write(operations, ordered=False)
+
+
+async def attach_episodes(shows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Fill the seasons of normalized series documents with their episodes, in place."""
+    if not shows:
+        return shows
+    episodes = defaultdict(lambda: defaultdict(list))
+    cursor = episodes_collection.find({'series_id': {'$in': [show['_id'] for show in shows]}})
+    async for episode in cursor.sort([('series_id', 1), ('season', 1), ('episode', 1)]):
+        episodes[episode.pop('series_id')][episode['season']].append(episode)
+    for show in shows:
+        for season in show.get('seasons', []):
+            season['episodes'] = episodes[show['_id']].get(season['season'], [])
+    return shows
+
+
+async def delete_episodes(series_ids: List[Any]) -> int:
+    """Remove every episode of the given shows."""
+    deleted = 0
+    for start in range(0, len(series_ids), EPISODE_BATCH_SIZE):
+        chunk = series_ids[start:start + EPISODE_BATCH_SIZE]
+        result = await episodes_collection.delete_many({'series_id': {'$in': chunk}})
+        deleted += result.deleted_count
+    return deleted
+
+
+async def series_ids_with_episodes(query: Dict[str, Any]) -> List[Any]:
+    """Ids of the shows having an episode that matches ``query``."""
+    return await episodes_collection.distinct('series_id', query)
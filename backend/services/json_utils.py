@@ -1,165 +1,153 @@
-import json
+import os
 from pathlib import Path
-import re
 from tqdm import tqdm
-from services.log_and_progress import *  # Update this import
-from services.m3u_parser import sanitize_filename, remove_season_episode_info, remove_season_episode_info_full  # Update this import
-import os
-
-
-def create_json(entries, base_dir, folder_type):
+from services import serialization
+
+# Catalogs are written as JSON Lines; JSON arrays from older versions are still read
+CATALOG_EXTENSION = '.ndjson'
+LEGACY_CATALOG_EXTENSION = '.json'
+
+
+def movie_document(record):
+    """Build the movie document stored in movies.json and MongoDB."""
+    return {
+        'name': record.name,
+        'logo': record.logo,
+        'url': record.url,
+        'path': record.dir_path,
+        'duration': 'Unknown',
+        'resolution': 'Unknown',
+        'provider': record.provider,
+        'alternates': []
+    }
+
+
+def episode_document(record):
+    """Build the episode document embedded in a series season."""
+    return {
+        'name': record.name,
+        'logo': record.logo,
+        'url': record.url,
+        'path': record.strm_path,
+        'season': record.season,
+        'episode': record.episode,
+        'provider': record.provider,
+        'alternates': []
+    }
+
+
+def build_catalogs(records, progress=True):
+    """Build the movie and series documents in a single pass over the records.
+
+    Returns ``(movies, series)``; records may be a lazy generator.
+    """
     movies = []
     series = {}
-    movie_count = 0
-    series_count = 0
-
-    base_dir_path = Path(base_dir)
-
-    # Initialize the progress bar
-    with tqdm(total=len(entries), desc=f"Writing JSON {folder_type}", unit="entry") as pbar:
-        for entry in entries:
-            if 'name' in entry and 'url' in entry:
-                name = entry['name']
-                title = entry.get('title', '')
-                is_series = re.search(r'\b[Ss][._-]?\s*(\d{1,10})[._-]?\s*E\s*(\d{1,10})\b', name)
-
-                if is_series or 'Series' in title:
-                    
-                    match = re.search(r'^(.*?)(?:\s*\[.*\])?\s*[Ss][._-]?\s*(\d{1,10})[._-]?\s*E(\d{1,10})$', name, re.IGNORECASE)
-                    if match:
-                        show_name, season, episode = match.groups()
-                        season = season.zfill(2)
-                        episode = episode.zfill(2)
-
-                        # Sanitize and build episode info
-                        safe_show_name = sanitize_filename(remove_season_episode_info(show_name))
-
-                        # Define the series and season paths
-                        series_path = base_dir_path / 'series' / safe_show_name
-                        season_path = series_path / f"Season {season}"
-
-                        # Initialize series data structure
-                        if safe_show_name not in series:
-                            series[safe_show_name] = {
-                                'name': safe_show_name,
-                                'path': str(series_path),
-                                'image': None,
-                                'seasons': {}
-                            }
-
-                        # Initialize season data structure if not already done
-                        if season not in series[safe_show_name]['seasons']:
-                            series[safe_show_name]['seasons'][season] = {
-                                'path': str(season_path),
-                                'episodes': []
-                            }
-
-                        # Build episode info
-                        episode_info = {
-                            'name': sanitize_filename(f"{safe_show_name} S{season} E{episode}"),
-                            'logo': entry.get('logo'),
-                            'url': entry.get('url', ''),
-                            'path': str(season_path / f"{safe_show_name} S{season} E{episode}.strm"),
-                            'season': season,
-                            'episode': episode
-                        }
-                        series[safe_show_name]['seasons'][season]['episodes'].append(episode_info)
-
-                        # Set the series image URL from the first episode of the first season (ignoring leading zeros)
-                        if int(season) == 1 and int(episode) == 1:
-                            if series[safe_show_name]['image'] is None:
-                                series[safe_show_name]['image'] = entry.get('logo')
-
-                        series_count += 1
-                    elif is_series:
-                        season, episode = is_series.groups()
-                        show_name = entry['name']
-                        season = season.zfill(2)
-                        episode = episode.zfill(2)
-
-                        # Sanitize and build episode info
-                        safe_show_name = sanitize_filename(remove_season_episode_info_full(show_name))
-
-                        # Define the series and season paths
-                        series_path = base_dir_path / 'series' / safe_show_name
-                        season_path = series_path / f"Season {season}"
-
-                        # Initialize series data structure
-                        if safe_show_name not in series:
-                            series[safe_show_name] = {
-                                'name': safe_show_name,
-                                'path': str(series_path),
-                                'image': None,
-                                'seasons': {}
-                            }
-
-                        # Initialize season data structure if not already done
-                        if season not in series[safe_show_name]['seasons']:
-                            series[safe_show_name]['seasons'][season] = {
-                                'path': str(season_path),
-                                'episodes': []
-                            }
-
-                        # Build episode info
-                        episode_info = {
-                            'name': sanitize_filename(f"{safe_show_name} S{season} E{episode}"),
-                            'logo': entry.get('logo'),
-                            'url': entry.get('url', ''),
-                            'path': str(season_path / f"{safe_show_name} S{season} E{episode}.strm"),
-                            'season': season,
-                            'episode': episode,
-                            'duration': 'unkown',
-                            'resolution': 'unkown'
-                        }
-                        series[safe_show_name]['seasons'][season]['episodes'].append(episode_info)
-
-                        # Set the series image URL from the first episode of the first season (ignoring leading zeros)
-                        if int(season) == 1 and int(episode) == 1:
-                            if series[safe_show_name]['image'] is None:
-                                series[safe_show_name]['image'] = entry.get('logo')
-
-                        series_count += 1
-                    else:
-                        log_message('Could not parse series ' + entry['name'], level='error')
-                        pass
-                else:
-                    safe_name = sanitize_filename(name)
-                    dir_path = base_dir_path / 'movies' / safe_name
-                    movie = {
-                        'name': safe_name,
-                        'logo': entry.get('logo'),
-                        'url': entry.get('url', ''),
-                        'path': str(dir_path),
-                        'duration': 'Unknown',
-                        'resolution': 'Unknown'
-                    }
-                    movies.append(movie)
-                    movie_count += 1
-
-            pbar.update(1)  # Update the progress bar after processing each entry
-
-    # Write movies to JSON
-    if folder_type == 'movies':
-        file_path = base_dir_path / (folder_type + '.json')
-        with open(file_path, 'w', encoding='utf-8') as movies_file:
-            json.dump(movies, movies_file, ensure_ascii=False, indent=4)
-
-    # Write series to JSON
-    elif folder_type == 'series':
-        file_path = base_dir_path / (folder_type + '.json')
-        series_list = []
-        for show_name, show_info in series.items():
-            show_info['seasons'] = [
-                {'season': season, **season_info}
-                for season, season_info in show_info['seasons'].items()
-            ]
-            series_list.append(show_info)
-
-        with open(file_path, 'w', encoding='utf-8') as series_file:
-            json.dump(series_list, series_file, ensure_ascii=False, indent=4,)
+
+    # Initialize the progress bar, records may be a lazy generator without a length
+    total_entries = len(records) if hasattr(records, '__len__') else None
+    with tqdm(total=total_entries, desc="Building JSON catalogs", unit="entry", disable=not progress) as pbar:
+        for record in records:
+            pbar.update(1)
+            if record.kind != 'series':
+                movies.append(movie_document(record))
+                continue
+
+            show = series.get(record.show_name)
+            # Initialize series data structure
+            if show is None:
+                show = series[record.show_name] = {
+                    'name': record.show_name,
+                    'path': record.series_path,
+                    'image': None,
+                    'provider': record.provider,
+                    'alternates': [],
+                    'seasons': {}
+                }
+
+            # Initialize season data structure if not already done
+            season = show['seasons'].get(record.season)
+            if season is None:
+                season = show['seasons'][record.season] = {
+                    'path': record.dir_path,
+                    'episodes': []
+                }
+            season['episodes'].append(episode_document(record))
+
+            # Set the series image URL from the first episode of the first season (ignoring leading zeros)
+            if show['image'] is None and int(record.season) == 1 and int(record.episode) == 1:
+                show['image'] = record.logo
+
+    series_list = []
+    for show_info in series.values():
+        show_info['seasons'] = [
+            {'season': season, **season_info}
+            for season, season_info in show_info['seasons'].items()
+        ]
+        series_list.append(show_info)
+    return movies, series_list
+
+
+def build_documents(records, folder_type):
+    """Build the movie or series documents for the records of the given kind."""
+    movies, series = build_catalogs(record for record in records if record.kind == folder_type)
+    return movies if folder_type == 'movies' else series
+
+
+def write_catalog(documents, base_dir, folder_type):
+    """Write one compact JSON document per line, replacing the previous catalog atomically."""
+    file_path = Path(base_dir) / (folder_type + CATALOG_EXTENSION)
+    temp_path = file_path.with_name(file_path.name + '.tmp')
+    with open(temp_path, 'wb') as catalog_file:
+        for document in documents:
+            catalog_file.write(serialization.dumps(document))
+            catalog_file.write(b'\n')
+    os.replace(temp_path, file_path)
+
+    # Drop the JSON array an older version wrote so the two cannot drift apart
+    legacy_path = Path(base_dir) / (folder_type + LEGACY_CATALOG_EXTENSION)
+    if legacy_path.exists():
+        legacy_path.unlink()
+
+
+def catalog_path(base_dir, folder_type):
+    """Path of the catalog of a kind in a results folder, or None when there is none."""
+    for extension in (CATALOG_EXTENSION, LEGACY_CATALOG_EXTENSION):
+        file_path = os.path.join(base_dir, folder_type + extension)
+        if os.path.exists(file_path):
+            return file_path
+    return None
+
+
+def iter_catalog(file_path):
+    """Yield the documents of a catalog; JSON Lines files are streamed one line at a time."""
+    if not file_path.endswith(CATALOG_EXTENSION):
+        data = load_json_file(file_path)
+        yield from (data if isinstance(data, list) else [data])
+        return
+    with open(file_path, 'rb') as catalog_file:
+        for line in catalog_file:
+            if line.strip():
+                yield serialization.loads(line)
+
+
+def create_catalogs(records, base_dir):
+    """Write the movies and series catalogs from one pass over the records and return both document lists."""
+    movies, series = build_catalogs(records)
+    write_catalog(movies, base_dir, 'movies')
+    write_catalog(series, base_dir, 'series')
+    return movies, series
+
+
+def create_json(records, base_dir, folder_type):
+    """Write the movies or series catalog from ClassifiedEntry records and return the documents."""
+    documents = build_documents(records, folder_type)
+    write_catalog(documents, base_dir, folder_type)
+    return documents
+
 
 def load_json_file(file_path):
-    with open(file_path, 'r', encoding='utf-8') as file:
-        return json.load(file)
+    with open(file_path, 'rb') as file:
+        return serialization.loads(file.read())
     
 
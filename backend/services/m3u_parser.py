@@ -1,62 +1,200 @@
+import io
+import mmap
+import os
 import re
+import sys
+from functools import lru_cache
 
+MEDIA_EXTENSIONS = ('.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv', '.webm', '.mpg')
+EXTINF_PREFIX = '#EXTINF:-1 '
+SERIES_PATTERN = re.compile(r'\b[Ss][._-]?\s*(\d{1,10})[._-]?\s*E\s*(\d{1,10})\b')
+SHOW_EPISODE_PATTERN = re.compile(r'^(.*?)(?:\s*\[.*\])?\s*[Ss][._-]?\s*(\d{1,10})[._-]?\s*E(\d{1,10})$', re.IGNORECASE)
+INVALID_FILENAME_CHARS = re.compile(r'[\\/*?:"<>|]')
+FULL_SEASON_EPISODE_PATTERNS = (
+    re.compile(r'.[._-]?[Ss][._-]?\d{1,10}[._-]?[Ee][._-]?\d{1,10}.*'),
+    re.compile(r'.[._-]?[Ss][._-]?\d{1,10}.*'),
+    re.compile(r'.[._-]?[Ee][._-]?\d{1,10}.*'),
+)
+SEASON_EPISODE_PATTERNS = (
+    re.compile(r'\b[Ss][._-]?(\d{1,10})[._-]?E(\d{1,10})\b'),
+    re.compile(r'\b[Ss][._-]?(\d{1,10})\b'),
+    re.compile(r'.[._-]?[Ss][._-]?\d{1,10}.*'),
+    re.compile(r'.[._-]?[Ee][._-]?\d{1,10}.*'),
+)
 
-def parse_m3u(file_path):
-    media_extensions = ('.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv', '.webm', '.mpg')
 
-    with open(file_path, 'r', encoding='utf-8') as file:
-        lines = file.readlines()
+class M3UEntry:
+    """A parsed playlist entry.
 
-    movies = []
-    series = []
+    Only the fields used downstream are kept, in slots instead of a dict, and
+    group titles are interned since thousands of entries share the same one.
+    """
+    __slots__ = ('name', 'url', 'title', 'logo')
+
+    def __init__(self, name, url, title='', logo=None):
+        self.name = name
+        self.url = url
+        self.title = title
+        self.logo = logo
+
+    def __eq__(self, other):
+        if not isinstance(other, M3UEntry):
+            return NotImplemented
+        return (self.name, self.url, self.title, self.logo) == (other.name, other.url, other.title, other.logo)
+
+    def __repr__(self):
+        return f"M3UEntry(name={self.name!r}, url={self.url!r}, title={self.title!r}, logo={self.logo!r})"
+
+
+def parse_attributes(attribute_string):
+    """Tokenize the ``key="value"`` pairs of an #EXTINF line without a regex.
 
-    current_entry = {}
+    Keys keep only their last word, so ``tvg-logo`` becomes ``logo`` and
+    ``group-title`` becomes ``title``, and empty values are skipped.
+    """
+    if "='" in attribute_string:
+        return _parse_quoted_attributes(attribute_string)
+    attributes = {}
+    parts = attribute_string.split('"')
+    for key, value in zip(parts[0::2], parts[1::2]):
+        key = key.rstrip()
+        value = value.strip()
+        if value and key.endswith('='):
+            attributes[key[:-1].rpartition(' ')[2].rpartition('-')[2]] = value
+    return attributes
+
+
+def _parse_quoted_attributes(attribute_string):
+    """Slower scan for lines that mix single and double quoted values."""
+    attributes = {}
+    pos = 0
+    while True:
+        eq = attribute_string.find('=', pos)
+        if eq == -1:
+            break
+        quote = attribute_string[eq + 1:eq + 2]
+        if quote != '"' and quote != "'":
+            pos = eq + 1
+            continue
+        end = attribute_string.find(quote, eq + 2)
+        if end == -1:
+            break
+        key = attribute_string[attribute_string.rfind(' ', 0, eq) + 1:eq].rpartition('-')[2].strip()
+        value = attribute_string[eq + 2:end].strip()
+        if key and value:
+            attributes[key] = value
+        pos = end + 1
+    return attributes
+
+
+def classify_kind(entry):
+    """Return 'series' or 'movies' for a parsed entry."""
+    if 'Series' in entry.title or SERIES_PATTERN.search(entry.name):
+        return 'series'
+    return 'movies'
+
+
+def _iter_entries_from_lines(lines):
+    current_entry = None  # (name, title, logo) of the last #EXTINF line
     for line in lines:
         line = line.strip()
         if line.startswith('#EXTINF'):
-            current_entry = {}
-            line = line[len('#EXTINF:-1 '):]
-            parts = line.split('",', 1)
-            attribute_string = parts[0] + '"'
-            name = parts[1].strip()
-
-            attributes = re.findall(r'(\w+)=["\']([^"\']+)["\']', attribute_string)
-            for key, value in attributes:
-                current_entry[key.strip()] = value.strip()
-
-            current_entry['name'] = name
-        elif line.startswith('http') or line.startswith('https'):
-            if any(line.lower().endswith(ext) for ext in media_extensions):
-                current_entry['url'] = line
-                title = current_entry.get('title', '')
-                name = current_entry['name']
-
-                if 'Series' in title or re.search(r'\b[Ss][._-]?\s*(\d{1,10})[._-]?\s*E\s*(\d{1,10})\b', name):
-                    series.append(current_entry)
-                else:
-                    movies.append(current_entry)
+            line = line[len(EXTINF_PREFIX):]
+            attribute_string, sep, name = line.partition('",')
+            if sep:
+                attribute_string += '"'
+            else:
+                attribute_string, _, name = line.partition(',')
+            attributes = parse_attributes(attribute_string)
+            current_entry = (name.strip(), sys.intern(attributes.get('title', '')), attributes.get('logo'))
+        elif current_entry is not None and line.startswith('http'):
+            if line.lower().endswith(MEDIA_EXTENSIONS):
+                name, title, logo = current_entry
+                yield M3UEntry(name, line, title, logo)
+                current_entry = None
+
+
+def iter_raw_entries(file_path, start=0, end=None):
+    """Yield M3UEntry objects while reading the playlist line by line.
+
+    When ``start``/``end`` are given only that byte range is parsed; it should
+    come from find_record_boundaries so it starts on an #EXTINF line.
+    """
+    if start == 0 and end is None:
+        with open(file_path, 'r', encoding='utf-8') as file:
+            yield from _iter_entries_from_lines(file)
+        return
+
+    with open(file_path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        text = mapped[start:end].decode('utf-8')
+    yield from _iter_entries_from_lines(io.StringIO(text, newline=None))
+
+
+def find_record_boundaries(file_path, chunks):
+    """Split the playlist into about ``chunks`` byte ranges that each start on an #EXTINF line."""
+    size = os.path.getsize(file_path)
+    if size == 0:
+        return []
+    target = max(1, size // max(1, chunks))
+    starts = [0]
+    with open(file_path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        position = target
+        while position < size:
+            boundary = mapped.find(b'\n#EXTINF', position)
+            if boundary == -1:
+                break
+            starts.append(boundary + 1)
+            position = boundary + 1 + target
+    return list(zip(starts, starts[1:] + [size]))
+
+
+def iter_m3u(file_path):
+    """Yield ``(kind, entry)`` tuples while reading the playlist line by line."""
+    for entry in iter_raw_entries(file_path):
+        yield classify_kind(entry), entry
+
+
+def iter_entries(file_path, kind=None):
+    """Yield parsed entries, optionally only those of the given kind."""
+    for entry_kind, entry in iter_m3u(file_path):
+        if kind is None or entry_kind == kind:
+            yield entry
+
+
+def parse_m3u(file_path):
+    movies = []
+    series = []
+
+    for kind, entry in iter_m3u(file_path):
+        if kind == 'series':
+            series.append(entry)
+        else:
+            movies.append(entry)
 
     return movies, series
 
 
 def sanitize_filename(name):
-    name = re.sub(r'[\\/*?:"<>|]', '', name).strip()
+    name = INVALID_FILENAME_CHARS.sub('', name).strip()
     name = name.replace('...', '…').replace('..', '…')
     name = name.replace('\t', '').replace('\n', '').strip().rstrip('. ')
     return name
 
 def remove_season_episode_info_full(name):
     # This regex will match one character before 'S' and the full season+episode format 'S01E01'
-    name = re.sub(r'.[._-]?[Ss][._-]?\d{1,10}[._-]?[Ee][._-]?\d{1,10}.*', '', name)
-    name = re.sub(r'.[._-]?[Ss][._-]?\d{1,10}.*', '', name)
-    name = re.sub(r'.[._-]?[Ee][._-]?\d{1,10}.*', '', name)
+    for pattern in FULL_SEASON_EPISODE_PATTERNS:
+        name = pattern.sub('', name)
     return name.strip()
 
 def remove_season_episode_info(name):
-    name = re.sub(r'\b[Ss][._-]?(\d{1,10})[._-]?E(\d{1,10})\b', '', name)
-    name = re.sub(r'\b[Ss][._-]?(\d{1,10})\b', '', name)
-    name = re.sub(r'.[._-]?[Ss][._-]?\d{1,10}.*', '', name)
-    name = re.sub(r'.[._-]?[Ee][._-]?\d{1,10}.*', '', name)
+    for pattern in SEASON_EPISODE_PATTERNS:
+        name = pattern.sub('', name)
     return name.strip()
 
 
+@lru_cache(maxsize=65536)
+def normalize_show_name(show_name, full=False):
+    """Sanitized show folder name, cached because every episode of a show repeats it."""
+    if full:
+        return sanitize_filename(remove_season_episode_info_full(show_name))
+    return sanitize_filename(remove_season_episode_info(show_name))
@@ -1,3 +1,4 @@
+import asyncio
 import subprocess
 import re
 
@@ -14,6 +15,30 @@ def parse_duration(duration_str):
     return "Unknown"
 
 
+DURATION_PATTERN = re.compile(r'Duration:\s+(\d+:\d+:\d+\.\d+)')
+RESOLUTION_PATTERN = re.compile(r'(\d{2,4})\s*x\s*(\d{2,4})')
+
+
+def parse_video_info(info):
+    """Extract the duration and resolution from ffmpeg's stderr output."""
+    # Initialize duration and resolution
+    duration = "Error"
+    resolution = "Error"
+
+    # Search for duration
+    duration_match = DURATION_PATTERN.search(info)
+    if duration_match:
+        duration_str = duration_match.group(1)  # e.g. '02:49:04.00'
+        duration = parse_duration(duration_str)
+
+    # Search for resolution
+    resolution_match = RESOLUTION_PATTERN.search(info)
+    if resolution_match:
+        resolution = f"{resolution_match.group(1)}x{resolution_match.group(2)}"
+
+    return duration, resolution
+
+
 def get_video_info(file_path):
     """Get information about the video file using ffmpeg."""
     try:
@@ -22,28 +47,29 @@ def get_video_info(file_path):
             ['ffmpeg', '-i', file_path],
             stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
         )
-        info = result.stderr  # ffmpeg outputs info to stderr
-
-        # Initialize duration and resolution
-        duration = "Error"
-        resolution = "Error"
-
-        # Regex patterns for duration and resolution
-        duration_pattern = re.compile(r'Duration:\s+(\d+:\d+:\d+\.\d+)')
-        resolution_pattern = re.compile(r'(\d{2,4})\s*x\s*(\d{2,4})')
-
-        # Search for duration
-        duration_match = duration_pattern.search(info)
-        if duration_match:
-            duration_str = duration_match.group(1)  # e.g. '02:49:04.00'
-            duration = parse_duration(duration_str)
+        return parse_video_info(result.stderr)  # ffmpeg outputs info to stderr
+    except Exception as e:
+        print(f"Error running ffmpeg: {e}")
+        return "Error", "Error"
 
-        # Search for resolution
-        resolution_match = resolution_pattern.search(info)
-        if resolution_match:
-            resolution = f"{resolution_match.group(1)}x{resolution_match.group(2)}"
 
-        return duration, resolution
+async def probe_video_info(file_path, timeout=60):
+    """Like get_video_info, but runs ffmpeg without blocking the event loop and gives up after ``timeout``."""
+    try:
+        process = await asyncio.create_subprocess_exec(
+            'ffmpeg', '-i', file_path,
+            stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE
+        )
     except Exception as e:
         print(f"Error running ffmpeg: {e}")
         return "Error", "Error"
+    try:
+        _, stderr = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        return "Error", "Error"
+    finally:
+        if process.returncode is None:
+            # Timed out or cancelled, do not leave ffmpeg running
+            process.kill()
+            await process.wait()
+    return parse_video_info(stderr.decode('utf-8', errors='replace'))
@@ -0,0 +1,81 @@
+import base64
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+
+from services import serialization
+
+# pymongo's sort directions, without importing the driver for the routes that only encode cursors
+ASCENDING, DESCENDING = 1, -1
+
+# Stable orders of the listing endpoints, ties are broken by _id
+SORT_ORDERS = {
+    'name': ('name', ASCENDING),
+    'recent': ('_id', DESCENDING),  # ObjectIds grow with insertion time
+}
+SORT_PATTERN = '^(' + '|'.join(SORT_ORDERS) + ')$'
+
+
+class InvalidCursor(ValueError):
+    """Raised for a cursor that was not issued by this server or belongs to another sort order."""
+
+
+def sort_spec(sort: str) -> List[tuple]:
+    field, direction = SORT_ORDERS[sort]
+    if field == '_id':
+        return [('_id', direction)]
+    return [(field, direction), ('_id', direction)]
+
+
+def position(document: Dict[str, Any], sort: str) -> List[Any]:
+    """Sort key and _id of ``document``, the point the next page starts after."""
+    field, _ = SORT_ORDERS[sort]
+    return [None if field == '_id' else document.get(field), str(document['_id'])]
+
+
+def after_query(query: Dict[str, Any], sort: str, after: Optional[List[Any]]) -> Dict[str, Any]:
+    """Restrict ``query`` to the documents sorting after ``after``, served by the sort index."""
+    if after is None:
+        return query
+    field, direction = SORT_ORDERS[sort]
+    operator = '$gt' if direction == ASCENDING else '$lt'
+    value, last_id = after[0], ObjectId(after[1])
+    if field == '_id':
+        keyset = {'_id': {operator: last_id}}
+    else:
+        keyset = {'$or': [{field: {operator: value}}, {field: value, '_id': {operator: last_id}}]}
+    return {'$and': [query, keyset]} if query else keyset
+
+
+def encode_cursor(sort: str, positions: Dict[str, Optional[List[Any]]]) -> str:
+    """Opaque token holding the position reached in each listed collection; None marks one as exhausted."""
+    payload = serialization.dumps({'sort': sort, 'after': positions})
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token: str, sort: str) -> Dict[str, Optional[List[Any]]]:
+    try:
+        payload = serialization.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        positions = payload['after']
+        for after in positions.values():
+            if after is not None and (len(after) != 2 or not ObjectId.is_valid(after[1])):
+                raise InvalidCursor(token)
+    except (ValueError, TypeError, KeyError, AttributeError) as e:
+        raise InvalidCursor(token) from e
+    if payload.get('sort') != sort:
+        raise InvalidCursor(token)
+    return positions
+
+
+async def fetch_page(collection, query: Dict[str, Any], sort: str, size: int, after: Optional[List[Any]] = None,
+                     skip: int = 0, projection: Dict[str, Any] = None):
+    """One page of ``collection`` in ``sort`` order.
+
+    Returns the documents and the position to continue from, None after the last
+    page. With ``after`` every page costs the same however deep it is; ``skip``
+    only serves the page numbers of older clients.
+    """
+    cursor = collection.find(after_query(query, sort, after), projection).sort(sort_spec(sort))
+    documents = [document async for document in cursor.skip(skip).limit(size)]
+    next_position = position(documents[-1], sort) if len(documents) == size else None
+    return documents, next_position
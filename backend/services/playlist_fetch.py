@@ -0,0 +1,127 @@
+import json
+import os
+import zlib
+from urllib.error import HTTPError
+from urllib.parse import quote
+from urllib.request import Request, urlopen
+
+from models.provider_model import Provider
+
+CHUNK_SIZE = 1024 * 1024
+USER_AGENT = 'm3u4strm'
+
+
+class IncompleteDownload(OSError):
+    """Raised when the connection closes before the whole body arrived; the .part file is kept for resuming."""
+
+
+def provider_playlist_url(provider: Provider) -> str:
+    """Build the m3u_plus playlist URL from the link and credentials of a provider."""
+    return (f"{provider.link.rstrip('/')}/get.php?username={quote(provider.username)}"
+            f"&password={quote(provider.password)}&type=m3u_plus&output=ts")
+
+
+def _load_meta(meta_path):
+    if not os.path.exists(meta_path):
+        return {}
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_meta(meta_path, meta):
+    temp_path = meta_path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        json.dump(meta, file)
+    os.replace(temp_path, meta_path)
+
+
+def _validators(response):
+    return {
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+    }
+
+
+def fetch_playlist(url: str, destination: str, timeout: int = 60) -> dict:
+    """Download a playlist to ``destination`` without holding it in memory.
+
+    The ETag/Last-Modified of the last download are kept in ``<destination>.meta.json``
+    so an unchanged playlist costs a single 304. The body is requested gzip encoded
+    and decompressed while streaming into ``<destination>.part``; an interrupted
+    download is resumed from that file with an HTTP Range request.
+    """
+    meta_path = destination + '.meta.json'
+    part_path = destination + '.part'
+    meta = _load_meta(meta_path)
+
+    headers = {'User-Agent': USER_AGENT, 'Accept-Encoding': 'gzip'}
+    resume_from = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    partial = meta.get('partial') or {}
+    if resume_from and (partial.get('etag') or partial.get('last_modified')):
+        # Ranges of an encoded body do not map onto the decoded .part file, so resume as identity
+        headers['Accept-Encoding'] = 'identity'
+        headers['Range'] = f'bytes={resume_from}-'
+        headers['If-Range'] = partial.get('etag') or partial.get('last_modified')
+    else:
+        resume_from = 0
+        if os.path.exists(destination):
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+
+    try:
+        response = urlopen(Request(url, headers=headers), timeout=timeout)
+    except HTTPError as e:
+        if e.code == 304:
+            return {'status': 'not_modified', 'path': destination, 'bytes': 0}
+        if e.code == 416 and resume_from:
+            # The partial file no longer lines up with the playlist, start over
+            os.remove(part_path)
+            meta.pop('partial', None)
+            _save_meta(meta_path, meta)
+            return fetch_playlist(url, destination, timeout)
+        raise
+
+    with response:
+        resumed = response.status == 206
+        validators = _validators(response)
+        meta['partial'] = validators
+        _save_meta(meta_path, meta)
+
+        decompressor = None
+        if response.headers.get('Content-Encoding', '').lower() == 'gzip':
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+        expected = response.headers.get('Content-Length')
+        received = 0  # Bytes as sent, Content-Length counts the encoded body
+        written = 0
+        with open(part_path, 'ab' if resumed else 'wb') as part_file:
+            while True:
+                chunk = response.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                received += len(chunk)
+                if decompressor is not None:
+                    chunk = decompressor.decompress(chunk)
+                part_file.write(chunk)
+                written += len(chunk)
+            if decompressor is not None:
+                tail = decompressor.flush()
+                part_file.write(tail)
+                written += len(tail)
+
+    # A closed connection reads as the end of the body, only the length and the gzip trailer tell them apart
+    if expected is not None and expected.isdigit() and received < int(expected):
+        raise IncompleteDownload(f"Received {received} of {expected} bytes from {url}")
+    if decompressor is not None and not decompressor.eof:
+        raise IncompleteDownload(f"Gzip stream from {url} ended early")
+
+    os.replace(part_path, destination)
+    meta.pop('partial', None)
+    meta.update(validators)
+    _save_meta(meta_path, meta)
+    return {'status': 'resumed' if resumed else 'downloaded', 'path': destination, 'bytes': written}
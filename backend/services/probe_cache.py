@@ -0,0 +1,63 @@
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Tuple
+
+from services.databases import probe_cache_collection
+from services.media_stream import probe_video_info
+
+# Probe results are kept per stream URL; dead links are remembered for a shorter time
+PROBE_CACHE_TTL = timedelta(seconds=int(os.environ.get('PROBE_CACHE_TTL', str(7 * 24 * 3600))))
+PROBE_NEGATIVE_TTL = timedelta(seconds=int(os.environ.get('PROBE_NEGATIVE_TTL', '3600')))
+PROBE_CACHE_MAX_ENTRIES = int(os.environ.get('PROBE_CACHE_MAX_ENTRIES', '200000'))
+TRIM_EVERY = 500  # Stores between two checks of the size bound
+
+_in_flight: Dict[str, asyncio.Task] = {}
+_stores_since_trim = 0
+
+
+async def cached_video_info(url: str) -> Tuple[str, str]:
+    """Duration and resolution of a stream, probed at most once per TTL.
+
+    Concurrent calls for the same URL share a single ffmpeg probe.
+    """
+    entry = await probe_cache_collection.find_one({'_id': url})
+    # Stored datetimes come back naive, in UTC
+    if entry and entry['expires_at'] > datetime.now(timezone.utc).replace(tzinfo=None):
+        return entry['duration'], entry['resolution']
+
+    task = _in_flight.get(url)
+    if task is None:
+        task = _in_flight[url] = asyncio.ensure_future(_probe_and_store(url))
+        task.add_done_callback(lambda _: _in_flight.pop(url, None))
+    # A caller going away must not cancel the probe the others are waiting on
+    return await asyncio.shield(task)
+
+
+async def _probe_and_store(url: str) -> Tuple[str, str]:
+    global _stores_since_trim
+    duration, resolution = await probe_video_info(url)
+    now = datetime.now(timezone.utc)
+    # A partial failure is negative too, or the missing field would not be probed again for a week
+    failed = "Error" in (duration, resolution)
+    await probe_cache_collection.replace_one({'_id': url}, {
+        'duration': duration,
+        'resolution': resolution,
+        'created_at': now,
+        'expires_at': now + (PROBE_NEGATIVE_TTL if failed else PROBE_CACHE_TTL),
+    }, upsert=True)
+
+    _stores_since_trim += 1
+    if _stores_since_trim >= TRIM_EVERY:
+        _stores_since_trim = 0
+        await trim_probe_cache()
+    return duration, resolution
+
+
+async def trim_probe_cache(max_entries: int = PROBE_CACHE_MAX_ENTRIES):
+    """Drop the oldest entries beyond ``max_entries``."""
+    surplus = await probe_cache_collection.estimated_document_count() - max_entries
+    if surplus <= 0:
+        return
+    oldest = probe_cache_collection.find({}, {'_id': 1}).sort('created_at', 1).limit(surplus)
+    await probe_cache_collection.delete_many({'_id': {'$in': [entry['_id'] async for entry in oldest]}})
@@ -0,0 +1,128 @@
+import asyncio
+import os
+import random
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, NamedTuple, Optional
+from urllib.parse import urlsplit
+
+from pymongo import UpdateOne
+
+from services.catalog_cache import invalidate
+from services.log_and_progress import log_message
+from services.media_stream import probe_video_info
+
+# Bounds on concurrent ffmpeg probes overall and against a single provider host
+PROBE_CONCURRENCY = int(os.environ.get('PROBE_CONCURRENCY', '8'))
+PROBE_PER_HOST = int(os.environ.get('PROBE_PER_HOST', '2'))
+PROBE_ATTEMPTS = 3
+PROBE_BACKOFF = 2.0  # Seconds before the first retry, doubled for each further one
+PROBE_TIMEOUT = 60
+PROBE_BATCH_SIZE = 200
+PROGRESS_INTERVAL = 30
+
+
+class ProbeJob(NamedTuple):
+    """One stream to probe and where its duration and resolution are stored."""
+    url: str
+    collection: Any
+    filter: Dict[str, Any]
+    field_prefix: str = ''  # Path of the media inside the document, e.g. an episode in a series
+    resolution_field: str = 'resolution'
+    array_filters: Optional[List[Dict[str, Any]]] = None
+    array_path: str = ''  # Query path of the array holding the media, e.g. 'seasons.episodes'
+
+    def update(self, duration, resolution):
+        """Operations storing a probe result, updated_at only moves when the values change."""
+        now = datetime.now(timezone.utc)
+        changed = {'$or': [{'duration': {'$ne': duration}}, {self.resolution_field: {'$ne': resolution}}]}
+        if self.array_path:
+            changed = {self.array_path: {'$elemMatch': {'url': self.url, **changed}}}
+        return [
+            UpdateOne({**self.filter, **changed}, {'$set': {
+                self.field_prefix + 'duration': duration,
+                self.field_prefix + self.resolution_field: resolution,
+                'updated_at': now,  # Of the stored document, a show for an embedded episode
+            }}, array_filters=self.array_filters),
+            UpdateOne(self.filter, {'$set': {self.field_prefix + 'probed_at': now}},
+                      array_filters=self.array_filters),
+        ]
+
+
+async def run_probes(jobs, concurrency: int = PROBE_CONCURRENCY, per_host: int = PROBE_PER_HOST,
+                     attempts: int = PROBE_ATTEMPTS, batch_size: int = PROBE_BATCH_SIZE) -> Dict[str, int]:
+    """Probe the streams of an async iterable of ProbeJobs and store the results.
+
+    At most ``concurrency`` ffmpeg processes run at once and at most ``per_host``
+    against one host. Jobs start in the order they are yielded, so callers yield
+    never-probed media first. Failed probes are retried with exponential backoff
+    and jitter; results are written with batched unordered bulk writes.
+    """
+    global_slots = asyncio.Semaphore(concurrency)
+    host_slots = defaultdict(lambda: asyncio.Semaphore(per_host))
+    # Bounds the jobs pulled from the cursors ahead of the probes
+    window = asyncio.Semaphore(concurrency * 4)
+    pending = {}  # collection name -> (collection, operations)
+    flush_lock = asyncio.Lock()
+    stats = {'probed': 0, 'failed': 0, 'retried': 0, 'written': 0}
+    started = time.monotonic()
+    last_report = started
+
+    def report(final=False):
+        nonlocal last_report
+        now = time.monotonic()
+        if not final and now - last_report < PROGRESS_INTERVAL:
+            return
+        last_report = now
+        done = stats['probed'] + stats['failed']
+        rate = done / max(now - started, 1e-9)
+        log_message(f"{'Probing finished' if final else 'Probing'}: {done} streams, {stats['failed']} failed, "
+                    f"{stats['retried']} retries, {rate:.1f} streams/s", level='info')
+
+    async def flush(collection_name):
+        async with flush_lock:
+            collection, operations = pending.pop(collection_name, (None, []))
+            if operations:
+                result = await collection.bulk_write(operations, ordered=False)
+                stats['written'] += result.modified_count
+                if result.modified_count:
+                    invalidate(collection_name)
+
+    async def probe(job):
+        try:
+            host = urlsplit(job.url).netloc
+            for attempt in range(attempts):
+                if attempt:
+                    stats['retried'] += 1
+                    await asyncio.sleep(PROBE_BACKOFF * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+                # Wait for the host first, so a busy host does not hold a global slot
+                async with host_slots[host], global_slots:
+                    duration, resolution = await probe_video_info(job.url, PROBE_TIMEOUT)
+                if (duration, resolution) != ("Error", "Error"):
+                    stats['probed'] += 1
+                    break
+            else:
+                stats['failed'] += 1
+
+            # Failures are stored too, they are retried after the never-probed media next time
+            name = job.collection.name
+            operations = pending.setdefault(name, (job.collection, []))[1]
+            operations.extend(job.update(duration, resolution))
+            if len(operations) >= 2 * batch_size:  # Two operations per result
+                await flush(name)
+            report()
+        finally:
+            window.release()
+
+    tasks = set()
+    async for job in jobs:
+        await window.acquire()
+        task = asyncio.create_task(probe(job))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    await asyncio.gather(*list(tasks))
+    for name in list(pending):
+        await flush(name)
+    report(final=True)
+    return stats
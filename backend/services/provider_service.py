@@ -3,6 +3,8 @@ import threading
 
 from models.provider_model import Provider
 from services.database_service import *
+from services.json_utils import catalog_path, iter_catalog
+from services.storage import catalog_store
 import os
 import asyncio
 from urllib.parse import urlsplit
@@ -30,7 +32,27 @@ async def get_provider_names_and_paths():
         except Exception as e:
             return f"An error occurred: {str(e)}"
 
-### reconsider checking for series too
+def _sample_stream_url(path):
+    """One stream URL of a provider, from its catalogs or, when none were exported, a .strm file."""
+    movies_file = catalog_path(path, 'movies')
+    if movies_file:
+        # Only the first document is needed, JSON Lines catalogs are not read any further
+        movie = next(iter_catalog(movies_file), None)
+        if movie and 'url' in movie:
+            return movie['url']
+    series_file = catalog_path(path, 'series')
+    if series_file:
+        show = next(iter_catalog(series_file), None)
+        if show and 'url' in show['seasons'][0]['episodes'][0]:
+            return show['seasons'][0]['episodes'][0]['url']
+    for root, _, files in os.walk(path):
+        for name in files:
+            if name.endswith('.strm'):
+                with open(os.path.join(root, name), 'r', encoding='utf-8') as strm_file:
+                    return strm_file.read().strip()
+    return None
+
+
 async def get_provider_data():
     data = await get_provider_names_and_paths()
     if isinstance(data, str):
@@ -39,47 +61,23 @@ async def get_provider_data():
     provider_data = []
     for provider_name, path in data:
         try:
-            movies_file = os.path.join(path, 'movies.json')
-            series_file = os.path.join(path, 'series.json')
-            if os.path.exists(movies_file):
-                movies = load_json_file(movies_file)
-                if movies and 'url' in movies[0]:
-                    url = movies[0]['url']
-                    split_url = urlsplit(url)
-                    provider_url = split_url._replace(path="", query="", fragment="").geturl()
-                    url_path_components = split_url.path.strip("/").split("/")
-                    provider_username = url_path_components[-3] if len(url_path_components) > 1 else None
-                    provider_password = url_path_components[-2] if len(url_path_components) > 1 else None
-
-                    # Pass valid inputs to Provider
-                    new_provider = Provider(
-                        name=str(provider_name),
-                        path=str(path),
-                        username=str(provider_username),
-                        password=str(provider_password),
-                        link=str(provider_url)
-                    )
-                    provider_data.append(new_provider)
-                else:
-                    if os.path.exists(series_file):
-                        series = load_json_file(series_file)
-                        if series and 'url' in series[0]['seasons'][0]['episodes'][0]:
-                            url = series[0]['seasons'][0]['episodes'][0]['url']
-                            split_url = urlsplit(url)
-                            provider_url = split_url._replace(path="", query="", fragment="").geturl()
-                            url_path_components = split_url.path.strip("/").split("/")
-                            provider_username = url_path_components[-3] if len(url_path_components) > 1 else None
-                            provider_password = url_path_components[-2] if len(url_path_components) > 1 else None
-
-                            # Pass valid inputs to Provider
-                            new_provider = Provider(
-                                name=str(provider_name),
-                                path=str(path),
-                                username=str(provider_username),
-                                password=str(provider_password),
-                                link=str(provider_url)
-                            )
-                            provider_data.append(new_provider)
+            url = _sample_stream_url(path)
+            if url:
+                split_url = urlsplit(url)
+                provider_url = split_url._replace(path="", query="", fragment="").geturl()
+                url_path_components = split_url.path.strip("/").split("/")
+                provider_username = url_path_components[-3] if len(url_path_components) > 1 else None
+                provider_password = url_path_components[-2] if len(url_path_components) > 1 else None
+
+                # Pass valid inputs to Provider
+                new_provider = Provider(
+                    name=str(provider_name),
+                    path=str(path),
+                    username=str(provider_username),
+                    password=str(provider_password),
+                    link=str(provider_url)
+                )
+                provider_data.append(new_provider)
         except Exception as e:
             print(f"An error occurred with {provider_name}: {str(e)}")
             continue
@@ -88,13 +86,10 @@ async def get_provider_data():
 
 async def delete_all_providers(providers: List[Provider]) -> List[str]:
     """Delete providers based on their name and path."""
-    deleted_paths = []
     try:
-        for provider in providers:
-            # Use provider.name for regex-based deletion in the database
-            await delete_all_media_path_regex(provider.name)
-            deleted_paths.append(provider.path)
-        return deleted_paths
+        # Titles shared with other providers fall back to their copies instead of disappearing
+        await catalog_store().delete_providers([provider.name for provider in providers])
+        return [provider.path for provider in providers]
     except Exception as e:
         print(f"An error occurred: {str(e)}")
         raise  # Re-raise the exception to be handled by the API endpoint
@@ -1,39 +1,92 @@
 import shutil
 import uuid
-from typing import List, Union, Dict
-from fastapi import FastAPI, HTTPException, APIRouter, Query, File, UploadFile, BackgroundTasks, Request
-from fastapi.responses import StreamingResponse
-from sse_starlette.sse import EventSourceResponse
+from typing import List, Union, Dict, Optional
+from fastapi import FastAPI, HTTPException, APIRouter, Query, File, UploadFile, BackgroundTasks, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 import asyncio
 from models.media_models import Movie, Series, Season, Episode, MediaItem
-from services.media_stream import get_video_info
-from services.database_service import (
-    movies_collection,
-    series_collection,  # Make sure to import series_collection if using Motor
-    serialize_movie,
-    serialize_series,
-    find_series_by_id,
-    find_movies_by_id,
-    find_season_by_series_id_and_season_number,
-    find_episode_by_series_id_season_and_episode_number,
-    serialize_basic_series,
-    update_movie_info,
-    update_series_info,
-    load_m3u,
-)
 import json
 from starlette.concurrency import run_in_threadpool
 from threading import Lock
 from models.provider_model import Provider
 from bson import ObjectId
-from services.copy_files import copy_movie, copy_series, copy_season, copy_episode
 from pydantic import ValidationError, BaseModel
 from dotenv import load_dotenv
 import os
-from datetime import datetime
-from services.provider_service import get_provider_data, delete_all_providers
+from datetime import datetime, timezone
+from services import serialization
+from services.pagination import SORT_PATTERN, InvalidCursor, decode_cursor, encode_cursor
+from services.catalog_cache import LISTING_CACHE_PAGES, catalog_cache, read_through
+from services.storage import EXPORT_TYPES, catalog_store
 
-router = APIRouter()
+# The MongoDB driver, the playlist pipeline and the file utilities are imported
+# by the routes that use them, so importing the app stays fast and the
+# connection is only set up by the lifespan in main.
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with the configured serialization backend."""
+
+    def render(self, content) -> bytes:
+        return serialization.dumps(content)
+
+
+router = APIRouter(default_response_class=FastJSONResponse)
+
+# Listings keep returning plain lists, the cursor of the next page travels in this header
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+
+async def fetch_pages(kinds, response: Response, page: int, size: int, sort: str, cursor: str = None,
+                      search: str = None, basic: bool = False):
+    """One page of each kind of the catalog, 'movies' or 'series', serialized and keyed by kind.
+
+    With ``cursor`` the pages continue where the previous ones ended, otherwise
+    ``page`` is used as an offset. The cursor for the next pages is set on the
+    response unless every kind is exhausted.
+    """
+    if cursor:
+        try:
+            positions = decode_cursor(cursor, sort)
+        except InvalidCursor:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        skip = 0
+    else:
+        positions = {}
+        skip = (page - 1) * size
+
+    store = catalog_store()
+
+    async def fetch(kind):
+        if kind in positions and positions[kind] is None:
+            return [], None  # Exhausted on an earlier page
+        return await store.page(kind, sort, size, positions.get(kind), skip, search, basic)
+
+    results = await asyncio.gather(*(fetch(kind) for kind in kinds))
+    next_positions = {kind: after for kind, (_, after) in zip(kinds, results)}
+    if any(after is not None for after in next_positions.values()):
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(sort, next_positions)
+    return {kind: documents for kind, (documents, _) in zip(kinds, results)}
+
+
+# Collections each cached response is built from, their writes invalidate it
+MOVIE_SOURCES = ('movies',)
+SERIES_SOURCES = ('series', 'episodes')
+MEDIA_SOURCES = MOVIE_SOURCES + SERIES_SOURCES
+
+
+async def cached_listing(response: Response, key, sources, page: int, cursor: str, load):
+    """Serve the first pages of a listing from the catalog cache, next page cursor included."""
+    if cursor or page > LISTING_CACHE_PAGES:
+        return await load()
+
+    async def load_page():
+        return await load(), response.headers.get(NEXT_CURSOR_HEADER)
+
+    items, next_cursor = await read_through(key, sources, load_page)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return items
 # Load environment variables from .env file
 load_dotenv()
 
@@ -59,13 +112,25 @@ async def login(request: LoginRequest):
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
+def require_probing():
+    """Reject the routes that need MongoDB when another storage backend is selected."""
+    store = catalog_store()
+    if not store.probing:
+        raise HTTPException(status_code=501, detail=f"Not available with the {store.name} storage backend, "
+                                                    f"it needs MongoDB")
+
+
 @router.get("/media_info/{url:path}", response_model=dict)
 async def get_media_info(url: str, media_id: str, media_type: str):
     """Get video information such as duration and resolution for movies or series."""
-    duration, resolution = get_video_info(url)
+    require_probing()
+    from services.database_service import update_movie_info, update_series_info
+    from services.probe_cache import cached_video_info
+    duration, resolution = await cached_video_info(url)
 
     if media_type == "movie":
-        await update_movie_info(media_id)
+        # Reuse the probe instead of letting update_movie_info run ffmpeg a second time
+        await update_movie_info(media_id, duration, resolution)
     elif media_type == "series":
         await update_series_info(media_id, duration, resolution)
     else:
@@ -79,18 +144,14 @@ async def get_media_info(url: str, media_id: str, media_type: str):
 
 
 @router.get("/series/basic/", response_model=List[Series])
-async def get_basic_series_info(page: int = Query(1, ge=1), size: int = Query(50, le=100)):
-    skip = (page - 1) * size
-    # Exclude the 'seasons' field
-    series_cursor = series_collection.find({}, {'seasons': 0}).skip(skip).limit(size)
-    series_list = []
+async def get_basic_series_info(response: Response, page: int = Query(1, ge=1), size: int = Query(50, ge=1, le=100),
+                                cursor: str = None, sort: str = Query('name', pattern=SORT_PATTERN)):
+    async def load():
+        # Exclude the 'seasons' field
+        pages = await fetch_pages(['series'], response, page, size, sort, cursor, basic=True)
+        return [Series(**series_dict) for series_dict in pages['series']]
 
-    async for series in series_cursor:
-        # Serialize series without seasons
-        series_dict = serialize_basic_series(series)
-        series_list.append(Series(**series_dict))
-
-    return series_list
+    return await cached_listing(response, ('series/basic', page, size, sort), SERIES_SOURCES, page, cursor, load)
 
 
 @router.get("/series/{series_id}", response_model=Series)
@@ -100,12 +161,15 @@ async def get_series_by_id(series_id: str) -> Series:
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid series ID format")
 
-    series = await find_series_by_id(_id)  # Fetch series from the database
+    async def load():
+        series = await catalog_store().get_series(_id)  # Fetch series from the database
+        return Series(**series) if series else None
 
+    series = await read_through(('series', str(_id)), SERIES_SOURCES, load)
     if not series:
         raise HTTPException(status_code=404, detail="Series not found")
 
-    return serialize_series(series)  # Return the series as JSON
+    return series
 
 
 @router.get("/movies/{movie_id}", response_model=Movie)
@@ -116,110 +180,148 @@ async def get_movie_by_id(movie_id: str) -> Movie:
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid movie ID format")
 
-    movie = await find_movies_by_id(_id)
+    async def load():
+        movie = await catalog_store().get_movie(_id)
+        return Movie(**movie) if movie else None
 
+    movie = await read_through(('movie', str(_id)), MOVIE_SOURCES, load)
     if not movie:
         raise HTTPException(status_code=404, detail="Movie not found")
 
-    return serialize_movie(movie)
+    return movie
 
 
 @router.get("/series/{series_id}/seasons/{season_number}", response_model=Season)
 async def get_season(series_id: str, season_number: str) -> Season:
     """Retrieve a specific season by series ID and season number."""
-    season_doc = await find_season_by_series_id_and_season_number(series_id, season_number)
-    if not season_doc:
+    async def load():
+        season = await catalog_store().get_season(series_id, season_number)
+        return Season(**season) if season else None
+
+    season = await read_through(('season', series_id, season_number.zfill(2)), SERIES_SOURCES, load)
+    if not season:
         raise HTTPException(status_code=404, detail="Season not found")
-    return season_doc['seasons'][0]
+    return season
 
 
 @router.get("/series/{series_id}/seasons/{season_number}/episodes/{episode_number}", response_model=Episode)
 async def get_episode(series_id: str, season_number: str, episode_number: str) -> Episode:
     """Retrieve a specific episode by series ID, season number, and episode number."""
-    series_doc = await find_episode_by_series_id_season_and_episode_number(series_id, season_number, episode_number)
-    if not series_doc or not series_doc['seasons']:
+    async def load():
+        episode = await catalog_store().get_episode(series_id, season_number, episode_number)
+        return Episode(**episode) if episode else None
+
+    episode = await read_through(('episode', series_id, season_number.zfill(2), episode_number.zfill(2)),
+                                 SERIES_SOURCES, load)
+    if not episode:
         raise HTTPException(status_code=404, detail="Episode not found")
-    for season in series_doc['seasons']:
-        for episode in season['episodes']:
-            if episode['episode'] == episode_number.zfill(2):
-                return episode
-    raise HTTPException(status_code=404, detail="Episode not found")
+    return episode
 
 
 @router.get("/series/", response_model=List[Series])
-async def get_all_series(page: int = Query(1, ge=1), size: int = Query(50, le=100)):
-    skip = (page - 1) * size
-    series_cursor = series_collection.find().skip(skip).limit(size)
-    series_list = []
+async def get_all_series(response: Response, page: int = Query(1, ge=1), size: int = Query(50, ge=1, le=100),
+                         cursor: str = None, sort: str = Query('name', pattern=SORT_PATTERN)):
+    async def load():
+        pages = await fetch_pages(['series'], response, page, size, sort, cursor)
+        return [Series(**series_dict) for series_dict in pages['series']]
 
-    async for series in series_cursor:
-        series_dict = serialize_series(series)
-        series_list.append(Series(**series_dict))
-
-    return series_list
+    return await cached_listing(response, ('series', page, size, sort), SERIES_SOURCES, page, cursor, load)
 
 
 @router.get("/media/", response_model=List[Union[Movie, Series]])
-async def get_all_media(page: int = Query(1, ge=1), size: int = Query(50, le=100)):
-    skip = (page - 1) * size
+async def get_all_media(response: Response, page: int = Query(1, ge=1), size: int = Query(50, ge=1, le=100),
+                        cursor: str = None, sort: str = Query('name', pattern=SORT_PATTERN)):
+    async def load():
+        # Retrieve movies and series, the cursor tracks both
+        pages = await fetch_pages(['movies', 'series'], response, page, size, sort, cursor)
 
-    # Retrieve movies and series
-    movies_cursor = movies_collection.find().skip(skip).limit(size)
-    series_cursor = series_collection.find().skip(skip).limit(size)
+        # Combine results
+        media_items = [Movie(**movie_dict) for movie_dict in pages['movies']]
+        media_items.extend(Series(**series_dict) for series_dict in pages['series'])
+        return media_items
 
-    # Combine results
-    media_items = []
+    return await cached_listing(response, ('media', page, size, sort), MEDIA_SOURCES, page, cursor, load)
 
-    # Process movies
-    async for movie in movies_cursor:
-        movie_dict = serialize_movie(movie)
-        media_items.append(Movie(**movie_dict))
 
-    # Process series
-    async for series in series_cursor:
-        series_dict = serialize_series(series)
-        media_items.append(Series(**series_dict))
+@router.get("/movies/", response_model=List[Movie])
+async def get_all_movies(response: Response, page: int = Query(1, ge=1), size: int = Query(50, ge=1, le=100),
+                         cursor: str = None, sort: str = Query('name', pattern=SORT_PATTERN)):
+    async def load():
+        pages = await fetch_pages(['movies'], response, page, size, sort, cursor)
+        return [Movie(**movie_dict) for movie_dict in pages['movies']]
 
-    return media_items
+    return await cached_listing(response, ('movies', page, size, sort), MOVIE_SOURCES, page, cursor, load)
 
 
-@router.get("/movies/", response_model=List[Movie])
-async def get_all_movies(page: int = Query(1, ge=1), size: int = Query(50, le=100)):
-    skip = (page - 1) * size
-    movies_cursor = movies_collection.find().skip(skip).limit(size)
-    movies_list = []
+@router.get("/search/", response_model=List[Union[Movie, Series]])
+async def search(response: Response, query: str, page: int = Query(1, ge=1), size: int = Query(50, ge=1, le=100),
+                 cursor: str = None, sort: str = Query('name', pattern=SORT_PATTERN)):
+    """Search for movies and series by a query string with pagination."""
+    # Not cached: every query is its own key and its pages carry whole series documents
+    # Served by the store's title index instead of a scan
+    pages = await fetch_pages(['movies', 'series'], response, page, size, sort, cursor, search=query)
+
+    # Combine results and handle pagination
+    combined_results = pages['movies'] + pages['series']
+    return combined_results
 
-    async for movie in movies_cursor:
-        movie_dict = serialize_movie(movie)
-        movies_list.append(Movie(**movie_dict))
 
-    return movies_list
+@router.get("/export/")
+async def export(media_type: Optional[str] = Query(None, alias='type', pattern='^(movies|series)$'),
+                 provider: Optional[str] = None, since: Optional[datetime] = None):
+    """Stream the whole catalog, or the movies or series of one provider, as NDJSON.
 
+    With ``since`` only items changed at or after that time are exported. The
+    X-Export-Time header holds the time the export started, the ``since`` value
+    for the next incremental export.
+    """
+    types = [media_type] if media_type else list(EXPORT_TYPES)
+    started = datetime.now(timezone.utc)
+    return StreamingResponse(catalog_store().export(types, provider, since), media_type='application/x-ndjson',
+                             headers={'X-Export-Time': started.isoformat()})
 
-@router.get("/search/", response_model=List[Union[Movie, Series]])
-async def search(query: str, page: int = Query(1, ge=1), size: int = Query(50, le=100)):
-    """Search for movies and series by a query string with pagination."""
-    skip = (page - 1) * size
 
-    print(movies_collection)
-    # Search for movies with limit and skip
-    movie_cursor = movies_collection.find({"name": {"$regex": query, "$options": "i"}}).skip(skip).limit(size)
-    movies = [serialize_movie(doc) async for doc in movie_cursor]
-    print(f"Movies List Length: {len(movies)}")  # Debugging
+async def warm_catalog_cache():
+    """Load the default first page of each listing into the catalog cache."""
+    defaults = {'page': 1, 'size': 50, 'cursor': None, 'sort': 'name'}
+    await asyncio.gather(get_all_movies(Response(), **defaults), get_all_series(Response(), **defaults),
+                         get_basic_series_info(Response(), **defaults), get_all_media(Response(), **defaults))
 
-    # Search for series with limit and skip
-    series_cursor = series_collection.find({"name": {"$regex": query, "$options": "i"}}).skip(skip).limit(size)
-    series_list = [serialize_series(doc) async for doc in series_cursor]
-    print(f"Series List Length: {len(series_list)}")  # Debugging
 
-    # Combine results and handle pagination
-    combined_results = movies + series_list
-    return combined_results
+@router.get("/ready")
+async def ready(request: Request):
+    """Readiness probe: 200 once the store is prepared and the caches are warm, 503 until then."""
+    state = request.app.state
+    if getattr(state, 'startup_error', None):
+        # Retried by the startup task, the status turns ready once a retry succeeds
+        return FastJSONResponse({'status': 'failed', 'error': state.startup_error}, status_code=503)
+    if not getattr(state, 'ready', False):
+        return FastJSONResponse({'status': 'starting'}, status_code=503)
+    return {'status': 'ready', 'storage': catalog_store().name}
+
+
+@router.get("/admin/cache-stats", response_model=dict)
+async def get_cache_stats():
+    """Hit, miss, eviction and invalidation counters of the catalog cache."""
+    return catalog_cache.stats()
+
+
+@router.get("/admin/index-stats", response_model=dict)
+async def get_index_stats():
+    """Report how often each MongoDB index has been used since the server started."""
+    require_probing()
+    from services.database_service import index_stats
+    try:
+        return await index_stats()
+    except Exception as e:
+        print(f"Error reading index stats: {e}")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
 @router.post("/watchlist/", response_model=dict)
 async def receive_watchlist(watchlist: List[MediaItem]):
     """Receive a watchlist from the frontend."""
+    from services.copy_files import copy_movie, copy_series, copy_season, copy_episode
     try:
         for item in watchlist:
             print(f"Received item: {item}")  # Log the raw item data
@@ -277,7 +379,10 @@ async def receive_watchlist(watchlist: List[MediaItem]):
 @router.get("/series_info/{url:path}", response_model=dict)
 async def get_series_info(url: str, s_id: str):
     """Get video information such as duration and resolution for series."""
-    duration, resolution = get_video_info(url)
+    require_probing()
+    from services.database_service import update_series_info
+    from services.probe_cache import cached_video_info
+    duration, resolution = await cached_video_info(url)
 
     # Update the series with the new information
     await update_series_info(s_id, duration, resolution)
@@ -341,7 +446,8 @@ async def upload_m3u(files: List[UploadFile] = File(...)):
         if file.filename.endswith('.m3u') or file.filename.endswith('.m3u8'):
             file_location = os.path.join(upload_directory, file.filename)
             with open(file_location, "wb") as f:
-                f.write(await file.read())
+                # Copy in chunks instead of reading the whole upload into memory
+                await run_in_threadpool(shutil.copyfileobj, file.file, f, 1024 * 1024)
             uploaded_files.append({
                 "file": file.filename,
                 "path": os.path.normpath(file_location),
@@ -351,15 +457,42 @@ async def upload_m3u(files: List[UploadFile] = File(...)):
     return uploaded_files
 
 
+@router.post("/fetch-m3u")
+async def fetch_m3us(providers: List[Provider], load: bool = Query(False)):
+    """Download each provider's playlist into ./m3us, optionally loading the ones that changed."""
+    from services.database_service import load_m3u
+    from services.playlist_fetch import fetch_playlist, provider_playlist_url
+    upload_directory = './m3us'
+    os.makedirs(upload_directory, exist_ok=True)
+    results = []
+    for provider in providers:
+        base_name = provider.name[len('Result_'):] if provider.name.startswith('Result_') else provider.name
+        destination = os.path.join(upload_directory, f"{base_name}.m3u")
+        try:
+            result = await run_in_threadpool(fetch_playlist, provider_playlist_url(provider), destination)
+        except Exception as e:
+            print(f"Error fetching playlist for {provider.name}: {e}")
+            raise HTTPException(status_code=502, detail=f"Could not fetch playlist for {provider.name}")
+        results.append({"provider": provider.name, **result})
+
+    if load:
+        changed = [result['path'] for result in results if result['status'] != 'not_modified']
+        await load_m3u(changed, incremental=True)
+    return results
+
+
 @router.post('/load-m3u')
-async def load_m3us(m3u_files: List[Dict[str, str]]):
+async def load_m3us(m3u_files: List[Dict[str, str]], workers: int = Query(1, ge=1),
+                    incremental: bool = Query(False), verify_manifest: bool = Query(False),
+                    prune_dry_run: bool = Query(False), export_json: bool = Query(False)):
     """Load M3U files from the provided list of file paths."""
+    from services.database_service import load_m3u
     m3u_paths = []
     for m3u_file in m3u_files:
         m3u_paths.append(m3u_file['filePath'])
     try:
-        await load_m3u(m3u_paths)  # Call the existing load_m3u function with each file path
-        return {"message": "M3U files loaded successfully!"}
+        summary = await load_m3u(m3u_paths, workers, incremental, verify_manifest, prune_dry_run, export_json)  # Call the existing load_m3u function with each file path
+        return {"message": "M3U files loaded successfully!", "summary": summary}
     except Exception as e:
         print(f"Error loading M3U files: {e}")  # Log the error for debugging
         raise HTTPException(status_code=500, detail="Internal Server Error")
@@ -367,6 +500,7 @@ async def load_m3us(m3u_files: List[Dict[str, str]]):
 @router.get("/get-providers")
 async def get_providers() -> List[Provider]:
     """Get a list of providers from the database."""
+    from services.provider_service import get_provider_data
     try:
         providers = await get_provider_data()
         return providers
@@ -442,6 +576,7 @@ def run_deletion_task(providers: List[Provider], task_id: str):
 
 @router.post("/delete-providers")
 async def delete_providers(providers: List[Provider], background_tasks: BackgroundTasks):
+    from services.provider_service import delete_all_providers
     task_id = str(uuid.uuid4())
     with progress_lock:
         progress_store[task_id] = 0.0  # Initialize progress
@@ -0,0 +1,60 @@
+import json
+import os
+from datetime import datetime, timezone
+
+from bson import ObjectId
+
+try:
+    import orjson
+except ImportError:  # Optional, the standard library encoder is the fallback
+    orjson = None
+
+from services.log_and_progress import log_message
+
+# 'orjson' or 'json'; defaults to orjson whenever it is installed
+JSON_BACKEND = os.environ.get('JSON_BACKEND', 'orjson' if orjson is not None else 'json').lower()
+
+if JSON_BACKEND == 'orjson' and orjson is None:
+    log_message("JSON_BACKEND is orjson but it is not installed, using the standard json module", level='warning')
+    JSON_BACKEND = 'json'
+elif JSON_BACKEND not in ('orjson', 'json'):
+    log_message(f"Unknown JSON_BACKEND {JSON_BACKEND}, using the standard json module", level='warning')
+    JSON_BACKEND = 'json'
+
+
+def _default(value):
+    """Encode the BSON types found in MongoDB documents."""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        # MongoDB returns naive datetimes in UTC
+        return (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _stdlib_dumps(obj) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), default=_default).encode('utf-8')
+
+
+def _orjson_dumps(obj) -> bytes:
+    return orjson.dumps(obj, default=_default, option=orjson.OPT_NAIVE_UTC)
+
+
+def _stdlib_loads(data):
+    return json.loads(data)
+
+
+if JSON_BACKEND == 'orjson':
+    _dumps, _loads = _orjson_dumps, orjson.loads
+else:
+    _dumps, _loads = _stdlib_dumps, _stdlib_loads
+
+
+def dumps(obj) -> bytes:
+    """Encode ``obj`` as compact UTF-8 JSON with the selected backend."""
+    return _dumps(obj)
+
+
+def loads(data):
+    """Decode JSON from ``bytes`` or ``str`` with the selected backend."""
+    return _loads(data)
@@ -0,0 +1,92 @@
+import hashlib
+import json
+import os
+from typing import Dict, List, NamedTuple, Tuple
+
+SNAPSHOT_FILE = 'snapshot.json'
+
+
+class SnapshotDiff(NamedTuple):
+    """Result of comparing a refreshed playlist with the previous snapshot."""
+    added: List  # ClassifiedEntry records that were not in the snapshot
+    changed: List[Tuple[list, object]]  # (old snapshot row, new ClassifiedEntry) pairs
+    removed: List[list]  # Snapshot rows that are no longer in the playlist
+    unchanged: int
+    snapshot: Dict[str, list]
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.added or self.changed or self.removed)
+
+    def counts(self) -> Dict[str, int]:
+        return {
+            'added': len(self.added),
+            'changed': len(self.changed),
+            'removed': len(self.removed),
+            'unchanged': self.unchanged,
+        }
+
+
+def url_hash(url: str) -> str:
+    """Stable identity of a playlist entry."""
+    return hashlib.sha1(url.encode('utf-8')).hexdigest()[:20]
+
+
+def record_fingerprint(record) -> str:
+    """Hash of everything that ends up on disk or in the database for a record."""
+    content = '\0'.join(str(value) for value in record)
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()[:20]
+
+
+def snapshot_row(record) -> list:
+    """Snapshot row: fingerprint, kind, url, .strm path and the show folder for episodes."""
+    return [
+        record_fingerprint(record),
+        record.kind,
+        record.url,
+        record.strm_path,
+        record.series_path if record.kind == 'series' else None,
+    ]
+
+
+def load_snapshot(output_dir: str) -> Dict[str, list]:
+    snapshot_path = os.path.join(output_dir, SNAPSHOT_FILE)
+    if not os.path.exists(snapshot_path):
+        return {}
+    with open(snapshot_path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def save_snapshot(output_dir: str, snapshot: Dict[str, list]):
+    """Persist the snapshot atomically so an interrupted refresh keeps the previous one."""
+    os.makedirs(output_dir, exist_ok=True)
+    snapshot_path = os.path.join(output_dir, SNAPSHOT_FILE)
+    temp_path = snapshot_path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        json.dump(snapshot, file, ensure_ascii=False, separators=(',', ':'))
+    os.replace(temp_path, snapshot_path)
+
+
+def diff_snapshot(previous: Dict[str, list], records) -> SnapshotDiff:
+    """Compare classified records with the previous snapshot, keyed by URL hash."""
+    snapshot = {}
+    added, changed = [], []
+    unchanged = 0
+    for record in records:
+        key = url_hash(record.url)
+        if key in snapshot:
+            # The same URL listed twice gets a key that also includes its target path
+            key = url_hash(record.url + '\0' + record.strm_path)
+        row = snapshot_row(record)
+        snapshot[key] = row
+
+        old_row = previous.get(key)
+        if old_row is None:
+            added.append(record)
+        elif old_row[0] != row[0]:
+            changed.append((old_row, record))
+        else:
+            unchanged += 1
+
+    removed = [row for key, row in previous.items() if key not in snapshot]
+    return SnapshotDiff(added, changed, removed, unchanged, snapshot)
@@ -0,0 +1,388 @@
+import asyncio
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from bson import ObjectId
+
+from services import serialization
+from services.catalog_cache import invalidate
+from services.dedup import (document_providers, drop_provider_movie, drop_provider_series, keyed_batch, merge_movie,
+                            merge_series, playable_copies, provider_urls_at_paths, search_name)
+from services.log_and_progress import log_message
+from services.pagination import SORT_ORDERS, position
+from services.storage import EXPORT_TYPES, CatalogStore
+
+SQLITE_READERS = int(os.environ.get('SQLITE_READERS', '4'))
+SQLITE_BATCH_SIZE = 500  # Rows per statement, below SQLite's bound parameter limit
+EXPORT_BATCH_SIZE = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id TEXT PRIMARY KEY,  -- ObjectId hex, so ids, the recent order and cursors match the MongoDB backend
+    kind TEXT NOT NULL,
+    dedup_key TEXT NOT NULL,
+    name TEXT NOT NULL,
+    search_name TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    body BLOB NOT NULL,  -- The document as JSON, seasons and episodes included
+    UNIQUE (kind, dedup_key)
+);
+CREATE INDEX IF NOT EXISTS documents_name ON documents (kind, name, id);
+CREATE INDEX IF NOT EXISTS documents_recent ON documents (kind, id);
+CREATE INDEX IF NOT EXISTS documents_search_name ON documents (kind, search_name);
+CREATE INDEX IF NOT EXISTS documents_updated_at ON documents (kind, updated_at);
+CREATE TABLE IF NOT EXISTS document_providers (
+    provider TEXT NOT NULL,
+    document_id TEXT NOT NULL REFERENCES documents (id) ON DELETE CASCADE,
+    PRIMARY KEY (provider, document_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS document_providers_document ON document_providers (document_id);
+-- Every provider's copy of a movie or episode, to find the documents holding given streams or files
+CREATE TABLE IF NOT EXISTS document_copies (
+    document_id TEXT NOT NULL REFERENCES documents (id) ON DELETE CASCADE,
+    provider TEXT NOT NULL,
+    url TEXT,
+    path TEXT
+);
+CREATE INDEX IF NOT EXISTS document_copies_document ON document_copies (document_id);
+CREATE INDEX IF NOT EXISTS document_copies_url ON document_copies (provider, url);
+CREATE INDEX IF NOT EXISTS document_copies_path ON document_copies (provider, path);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(search_name, content='documents', content_rowid='rowid');
+CREATE TRIGGER IF NOT EXISTS documents_fts_insert AFTER INSERT ON documents BEGIN
+    INSERT INTO documents_fts (rowid, search_name) VALUES (new.rowid, new.search_name);
+END;
+CREATE TRIGGER IF NOT EXISTS documents_fts_delete AFTER DELETE ON documents BEGIN
+    INSERT INTO documents_fts (documents_fts, rowid, search_name) VALUES ('delete', old.rowid, old.search_name);
+END;
+CREATE TRIGGER IF NOT EXISTS documents_fts_update AFTER UPDATE OF search_name ON documents BEGIN
+    INSERT INTO documents_fts (documents_fts, rowid, search_name) VALUES ('delete', old.rowid, old.search_name);
+    INSERT INTO documents_fts (rowid, search_name) VALUES (new.rowid, new.search_name);
+END;
+"""
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _placeholders(values):
+    return ','.join('?' * len(values))
+
+
+def _copy_rows(document):
+    return [(document['_id'], copy['provider'], copy.get('url'), copy.get('path'))
+            for copy in playable_copies(document) if copy.get('provider')]
+
+
+def _load(row_id, body):
+    document = serialization.loads(body)
+    document['_id'] = row_id
+    return document
+
+
+def _serialize(document, basic=False):
+    """API shape of a stored document; embedded episodes have no id of their own."""
+    document['id'] = document.pop('_id')
+    if basic:
+        document.pop('seasons', None)
+    for season in document.get('seasons', []):
+        for episode in season.get('episodes', []):
+            episode.setdefault('id', None)
+    return document
+
+
+def fts_query(query):
+    """Every word of the query, the last one as a prefix, as an FTS5 expression."""
+    words = search_name(query).split()
+    if not words:
+        return None
+    return ' '.join(f'"{word}"' for word in words[:-1]) + f' "{words[-1]}"*'
+
+
+class SqliteCatalogStore(CatalogStore):
+    """Catalog in an embedded SQLite database, for nodes that do not run MongoDB.
+
+    Documents are stored as JSON next to the columns they are looked up and
+    sorted by. The database runs in WAL mode: one writer thread applies every
+    change in batched transactions while reader threads serve the API. Titles
+    are searched through an FTS5 index, or a prefix match when SQLite was built
+    without FTS5. Probing and the probe cache still need MongoDB.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path):
+        self.path = path
+        self.fts = True
+        self._local = threading.local()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sqlite-writer')
+        self._readers = ThreadPoolExecutor(max_workers=SQLITE_READERS, thread_name_prefix='sqlite-reader')
+
+    def _connection(self):
+        # One connection per thread, SQLite connections must not be shared
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute('PRAGMA foreign_keys=ON')
+            connection.execute('PRAGMA busy_timeout=5000')
+            self._local.connection = connection
+        return connection
+
+    async def _read(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(
+            self._readers, lambda: function(self._connection(), *args))
+
+    async def _write(self, function, *args):
+        def run():
+            connection = self._connection()
+            with connection:  # One transaction per call
+                return function(connection, *args)
+        return await asyncio.get_running_loop().run_in_executor(self._writer, run)
+
+    # Schema
+
+    def _create_schema(self, connection):
+        connection.executescript(SCHEMA)
+        # Catalogs written before document_copies existed
+        if connection.execute('SELECT NOT EXISTS (SELECT 1 FROM document_copies) '
+                              'AND EXISTS (SELECT 1 FROM documents)').fetchone()[0]:
+            for row_id, body in connection.execute('SELECT id, body FROM documents').fetchall():
+                connection.executemany('INSERT INTO document_copies (document_id, provider, url, path) '
+                                       'VALUES (?, ?, ?, ?)', _copy_rows(_load(row_id, body)))
+        try:
+            connection.executescript(FTS_SCHEMA)
+        except sqlite3.OperationalError as e:
+            self.fts = False
+            log_message(f"SQLite has no FTS5 ({e}), searching by title prefix instead", level='warning')
+
+    async def prepare(self):
+        await self._write(self._create_schema)
+        return None
+
+    async def close(self):
+        # Each thread's connection is closed with it
+        self._writer.shutdown()
+        self._readers.shutdown()
+
+    # Writes
+
+    @staticmethod
+    def _store_documents(connection, kind, inserts, updates):
+        rows = [(document['name'], document['search_name'], document['updated_at'],
+                 serialization.dumps({k: v for k, v in document.items() if k != '_id'}), document['_id'])
+                for document in inserts + updates]
+        connection.executemany(
+            'INSERT INTO documents (name, search_name, updated_at, body, id, kind, dedup_key) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            [row + (kind, document['dedup_key']) for row, document in zip(rows, inserts)])
+        connection.executemany(
+            'UPDATE documents SET name = ?, search_name = ?, updated_at = ?, body = ? WHERE id = ?',
+            rows[len(inserts):])
+        connection.executemany('DELETE FROM document_providers WHERE document_id = ?',
+                               [(document['_id'],) for document in updates])
+        connection.executemany(
+            'INSERT OR IGNORE INTO document_providers (provider, document_id) VALUES (?, ?)',
+            [(provider, document['_id']) for document in inserts + updates
+             for provider in document_providers(document)])
+        connection.executemany('DELETE FROM document_copies WHERE document_id = ?',
+                               [(document['_id'],) for document in updates])
+        connection.executemany(
+            'INSERT INTO document_copies (document_id, provider, url, path) VALUES (?, ?, ?, ?)',
+            [row for document in inserts + updates for row in _copy_rows(document)])
+
+    def _upsert(self, connection, kind, documents):
+        merge = merge_series if kind == 'series' else merge_movie
+        counts = {'inserted': 0, 'updated': 0, 'unchanged': 0}
+        for start in range(0, len(documents), SQLITE_BATCH_SIZE):
+            batch = keyed_batch(documents[start:start + SQLITE_BATCH_SIZE], merge)
+            existing = {}
+            keys = list(batch)
+            for row_id, key, body in connection.execute(
+                    f'SELECT id, dedup_key, body FROM documents WHERE kind = ? AND dedup_key IN ({_placeholders(keys)})',
+                    [kind] + keys):
+                existing[key] = _load(row_id, body)
+
+            inserts, updates = [], []
+            now = _now()
+            for key, document in batch.items():
+                canonical = existing.get(key)
+                if canonical is None:
+                    inserts.append({**document, '_id': str(ObjectId()), 'updated_at': now})
+                    continue
+                merged = merge(canonical, document)
+                if merged == canonical:
+                    counts['unchanged'] += 1
+                else:
+                    updates.append({**merged, 'updated_at': now})
+            self._store_documents(connection, kind, inserts, updates)
+            counts['inserted'] += len(inserts)
+            counts['updated'] += len(updates)
+        return counts
+
+    async def upsert(self, kind, documents):
+        counts = await self._write(self._upsert, kind, documents)
+        if counts['inserted'] or counts['updated']:
+            invalidate(kind)
+        return counts
+
+    def _remove_provider(self, connection, kind, provider, urls=None, paths=None):
+        drop = drop_provider_series if kind == 'series' else drop_provider_movie
+        if urls is None and paths is None:
+            selected = None
+            # Titles no other provider holds are deleted in one statement, only shared ones are rewritten
+            connection.execute(
+                'DELETE FROM documents WHERE kind = ? AND id IN '
+                '(SELECT document_id FROM document_providers WHERE provider = ?) AND id NOT IN '
+                '(SELECT document_id FROM document_providers WHERE provider != ?)', (kind, provider, provider))
+            rows = connection.execute(
+                'SELECT documents.id, documents.body FROM document_providers JOIN documents '
+                'ON documents.id = document_providers.document_id WHERE provider = ? AND kind = ?',
+                (provider, kind)).fetchall()
+        else:
+            selected = set(urls if paths is None else paths)
+            # Only the documents holding one of the provider's streams or files are decoded
+            column = 'url' if paths is None else 'path'
+            values = list(selected)
+            found = {}
+            for start in range(0, len(values), SQLITE_BATCH_SIZE):
+                chunk = values[start:start + SQLITE_BATCH_SIZE]
+                found.update(connection.execute(
+                    f'SELECT id, body FROM documents WHERE kind = ? AND id IN (SELECT document_id FROM '
+                    f'document_copies WHERE provider = ? AND {column} IN ({_placeholders(chunk)}))',
+                    [kind, provider] + chunk))
+            rows = list(found.items())
+
+        deleted, updates = [], []
+        for row_id, body in rows:
+            document = _load(row_id, body)
+            if selected is None:
+                drop_urls = None
+            elif paths is None:
+                drop_urls = selected
+            else:
+                drop_urls = provider_urls_at_paths(document, provider, selected)
+                if not drop_urls:
+                    continue
+            updated = drop(document, provider, drop_urls)
+            if updated is None:
+                deleted.append((row_id,))
+            elif updated != document:
+                updates.append({**updated, 'updated_at': _now()})
+        connection.executemany('DELETE FROM documents WHERE id = ?', deleted)
+        self._store_documents(connection, kind, [], updates)
+
+    async def remove_provider(self, kind, provider, urls=None, paths=None):
+        await self._write(self._remove_provider, kind, provider, urls, paths)
+        invalidate(kind)
+
+    async def delete_providers(self, providers):
+        def delete(connection):
+            for provider in providers:
+                for kind in EXPORT_TYPES:
+                    self._remove_provider(connection, kind, provider)
+        await self._write(delete)
+        invalidate()
+
+    async def delete_provider_media(self, output_dir):
+        # Every document inserted here carries its provider, there are no older ones to clean up
+        return None
+
+    # Reads
+
+    @staticmethod
+    def _get(connection, kind, document_id):
+        row = connection.execute('SELECT id, body FROM documents WHERE id = ? AND kind = ?',
+                                 (document_id, kind)).fetchone()
+        return _load(*row) if row else None
+
+    async def get_movie(self, movie_id):
+        movie = await self._read(self._get, 'movies', str(movie_id))
+        return _serialize(movie) if movie else None
+
+    async def get_series(self, series_id):
+        series = await self._read(self._get, 'series', str(series_id))
+        return _serialize(series) if series else None
+
+    async def get_season(self, series_id, season_number):
+        series = await self.get_series(series_id)
+        season_number = season_number.zfill(2)
+        return next((season for season in (series or {}).get('seasons', [])
+                     if season['season'] == season_number), None)
+
+    async def get_episode(self, series_id, season_number, episode_number):
+        season = await self.get_season(series_id, season_number)
+        episode_number = episode_number.zfill(2)
+        return next((episode for episode in (season or {}).get('episodes', [])
+                     if episode['episode'] == episode_number), None)
+
+    def _page(self, connection, kind, sort, size, after, skip, search):
+        field, direction = SORT_ORDERS[sort]
+        operator, order = ('>', 'ASC') if direction > 0 else ('<', 'DESC')
+        conditions, parameters = ['kind = ?'], [kind]
+        if search is not None:
+            if self.fts:
+                match = fts_query(search)
+                if match is None:
+                    return []
+                conditions.append('rowid IN (SELECT rowid FROM documents_fts WHERE documents_fts MATCH ?)')
+                parameters.append(match)
+            else:
+                conditions.append("search_name LIKE ? ESCAPE '\\'")
+                prefix = search_name(search).replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+                parameters.append(prefix + '%')
+        if after is not None:
+            if field == '_id':
+                conditions.append(f'id {operator} ?')
+                parameters.append(after[1])
+            else:
+                conditions.append(f'(name, id) {operator} (?, ?)')
+                parameters.extend(after)
+        order_by = f'id {order}' if field == '_id' else f'name {order}, id {order}'
+        rows = connection.execute(
+            f'SELECT id, body FROM documents WHERE {" AND ".join(conditions)} ORDER BY {order_by} LIMIT ? OFFSET ?',
+            parameters + [size, skip]).fetchall()
+        return [_load(row_id, body) for row_id, body in rows]
+
+    async def page(self, kind, sort, size, after=None, skip=0, search=None, basic=False):
+        documents = await self._read(self._page, kind, sort, size, after, skip, search)
+        next_position = position(documents[-1], sort) if len(documents) == size else None
+        return [_serialize(document, basic) for document in documents], next_position
+
+    @staticmethod
+    def _export_chunk(connection, kind, provider, since, last_rowid):
+        conditions, parameters = ['kind = ?', 'rowid > ?'], [kind, last_rowid]
+        if provider:
+            conditions.append('id IN (SELECT document_id FROM document_providers WHERE provider = ?)')
+            parameters.append(provider)
+        if since:
+            conditions.append('updated_at >= ?')
+            parameters.append(since.astimezone(timezone.utc).isoformat() if since.tzinfo
+                              else since.replace(tzinfo=timezone.utc).isoformat())
+        rows = connection.execute(
+            f'SELECT rowid, id, body FROM documents WHERE {" AND ".join(conditions)} ORDER BY rowid LIMIT ?',
+            parameters + [EXPORT_BATCH_SIZE]).fetchall()
+        if not rows:
+            return None, last_rowid
+        prefix = ',"type":"' + EXPORT_TYPES[kind] + '"'
+        # The stored JSON is written out as is, only the id and type are spliced in
+        chunk = b''.join(b'{"id":"' + row_id.encode('ascii') + b'"' + prefix.encode('ascii')
+                         + (b',' + body[1:] if len(body) > 2 else b'}') + b'\n'
+                         for _, row_id, body in rows)
+        return chunk, rows[-1][0]
+
+    async def export(self, types, provider=None, since=None):
+        for kind in types:
+            last_rowid = 0
+            while True:
+                chunk, last_rowid = await self._read(self._export_chunk, kind, provider, since, last_rowid)
+                if chunk is None:
+                    break
+                yield chunk
@@ -0,0 +1,98 @@
+import asyncio
+import os
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+# 'mongo' (default) or 'sqlite'; SQLite serves the catalog from a single local file
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'mongo').lower()
+SQLITE_PATH = os.environ.get('SQLITE_PATH', 'm3u4strm.db')
+# Catalog kinds and the type each one is exported as
+EXPORT_TYPES = {'movies': 'Movie', 'series': 'Series'}
+
+
+class CatalogStore(ABC):
+    """Storage of the movie and series catalog behind the API routes and the playlist ingest.
+
+    ``kind`` is 'movies' or 'series'. Documents go in as built by json_utils and
+    come out serialized for the API models, with a string ``id``.
+    """
+
+    name = None
+    # Stream probes, the probe cache and index statistics are only kept in MongoDB
+    probing = False
+
+    @abstractmethod
+    async def prepare(self) -> Optional[asyncio.Task]:
+        """Create indexes or tables; may return a background task that finishes the setup."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def upsert(self, kind: str, documents: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Insert or merge documents by dedup key; returns the inserted/updated/unchanged counts."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def remove_provider(self, kind: str, provider: str, urls: List[str] = None, paths: List[str] = None):
+        """Remove a provider's copies, all of them or those with ``urls`` or at ``paths``."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def delete_providers(self, providers: List[str]):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def delete_provider_media(self, output_dir: str):
+        """Remove documents stored under a results directory that carry no provider."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_movie(self, movie_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_series(self, series_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_season(self, series_id: str, season_number: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_episode(self, series_id: str, season_number: str, episode_number: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def page(self, kind: str, sort: str, size: int, after: Optional[List[Any]] = None, skip: int = 0,
+                   search: Optional[str] = None, basic: bool = False) -> Tuple[List[Dict[str, Any]], Optional[List[Any]]]:
+        """One page of documents in ``sort`` order and the position to continue from, see services.pagination.
+
+        ``search`` restricts the page to titles matching the query, ``basic`` leaves out the seasons of shows.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def export(self, types: List[str], provider: Optional[str] = None,
+               since: Optional[datetime] = None) -> AsyncIterator[bytes]:
+        """Chunks of JSON Lines with every document of ``types``, see services.catalog_export."""
+        raise NotImplementedError
+
+    async def close(self):
+        """Release connections and threads when the server shuts down."""
+
+
+_store = None
+
+
+def catalog_store() -> CatalogStore:
+    """The store selected by STORAGE_BACKEND, created on first use."""
+    global _store
+    if _store is None:
+        # Imported here, the backends import this module
+        if STORAGE_BACKEND == 'sqlite':
+            from services.sqlite_store import SqliteCatalogStore
+            _store = SqliteCatalogStore(SQLITE_PATH)
+        else:
+            from services.database_service import MongoCatalogStore
+            _store = MongoCatalogStore()
+    return _store
@@ -0,0 +1,103 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from services.log_and_progress import log_message
+from services.snapshot import url_hash
+
+MANIFEST_FILE = 'strm_manifest.json'
+MANIFEST_VERSION = 1
+
+
+class StrmManifest:
+    """Maps each .strm file under a results directory to the hash of the URL it holds.
+
+    Writers consult the manifest instead of opening existing files, and the
+    manifest is persisted once at the end of a run.
+    """
+
+    def __init__(self, base_dir, entries=None):
+        self.base_dir = os.path.normpath(base_dir)
+        self.entries = entries if entries is not None else {}
+        self.seen = set()  # Keys claimed by the records written in this run
+        self._prefix_length = len(self.base_dir) + len(os.sep)
+
+    def _key(self, path):
+        path = os.path.normpath(path)
+        if path.startswith(self.base_dir + os.sep):
+            return path[self._prefix_length:]
+        return os.path.relpath(path, self.base_dir)
+
+    def claim(self, path, url):
+        """Mark ``path`` as part of the current playlist; True when it already holds ``url``."""
+        key = self._key(path)
+        self.seen.add(key)
+        return self.entries.get(key) == url_hash(url.strip())
+
+    def record(self, path, url):
+        self.entries[self._key(path)] = url_hash(url.strip())
+
+    def discard(self, path):
+        self.entries.pop(self._key(path), None)
+
+    def stale_paths(self):
+        """Files known to the manifest that no record claimed in this run."""
+        return [os.path.join(self.base_dir, key) for key in self.entries if key not in self.seen]
+
+    def save(self):
+        """Persist atomically so an interrupted run never leaves a truncated manifest."""
+        os.makedirs(self.base_dir, exist_ok=True)
+        manifest_path = os.path.join(self.base_dir, MANIFEST_FILE)
+        temp_path = manifest_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump({'version': MANIFEST_VERSION, 'entries': self.entries}, file,
+                      ensure_ascii=False, separators=(',', ':'))
+        os.replace(temp_path, manifest_path)
+
+
+def _read_strm(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            return path, file.read().strip()
+    except OSError:
+        return path, None
+
+
+def rebuild_manifest(base_dir, max_workers=16):
+    """Rebuild the manifest by reading every .strm file below ``base_dir``."""
+    manifest = StrmManifest(base_dir)
+    paths = []
+    for root, _, files in os.walk(manifest.base_dir):
+        paths.extend(os.path.join(root, name) for name in files if name.endswith('.strm'))
+
+    # Reads are I/O bound, which matters most on network mounted results volumes
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for path, url in executor.map(_read_strm, paths, chunksize=256):
+            if url is not None:
+                manifest.record(path, url)
+    log_message(f"Rebuilt STRM manifest for {base_dir} from {len(manifest.entries)} files", level='info')
+    return manifest
+
+
+def load_manifest(base_dir, verify=False):
+    """Load the manifest of a results directory.
+
+    It is rebuilt from disk when ``verify`` is set, when it is missing or unreadable
+    while .strm folders exist, or when it was written by another manifest version.
+    """
+    manifest_path = os.path.join(base_dir, MANIFEST_FILE)
+    if not verify and os.path.exists(manifest_path):
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+            if data.get('version') == MANIFEST_VERSION:
+                return StrmManifest(base_dir, data['entries'])
+        except (OSError, ValueError, KeyError):
+            pass
+        log_message(f"STRM manifest for {base_dir} is unreadable, rebuilding it", level='warning')
+        return rebuild_manifest(base_dir)
+
+    has_streams = any(os.path.isdir(os.path.join(base_dir, folder)) for folder in ('movies', 'series'))
+    if verify or has_streams:
+        return rebuild_manifest(base_dir)
+    return StrmManifest(base_dir)
@@ -1,72 +1,216 @@
 import os
-import re
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue
 from tqdm import tqdm
-from services.log_and_progress import log_message  
-from services.m3u_parser import sanitize_filename, remove_season_episode_info, remove_season_episode_info_full  # Update this import
-
-
-def write_strm_file(entry, base_dir, file_type):
-    if 'name' in entry and 'url' in entry:
-        name = entry['name']
-        title = entry.get('title', '')
-        is_series = re.search(r'\b[Ss][._-]?\s*(\d{1,10})[._-]?\s*E\s*(\d{1,10})\b', name)
-
-        if is_series or 'Series' in title:
-            match = re.search(r'^(.*?)(?:\s*\[.*\])?\s*[Ss][._-]?\s*(\d{1,10})[._-]?\s*E(\d{1,10})$', name, re.IGNORECASE)
-            
-            if match:
-                show_name, season, episode = match.groups()
-                season = season.zfill(2)
-                season_dir = f"Season {season}"
-                safe_show_name = sanitize_filename(remove_season_episode_info(show_name))
-                dir_path = os.path.join(base_dir, 'series', safe_show_name, season_dir)
-                os.makedirs(dir_path, exist_ok=True)
-                safe_name = sanitize_filename(f"{safe_show_name} S{season} E{episode}")
-            
-            
-            elif is_series:
-                season, episode = is_series.groups()
-                show_name = entry['name']
-                season = season.zfill(2)
-                season_dir = f"Season {season}"
-                safe_show_name = sanitize_filename(remove_season_episode_info_full(show_name))
-                dir_path = os.path.join(base_dir, 'series', safe_show_name, season_dir)
-                os.makedirs(dir_path, exist_ok=True)
-                safe_name = sanitize_filename(f"{safe_show_name} S{season} E{episode}")
-            
-            else:
-                log_message("Error couldn't parse " + entry['name'])
-                return
-        else:
-            safe_name = sanitize_filename(name)
-            dir_path = os.path.join(base_dir, 'movies', safe_name)
-            os.makedirs(dir_path, exist_ok=True)
-            safe_name = sanitize_filename(safe_name)
-
-        file_name = safe_name + '.strm'
-        file_path = os.path.join(dir_path, file_name)
-
-        # Check if the .strm file already exists
-        if os.path.exists(file_path):
-            # Read the existing file content
-            with open(file_path, 'r', encoding='utf-8') as existing_strm_file:
-                existing_url = existing_strm_file.read().strip()
-
-            # If the URL is the same, do not overwrite the file
-            if existing_url == entry['url'].strip():
+from services.log_and_progress import log_message
+
+BATCH_SIZE = 256
+
+
+class _DirectoryWorker(threading.Thread):
+    """Writes every batch for the directories hashed to it, in the order they were queued.
+
+    Because a directory always goes to the same worker, two entries that sanitize
+    to the same path are never written concurrently and the first one in playlist
+    order wins, matching the primary copy kept in the database.
+    """
+
+    def __init__(self, queue_size, pbar, manifest=None):
+        super().__init__(daemon=True)
+        self.queue = Queue(maxsize=queue_size)
+        self.pbar = pbar
+        self.manifest = manifest
+        self.created_dirs = set()  # Directories known to exist
+        self.claimed_paths = set()  # .strm paths already assigned in this run
+        self.counts = {'written': 0, 'unchanged': 0, 'duplicates': 0, 'errors': 0}
+
+    def run(self):
+        while True:
+            batch = self.queue.get()
+            if batch is None:
                 return
+            dir_path, records = batch
+            self.write_batch(dir_path, records)
+            self.pbar.update(len(records))
+
+    def ensure_dir(self, dir_path):
+        """Create ``dir_path`` once; returns its listing when it already existed."""
+        if dir_path in self.created_dirs:
+            return None  # Created earlier in this run, check files individually
+        try:
+            os.makedirs(dir_path)
+        except FileExistsError:
+            self.created_dirs.add(dir_path)
+            # One listing per directory replaces an exists() call per file
+            return set(os.listdir(dir_path)) if self.manifest is None else None
+        self.created_dirs.add(dir_path)
+        return set()
 
-        # Write or overwrite the .strm file with the new URL
-        with open(file_path, 'w', encoding='utf-8') as strm_file:
-            strm_file.write(entry['url'])
+    def write_batch(self, dir_path, records):
+        manifest = self.manifest
+        existing = None
+        dir_ready = False
+        for record in records:
+            # A failing entry is counted and skipped, it must not stop the worker the queue is waiting on
+            try:
+                file_name = record.name + '.strm'
+                file_path = os.path.join(dir_path, file_name)
+                if file_path in self.claimed_paths:
+                    self.counts['duplicates'] += 1
+                    continue
+                self.claimed_paths.add(file_path)
 
+                if manifest is not None and manifest.claim(file_path, record.url):
+                    # Decided from memory, the file is neither stat'ed nor opened
+                    self.counts['unchanged'] += 1
+                    continue
 
-def write_strm_files(entries, base_dir, file_type, max_workers):
-    total_entries = len(entries)
+                if not dir_ready:
+                    existing = self.ensure_dir(dir_path)
+                    dir_ready = True
+
+                if manifest is None:
+                    present = os.path.exists(file_path) if existing is None else file_name in existing
+                    if present:
+                        with open(file_path, 'r', encoding='utf-8') as existing_strm_file:
+                            if existing_strm_file.read().strip() == record.url.strip():
+                                self.counts['unchanged'] += 1
+                                continue
+
+                with open(file_path, 'w', encoding='utf-8') as strm_file:
+                    strm_file.write(record.url)
+                if manifest is not None:
+                    manifest.record(file_path, record.url)
+                self.counts['written'] += 1
+            except Exception as e:
+                self.counts['errors'] += 1
+                log_message(f"Error writing stream {record.name} in {dir_path}: {e}", level='error')
+
+
+def write_strm_files(records, file_type, max_workers, batch_size=BATCH_SIZE, manifest=None):
+    """Write .strm files for any iterable of ClassifiedEntry records, including lazy generators.
+
+    Records are grouped by target directory and handed to the worker owning that
+    directory through a bounded queue, so memory stays flat however many entries
+    the playlist has. With a StrmManifest, unchanged files are skipped without
+    touching the disk and the manifest is updated for every file written; the
+    caller saves it. Returns the written/unchanged/duplicate/error counts.
+    """
+    total_entries = len(records) if hasattr(records, '__len__') else None
+    max_buffered = batch_size * max_workers * 4
 
     with tqdm(total=total_entries, desc=f"Writing Streams {file_type}", unit="file") as pbar:
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = [executor.submit(write_strm_file, entry, base_dir, file_type) for entry in entries]
-            for future in as_completed(futures):
-                pbar.update(1)
+        workers = [_DirectoryWorker(max_workers * 4, pbar, manifest) for _ in range(max_workers)]
+        for worker in workers:
+            worker.start()
+
+        def flush(dir_path, batch):
+            workers[hash(dir_path) % max_workers].queue.put((dir_path, batch))
+
+        try:
+            pending = {}
+            buffered = 0
+            for record in records:
+                dir_path = record.dir_path
+                batch = pending.get(dir_path)
+                if batch is None:
+                    batch = pending[dir_path] = []
+                batch.append(record)
+                buffered += 1
+                if len(batch) >= batch_size:
+                    flush(dir_path, pending.pop(dir_path))
+                    buffered -= len(batch)
+                elif buffered >= max_buffered:
+                    for pending_dir, pending_batch in pending.items():
+                        flush(pending_dir, pending_batch)
+                    pending = {}
+                    buffered = 0
+
+            for pending_dir, pending_batch in pending.items():
+                flush(pending_dir, pending_batch)
+        finally:
+            for worker in workers:
+                worker.queue.put(None)
+            for worker in workers:
+                worker.join()
+
+    counts = {'written': 0, 'unchanged': 0, 'duplicates': 0, 'errors': 0}
+    for worker in workers:
+        for key, value in worker.counts.items():
+            counts[key] += value
+    if counts['duplicates'] or counts['errors']:
+        log_message(f"Streams {file_type}: {counts['duplicates']} entries shared a path with an earlier entry, "
+                    f"{counts['errors']} could not be written", level='warning')
+    return counts
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return True
+    except OSError as e:
+        log_message(f"Error removing stale stream {path}: {e}", level='error')
+        return False
+
+
+def _emptied_directories(base_dir, stale_paths):
+    """Directories below movies/ or series/ that hold nothing once ``stale_paths`` are gone."""
+    removed = defaultdict(set)
+    for path in stale_paths:
+        removed[os.path.dirname(path)].add(os.path.basename(path))
+
+    roots = {os.path.join(base_dir, 'movies'), os.path.join(base_dir, 'series'), base_dir}
+    emptied = []
+    # Deepest level first, so a show folder sees which of its season folders will be emptied
+    depth = max((path.count(os.sep) for path in removed), default=0)
+    while depth > 0:
+        for dir_path in [path for path in removed if path.count(os.sep) == depth]:
+            if dir_path in roots:
+                continue
+            try:
+                remaining = set(os.listdir(dir_path)) - removed[dir_path]
+            except FileNotFoundError:
+                continue
+            if not remaining:
+                emptied.append(dir_path)
+                removed[os.path.dirname(dir_path)].add(os.path.basename(dir_path))
+        depth -= 1
+    return emptied
+
+
+def prune_stale_files(manifest, dry_run=False, max_workers=16):
+    """Remove the .strm files of entries that are no longer in the playlist.
+
+    Stale files are the ones the manifest knows about but no record claimed while
+    writing, so this must run after ``write_strm_files`` with the same manifest.
+    Season, show and movie folders left empty are removed too. With ``dry_run``
+    nothing is touched and the report lists what would be removed.
+    """
+    return remove_stale_files(manifest, manifest.stale_paths(), dry_run, max_workers)
+
+
+def remove_stale_files(manifest, stale_paths, dry_run=False, max_workers=16):
+    """Remove ``stale_paths`` and the folders they leave empty, and drop them from the manifest."""
+    directories = _emptied_directories(manifest.base_dir, stale_paths)
+    report = {'files': stale_paths, 'directories': directories, 'dry_run': dry_run}
+    if dry_run or not stale_paths:
+        return report
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(_remove_file, stale_paths, chunksize=64))
+    for path, removed in zip(stale_paths, results):
+        if removed:
+            manifest.discard(path)
+
+    for dir_path in directories:
+        try:
+            os.rmdir(dir_path)
+        except OSError:
+            pass  # Something was added to it meanwhile, keep it
+    log_message(f"Pruned {len(stale_paths)} stale streams and {len(directories)} empty folders "
+                f"from {manifest.base_dir}", level='info')
+    return report
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The services are imported the way the app imports them, relative to the backend directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
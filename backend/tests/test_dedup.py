@@ -0,0 +1,54 @@
+from datetime import datetime, timezone
+
+from services.classifier import classify_m3u
+from services.dedup import keyed_batch, merge_movie, merge_series
+from services.json_utils import build_catalogs
+
+PLAYLIST = """#EXTM3U
+#EXTINF:-1 tvg-name="Beta (2019)" group-title="Movies: Drama",Beta (2019)
+http://host/movie/u/p/1.mp4
+#EXTINF:-1 tvg-name="Show S01 E01" group-title="Series: Drama",Show S01 E01
+http://host/series/u/p/2.mkv
+#EXTINF:-1 tvg-name="Show S01 E02" group-title="Series: Drama",Show S01 E02
+http://host/series/u/p/3.mkv
+"""
+
+
+def build(tmp_path):
+    playlist = tmp_path / 'provider.m3u'
+    playlist.write_text(PLAYLIST)
+    movies, series = classify_m3u(str(playlist), str(tmp_path / 'provider'))
+    movies, series = build_catalogs(movies + series, progress=False)
+    return (next(iter(keyed_batch(movies, merge_movie).values())),
+            next(iter(keyed_batch(series, merge_series).values())))
+
+
+def stored(document):
+    """The document as insert_documents and the probes leave it in the database."""
+    return {**document, '_id': 'stored', 'updated_at': datetime(2026, 1, 1, tzinfo=timezone.utc),
+            'duration': '3600', 'resolution': '1920x1080'}
+
+
+def test_reloading_an_unchanged_series_changes_nothing(tmp_path):
+    _, show = build(tmp_path)
+    canonical = stored(show)
+    _, reloaded = build(tmp_path)
+    assert merge_series(canonical, reloaded) == canonical
+
+
+def test_reloading_an_unchanged_movie_changes_nothing(tmp_path):
+    movie, _ = build(tmp_path)
+    canonical = stored(movie)
+    reloaded, _ = build(tmp_path)
+    assert merge_movie(canonical, reloaded) == canonical
+
+
+def test_reloaded_series_takes_the_new_episode_urls(tmp_path):
+    _, show = build(tmp_path)
+    canonical = stored(show)
+    _, reloaded = build(tmp_path)
+    reloaded['seasons'][0]['episodes'][0]['url'] = 'http://host/series/u/p/20.mkv'
+    merged = merge_series(canonical, reloaded)
+    assert merged['updated_at'] == canonical['updated_at']
+    assert merged['seasons'][0]['episodes'][0]['url'] == 'http://host/series/u/p/20.mkv'
+    assert merged['seasons'][0]['episodes'][0]['alternates'] == []
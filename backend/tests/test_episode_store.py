@@ -0,0 +1,26 @@
+from pymongo import ReplaceOne
+
+from services.episode_store import episode_key, episode_operations
+
+
+def show(url):
+    return {'_id': 'show', 'seasons': [{'season': '01', 'path': 'Show/Season 01', 'episodes': [
+        {'episode': '01', 'url': url, 'provider': 'A', 'path': 'Show/Season 01/e1.strm', 'alternates': []}]}]}
+
+
+def attached(document):
+    """The show as attach_episodes returns it, stored episodes without their series_id."""
+    stored = show(document['seasons'][0]['episodes'][0]['url'])
+    stored['seasons'][0]['episodes'][0].update({'_id': 'episode', 'season': '01'})
+    return stored
+
+
+def test_unchanged_episodes_are_not_written():
+    assert episode_operations(show('http://a/1'), attached(show('http://a/1'))) == []
+
+
+def test_changed_episodes_are_replaced():
+    changed = show('http://a/2')
+    document = {**changed['seasons'][0]['episodes'][0], **episode_key('show', '01', '01')}
+    assert episode_operations(changed, attached(show('http://a/1'))) == [
+        ReplaceOne(episode_key('show', '01', '01'), document, upsert=True)]
@@ -0,0 +1,33 @@
+import pytest
+from bson import ObjectId
+
+from services.pagination import InvalidCursor, after_query, decode_cursor, encode_cursor, position
+
+
+def test_cursor_round_trip():
+    positions = {'movies': ['Alpha', str(ObjectId())], 'series': None}
+    token = encode_cursor('name', positions)
+    assert '=' not in token
+    assert decode_cursor(token, 'name') == positions
+
+
+@pytest.mark.parametrize('token', ['', 'not a cursor', encode_cursor('name', {'movies': ['Alpha', 'bad id']}),
+                                   encode_cursor('name', {'movies': ['Alpha']})])
+def test_malformed_cursor_is_rejected(token):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(token, 'name')
+
+
+def test_cursor_of_another_sort_is_rejected():
+    token = encode_cursor('recent', {'movies': [None, str(ObjectId())]})
+    with pytest.raises(InvalidCursor):
+        decode_cursor(token, 'name')
+
+
+def test_after_query_continues_after_the_position():
+    document = {'_id': ObjectId(), 'name': 'Alpha'}
+    assert after_query({}, 'name', None) == {}
+    assert after_query({}, 'name', position(document, 'name')) == {
+        '$or': [{'name': {'$gt': 'Alpha'}}, {'name': 'Alpha', '_id': {'$gt': document['_id']}}]}
+    assert after_query({'provider': 'A'}, 'recent', position(document, 'recent')) == {
+        '$and': [{'provider': 'A'}, {'_id': {'$lt': document['_id']}}]}
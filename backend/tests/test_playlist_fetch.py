@@ -0,0 +1,90 @@
+import gzip
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from services.playlist_fetch import IncompleteDownload, fetch_playlist
+
+BODY = b''.join(b'#EXTINF:-1 tvg-name="Title %d",Title %d\nhttp://example.com/movie/%d.mp4\n' % (i, i, i)
+                for i in range(20000))
+ETAG = '"v1"'
+
+
+class PlaylistHandler(BaseHTTPRequestHandler):
+    """Serves BODY with ETag, gzip and Range support; ``truncate`` cuts the next response short."""
+
+    truncate = None  # None, 'identity' or 'gzip'
+
+    def do_GET(self):
+        if self.headers.get('If-None-Match') == ETAG:
+            self.send_response(304)
+            self.end_headers()
+            return
+        body, status = BODY, 200
+        byte_range = self.headers.get('Range')
+        if byte_range and self.headers.get('If-Range') == ETAG:
+            start = int(byte_range[len('bytes='):].rstrip('-'))
+            body, status = BODY[start:], 206
+        gzipped = 'gzip' in self.headers.get('Accept-Encoding', '') and status == 200
+        if gzipped:
+            body = gzip.compress(body)
+
+        truncate, PlaylistHandler.truncate = PlaylistHandler.truncate, None
+        self.send_response(status)
+        self.send_header('ETag', ETAG)
+        if gzipped:
+            self.send_header('Content-Encoding', 'gzip')
+        if truncate != 'gzip':
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body[:len(body) // 2] if truncate else body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), PlaylistHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_address[1]}/get.php'
+    httpd.shutdown()
+    httpd.server_close()
+    PlaylistHandler.truncate = None
+
+
+def read(path):
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+def test_download_then_not_modified(server, tmp_path):
+    destination = str(tmp_path / 'provider.m3u')
+
+    result = fetch_playlist(server, destination)
+    assert result['status'] == 'downloaded'
+    assert read(destination) == BODY
+
+    assert fetch_playlist(server, destination)['status'] == 'not_modified'
+    assert read(destination) == BODY
+
+
+@pytest.mark.parametrize('truncate', ['identity', 'gzip'])
+def test_truncated_body_is_kept_for_resume(server, tmp_path, truncate):
+    destination = str(tmp_path / 'provider.m3u')
+    PlaylistHandler.truncate = truncate
+
+    with pytest.raises(IncompleteDownload):
+        fetch_playlist(server, destination)
+    assert not os.path.exists(destination)
+    assert os.path.exists(destination + '.part')
+
+    # The validators of an incomplete body must not make the next fetch a 304
+    result = fetch_playlist(server, destination)
+    assert result['status'] == 'resumed'
+    assert read(destination) == BODY
+    assert not os.path.exists(destination + '.part')
+    assert fetch_playlist(server, destination)['status'] == 'not_modified'
@@ -0,0 +1,37 @@
+import asyncio
+
+import pytest
+
+from services import probe_cache
+
+
+class FakeCollection:
+    """Records the entries the probe cache stores, it is empty to begin with."""
+
+    def __init__(self):
+        self.entries = {}
+
+    async def find_one(self, query):
+        return None
+
+    async def replace_one(self, query, document, upsert=False):
+        self.entries[query['_id']] = document
+
+
+@pytest.mark.parametrize('result, ttl', [
+    (('5400', '1920x1080'), probe_cache.PROBE_CACHE_TTL),
+    (('Error', 'Error'), probe_cache.PROBE_NEGATIVE_TTL),
+    (('5400', 'Error'), probe_cache.PROBE_NEGATIVE_TTL),
+    (('Error', '1920x1080'), probe_cache.PROBE_NEGATIVE_TTL),
+])
+def test_failed_fields_get_the_negative_ttl(monkeypatch, result, ttl):
+    collection = FakeCollection()
+    monkeypatch.setattr(probe_cache, 'probe_cache_collection', collection)
+
+    async def probe(url):
+        return result
+    monkeypatch.setattr(probe_cache, 'probe_video_info', probe)
+
+    assert asyncio.run(probe_cache.cached_video_info('http://host/1.mp4')) == result
+    entry = collection.entries['http://host/1.mp4']
+    assert entry['expires_at'] - entry['created_at'] == ttl
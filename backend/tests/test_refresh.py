@@ -0,0 +1,41 @@
+import asyncio
+import os
+
+import pytest
+
+from services import storage
+from services.database_service import refresh_m3u
+from services.sqlite_store import SqliteCatalogStore
+
+ENTRY = '#EXTINF:-1 tvg-name="{name}" group-title="Movies: Drama",{name}\nhttp://host/movie/u/p/{id}.mp4\n'
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = SqliteCatalogStore(str(tmp_path / 'catalog.db'))
+    asyncio.run(store.prepare())
+    monkeypatch.setattr(storage, '_store', store)
+    yield store
+    asyncio.run(store.close())
+
+
+def refresh(tmp_path, *entries):
+    playlist = tmp_path / 'provider.m3u'
+    playlist.write_text('#EXTM3U\n' + ''.join(ENTRY.format(name=name, id=id) for name, id in entries))
+    return asyncio.run(refresh_m3u(str(playlist), str(tmp_path / 'provider')))
+
+
+def test_refresh_removes_dropped_entries_and_their_folders(tmp_path, store):
+    refresh(tmp_path, ('Alpha (2019)', 1), ('Beta (2019)', 2))
+    counts = refresh(tmp_path, ('Alpha (2019)', 1))
+    assert (counts['removed'], counts['unchanged']) == (1, 1)
+    assert os.path.exists(tmp_path / 'provider' / 'movies' / 'Alpha (2019)' / 'Alpha (2019).strm')
+    assert not os.path.exists(tmp_path / 'provider' / 'movies' / 'Beta (2019)')
+
+
+def test_refresh_keeps_a_path_an_unchanged_entry_shares_with_a_removed_one(tmp_path, store):
+    # Both names sanitize to the same .strm path
+    refresh(tmp_path, ('Beta (2019)', 1), ('Beta? (2019)', 2))
+    counts = refresh(tmp_path, ('Beta (2019)', 1))
+    assert (counts['removed'], counts['unchanged']) == (1, 1)
+    assert os.path.exists(tmp_path / 'provider' / 'movies' / 'Beta (2019)' / 'Beta (2019).strm')
@@ -0,0 +1,46 @@
+from services.classifier import ClassifiedEntry
+from services.snapshot import diff_snapshot, load_snapshot, save_snapshot
+
+
+def movie(name, url, base_dir='/results/provider'):
+    return ClassifiedEntry('movies', name, url, None, base_dir)
+
+
+def test_first_diff_adds_every_record():
+    diff = diff_snapshot({}, [movie('Alpha', 'http://a/1'), movie('Beta', 'http://a/2')])
+    assert diff.counts() == {'added': 2, 'changed': 0, 'removed': 0, 'unchanged': 0}
+    assert len(diff.snapshot) == 2
+
+
+def test_diff_against_previous_snapshot():
+    previous = diff_snapshot({}, [movie('Alpha', 'http://a/1'), movie('Beta', 'http://a/2'),
+                                  movie('Gamma', 'http://a/3')]).snapshot
+    diff = diff_snapshot(previous, [movie('Alpha', 'http://a/1'), movie('Beta Renamed', 'http://a/2'),
+                                    movie('Delta', 'http://a/4')])
+    assert diff.counts() == {'added': 1, 'changed': 1, 'removed': 1, 'unchanged': 1}
+    assert diff.added[0].name == 'Delta'
+    old_row, record = diff.changed[0]
+    assert old_row[3].endswith('Beta.strm') and record.name == 'Beta Renamed'
+    assert diff.removed[0][2] == 'http://a/3'
+
+
+def test_rotated_url_is_removed_and_added_at_the_same_path():
+    previous = diff_snapshot({}, [movie('Alpha', 'http://a/1')]).snapshot
+    diff = diff_snapshot(previous, [movie('Alpha', 'http://a/2')])
+    assert diff.counts() == {'added': 1, 'changed': 0, 'removed': 1, 'unchanged': 0}
+    assert diff.removed[0][3] == diff.added[0].strm_path
+
+
+def test_url_listed_twice_keeps_both_entries():
+    records = [movie('Alpha', 'http://a/1'), movie('Alpha Copy', 'http://a/1')]
+    diff = diff_snapshot({}, records)
+    assert len(diff.snapshot) == 2
+    assert diff_snapshot(diff.snapshot, records).counts()['unchanged'] == 2
+
+
+def test_snapshot_round_trip(tmp_path):
+    assert load_snapshot(str(tmp_path)) == {}
+    snapshot = diff_snapshot({}, [movie('Alpha', 'http://a/1')]).snapshot
+    save_snapshot(str(tmp_path), snapshot)
+    assert load_snapshot(str(tmp_path)) == snapshot
+    assert not (tmp_path / 'snapshot.json.tmp').exists()
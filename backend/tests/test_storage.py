@@ -0,0 +1,23 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from services import storage
+from services.routes import router
+from services.sqlite_store import SqliteCatalogStore
+
+
+def test_catalog_store_is_abstract():
+    with pytest.raises(TypeError):
+        storage.CatalogStore()
+
+
+@pytest.mark.parametrize('path', ['/api/media_info/http://host/1.mp4?media_id=1&media_type=movie',
+                                  '/api/series_info/http://host/1.mp4?s_id=1', '/api/admin/index-stats'])
+def test_mongo_only_routes_are_rejected_on_sqlite(tmp_path, monkeypatch, path):
+    monkeypatch.setattr(storage, '_store', SqliteCatalogStore(str(tmp_path / 'catalog.db')))
+    app = FastAPI()
+    app.include_router(router, prefix='/api')
+    response = TestClient(app).get(path)
+    assert response.status_code == 501
+    assert 'MongoDB' in response.json()['detail']
@@ -0,0 +1,69 @@
+import os
+
+from services.strm_manifest import StrmManifest, load_manifest
+from services.strm_utils import prune_stale_files, remove_stale_files
+
+
+def write(path, url):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(url)
+
+
+def test_claim_matches_recorded_url(tmp_path):
+    manifest = StrmManifest(str(tmp_path))
+    path = str(tmp_path / 'movies' / 'Alpha' / 'Alpha.strm')
+    assert not manifest.claim(path, 'http://a/1')
+    manifest.record(path, 'http://a/1')
+    assert manifest.claim(path, 'http://a/1\n')
+    assert not manifest.claim(path, 'http://a/2')
+
+
+def test_manifest_round_trip_and_rebuild(tmp_path):
+    path = str(tmp_path / 'movies' / 'Alpha' / 'Alpha.strm')
+    write(path, 'http://a/1')
+    manifest = load_manifest(str(tmp_path))  # No manifest yet, rebuilt from the .strm files
+    assert manifest.claim(path, 'http://a/1')
+    manifest.save()
+    assert load_manifest(str(tmp_path)).entries == manifest.entries
+
+    (tmp_path / 'strm_manifest.json').write_text('{truncated')
+    assert load_manifest(str(tmp_path)).entries == manifest.entries
+
+
+def test_prune_removes_unclaimed_files_and_emptied_folders(tmp_path):
+    kept = str(tmp_path / 'series' / 'Show' / 'Season 01' / 'E01.strm')
+    stale_episode = str(tmp_path / 'series' / 'Gone' / 'Season 01' / 'E01.strm')
+    stale_movie = str(tmp_path / 'movies' / 'Old' / 'Old.strm')
+    sibling = str(tmp_path / 'series' / 'Show' / 'Season 01' / 'E02.strm')
+    manifest = StrmManifest(str(tmp_path))
+    for path in (kept, stale_episode, stale_movie, sibling):
+        write(path, path)
+        manifest.record(path, path)
+    manifest.claim(kept, kept)
+    manifest.claim(sibling, sibling)
+
+    report = prune_stale_files(manifest, dry_run=True)
+    assert sorted(report['files']) == sorted([stale_episode, stale_movie])
+    assert os.path.exists(stale_movie)
+
+    prune_stale_files(manifest)
+    assert os.path.exists(kept) and os.path.exists(sibling)
+    assert not os.path.exists(tmp_path / 'series' / 'Gone')
+    assert not os.path.exists(tmp_path / 'movies' / 'Old')
+    assert os.path.isdir(tmp_path / 'movies')  # The kind folders themselves stay
+    assert sorted(manifest.entries) == sorted(os.path.relpath(path, tmp_path) for path in (kept, sibling))
+
+
+def test_remove_keeps_folders_with_other_files(tmp_path):
+    removed = str(tmp_path / 'series' / 'Show' / 'Season 01' / 'E01.strm')
+    other = str(tmp_path / 'series' / 'Show' / 'Season 02' / 'E01.strm')
+    manifest = StrmManifest(str(tmp_path))
+    for path in (removed, other):
+        write(path, path)
+        manifest.record(path, path)
+
+    report = remove_stale_files(manifest, [removed])
+    assert report['directories'] == [str(tmp_path / 'series' / 'Show' / 'Season 01')]
+    assert os.path.exists(other)
+    assert list(manifest.entries) == [os.path.relpath(other, tmp_path)]
@@ -1,47 +1,55 @@
 import os
 import asyncio
 import argparse
-from services.database_service import insert_all_json_movies, insert_all_json_series
-from services.json_utils import create_json
+from services.database_service import (insert_all_json_movies, insert_all_json_series, update_all_movies,
+                                       update_all_episodes, migrate_documents)
+from services.json_utils import create_catalogs, catalog_path
 from services.log_and_progress import log_message
-from services.m3u_parser import parse_m3u
-from services.strm_utils import write_strm_files
+from services.classifier import iter_classified
+from services.strm_utils import write_strm_files, prune_stale_files
+from services.strm_manifest import load_manifest
+from services.storage import STORAGE_BACKEND
 import uvicorn
 
 
-def create_results(m3u_files):
+def create_results(m3u_files, workers=1, verify_manifest=False, prune_dry_run=False):
     for m3u_file in m3u_files:
         try:
             base_name = os.path.basename(m3u_file).split('.')[0]
             output_dir = f'./results/Result_{base_name}'
             log_message(f"Processing m3u File: {m3u_file}", level='info')
 
-            movies, series = parse_m3u(m3u_file)
             max_workers = max(1, os.cpu_count() - 2)
-            write_strm_files(movies, output_dir, 'movies', max_workers)
-            write_strm_files(series, output_dir, 'series', max_workers)
-            if not os.path.exists(output_dir):
-                os.makedirs(output_dir)
+            manifest = load_manifest(output_dir, verify_manifest)
+            counts = write_strm_files(iter_classified(m3u_file, output_dir, workers), 'media', max_workers,
+                                      manifest=manifest)
+            if sum(counts.values()) and not counts['errors']:
+                report = prune_stale_files(manifest, prune_dry_run)
+                if prune_dry_run:
+                    for path in report['files'] + report['directories']:
+                        print(f"Would remove: {path}")
+            else:
+                log_message(f"Skipping the prune of {output_dir}: the playlist was empty or streams failed to write",
+                            level='warning')
+            manifest.save()
 
             log_message(f"Processing completed for: {m3u_file}", level='info')
         except Exception as e:
             log_message(f"Error processing {m3u_file}: {str(e)}", level='error')
 
 
-def create_json_files(m3u_files):
+def create_json_files(m3u_files, workers=1):
     for m3u_file in m3u_files:
         try:
             base_name = os.path.basename(m3u_file).split('.')[0]
             output_dir = f'./results/Result_{base_name}'
             log_message(f"Processing m3u File: {m3u_file}", level='info')
-            movies, series = parse_m3u(m3u_file)
 
             if not os.path.exists(output_dir):
                 os.makedirs(output_dir)
-            create_json(movies, output_dir, 'movies')
-            log_message(f"Movie processing completed for: {m3u_file}", level='info')
-            create_json(series, output_dir, 'series')
-            log_message(f"Series processing completed for: {m3u_file}", level='info')
+            movies, series = create_catalogs(iter_classified(m3u_file, output_dir, workers), output_dir)
+            log_message(f"JSON processing completed for: {m3u_file}: {len(movies)} movies, {len(series)} series",
+                        level='info')
         except Exception as e:
             log_message(f"Error processing {m3u_file}: {str(e)}", level='error')
 
@@ -54,20 +62,20 @@ async def insert_all_m3us():
     for subdir in os.listdir(base_directory):
         subdir_path = os.path.join(base_directory, subdir)
         if os.path.isdir(subdir_path):
-            movies_json_path = os.path.join(subdir_path, "movies.json")
-            series_json_path = os.path.join(subdir_path, "series.json")
+            movies_json_path = catalog_path(subdir_path, "movies")
+            series_json_path = catalog_path(subdir_path, "series")
 
-            if os.path.exists(movies_json_path):
+            if movies_json_path:
                 movies_json_paths.append(movies_json_path)
-                print(f"Found movies JSON file: {movies_json_path}")
+                print(f"Found movies catalog: {movies_json_path}")
             else:
-                print(f"Movies JSON file not found in {subdir_path}")
+                print(f"Movies catalog not found in {subdir_path}")
 
-            if os.path.exists(series_json_path):
+            if series_json_path:
                 series_json_paths.append(series_json_path)
-                print(f"Found series JSON file: {series_json_path}")
+                print(f"Found series catalog: {series_json_path}")
             else:
-                print(f"Series JSON file not found in {subdir_path}")
+                print(f"Series catalog not found in {subdir_path}")
 
     for movie_path in movies_json_paths:
         await insert_all_json_movies([movie_path])
@@ -77,28 +85,35 @@ async def insert_all_m3us():
 
 
 async def insert_a_single_file_to_database(m3u_file_path):
-    movies_json_path = os.path.join(m3u_file_path, "movies.json")
-    series_json_path = os.path.join(m3u_file_path, "series.json")
+    movies_json_path = catalog_path(m3u_file_path, "movies")
+    series_json_path = catalog_path(m3u_file_path, "series")
 
-    if os.path.exists(movies_json_path):
-        print(f"Found movies JSON file: {movies_json_path}")
+    if movies_json_path:
+        print(f"Found movies catalog: {movies_json_path}")
         await insert_all_json_movies([movies_json_path])
     else:
-        print(f"Movies JSON file not found at: {movies_json_path}")
+        print(f"Movies catalog not found in: {m3u_file_path}")
 
-    if os.path.exists(series_json_path):
-        print(f"Found series JSON file: {series_json_path}")
+    if series_json_path:
+        print(f"Found series catalog: {series_json_path}")
         await insert_all_json_series([series_json_path])
     else:
-        print(f"Series JSON file not found at: {series_json_path}")
+        print(f"Series catalog not found in: {m3u_file_path}")
 
 
 def main():
     parser = argparse.ArgumentParser(description="Utility script for handling M3U files and JSON processing.")
-    parser.add_argument('command', choices=['create_results', 'create_json_files', 'insert_all_m3us', 'insert_single'],
+    parser.add_argument('command', choices=['create_results', 'create_json_files', 'insert_all_m3us', 'insert_single',
+                                            'probe_media', 'migrate'],
                         help="The command to run.")
     parser.add_argument('m3u_files', nargs='*', help="List of M3U file paths to process.")
     parser.add_argument('path', help="Path to a single directory for database insertion (only for 'insert_single').")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Number of processes used to parse each M3U file (1 parses serially).")
+    parser.add_argument('--verify-manifest', action='store_true',
+                        help="Rebuild the STRM manifest from the files on disk before writing.")
+    parser.add_argument('--prune-dry-run', action='store_true',
+                        help="List the stale streams create_results would remove instead of removing them.")
 
     args = parser.parse_args()
 
@@ -106,17 +121,27 @@ def main():
         if not args.m3u_files:
             print("Error: No M3U files provided.")
         else:
-            create_results(args.m3u_files)
+            create_results(args.m3u_files, args.workers, args.verify_manifest, args.prune_dry_run)
 
     elif args.command == 'create_json_files':
         if not args.m3u_files:
             print("Error: No M3U files provided.")
         else:
-            create_json_files(args.m3u_files)
+            create_json_files(args.m3u_files, args.workers)
 
     elif args.command == 'insert_all_m3us':
         asyncio.run(insert_all_m3us())
 
+    elif args.command in ('probe_media', 'migrate') and STORAGE_BACKEND != 'mongo':
+        print(f"Error: {args.command} needs MongoDB, STORAGE_BACKEND is {STORAGE_BACKEND}.")
+
+    elif args.command == 'probe_media':
+        asyncio.run(update_all_movies())
+        asyncio.run(update_all_episodes())
+
+    elif args.command == 'migrate':
+        asyncio.run(migrate_documents())
+
     elif args.command == 'insert_single':
         if not args.path:
             print("Error: No path provided for single file insertion.")